@@ -0,0 +1 @@
+"""Benchmarks of the log collector throughput."""
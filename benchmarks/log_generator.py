@@ -0,0 +1,190 @@
+"""
+Deterministic generator of the synthetic Open edX tracking logs.
+
+Generated events cover all events from `constants.Events` (plus untracked page views for the course activity),
+courses, users and videos are picked with the Zipf-like skew, so a few of them get most of the traffic.
+"""
+from datetime import datetime, timedelta, timezone
+import gzip
+from itertools import accumulate
+import json
+import random
+
+from rg_instructor_analytics_log_collector.constants import Events
+
+PAGE_VIEW = 'page_view'
+
+# Share of every event type in the generated log, approximates the production traffic.
+DEFAULT_EVENT_WEIGHTS = {
+    Events.USER_ENROLLED: 2,
+    Events.USER_UNENROLLED: 0.5,
+    Events.FORUM_COMMENT_CREATED: 1,
+    Events.FORUM_RESPONSE_CREATED: 1,
+    Events.FORUM_RESPONSE_VOTED: 1,
+    Events.FORUM_SEARCHED: 0.5,
+    Events.FORUM_THREAD_CREATED: 0.5,
+    Events.FORUM_THREAD_VOTED: 1,
+    Events.USER_STARTED_VIEW_VIDEO: 12,
+    Events.USER_PAUSED_VIEW_VIDEO: 10,
+    Events.USER_FINISHED_WATCH_VIDEO: 3,
+    Events.SEQ_GOTO: 10,
+    Events.SEQ_NEXT: 8,
+    Events.SEQ_PREV: 3,
+    Events.UI_SEQ_NEXT: 4,
+    Events.UI_SEQ_PREV: 1,
+    Events.UI_LINK_CLICKED: 2,
+    PAGE_VIEW: 20,
+}
+
+
+class SkewedChoice:
+    """
+    Random choice with the Zipf-like distribution: the i-th item is picked with the weight 1 / (i + 1) ** skew.
+    """
+
+    def __init__(self, rng, items, skew=1.1):
+        self.rng = rng
+        self.items = list(items)
+        self.cum_weights = list(accumulate(1 / (i + 1) ** skew for i in range(len(self.items))))
+
+    def __call__(self):  # NOQA
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+
+class SyntheticCourse:
+    """
+    Course structure used by the generated events.
+    """
+
+    def __init__(self, rng, number, sections=8, subsections=4, units=5, videos=30):
+        self.key = f'course-v1:BenchX+C{number:03d}+2026'
+        self.sections = [
+            [
+                (
+                    f'seq{number}s{section}q{subsection}',
+                    [f'unit{number}s{section}q{subsection}u{unit}' for unit in range(rng.randint(1, units))],
+                ) for subsection in range(rng.randint(1, subsections))
+            ] for section in range(sections)
+        ]
+        self.subsections = [subsection for section in self.sections for subsection in section]
+        self.videos = [f'video{number}v{video}' for video in range(videos)]
+
+    def usage_key(self, block_type, block_id):
+        """
+        Return usage key string of the course block.
+        """
+        return f'block-v1:{self.key[len("course-v1:"):]}+type@{block_type}+block@{block_id}'
+
+
+class TrackingLogGenerator:
+    """
+    Generator of the tracking log events.
+
+    The same `seed` always produces the same log.
+    """
+
+    def __init__(self, seed=0, courses=20, users=5000, start=None, event_weights=None):
+        self.rng = random.Random(seed)
+        self.courses = [SyntheticCourse(self.rng, number) for number in range(courses)]
+        self.pick_course = SkewedChoice(self.rng, self.courses)
+        self.pick_user = SkewedChoice(self.rng, range(1, users + 1), skew=0.8)
+        self.pick_video = {course.key: SkewedChoice(self.rng, course.videos) for course in self.courses}
+        self.pick_subsection = {course.key: SkewedChoice(self.rng, course.subsections) for course in self.courses}
+        event_weights = event_weights or DEFAULT_EVENT_WEIGHTS
+        self.event_types = list(event_weights)
+        self.event_cum_weights = list(accumulate(event_weights.values()))
+        self.time = start or datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def _event_body(self, event_type, course, user_id):
+        """
+        Return `event` field of the tracking log event.
+
+        Browser events carry `event` as a JSON string, server events as an object.
+        """
+        rng = self.rng
+
+        if event_type in Events.ENROLLMENT_EVENTS:
+            return {'course_id': course.key, 'user_id': user_id, 'mode': 'audit'}
+
+        if event_type == Events.FORUM_SEARCHED:
+            return {'query': f'question {rng.randint(1, 100)}', 'total_results': rng.randint(0, 20)}
+
+        if event_type in Events.DISCUSSION_EVENTS:
+            return {
+                'commentable_id': f'topic{rng.randint(1, 20)}',
+                'id': f'{rng.getrandbits(96):024x}',
+                'category_id': f'category{rng.randint(1, 5)}',
+                'thread_type': rng.choice(['discussion', 'question']),
+            }
+
+        if event_type in Events.VIDEO_VIEW_EVENTS:
+            return json.dumps({
+                'id': self.pick_video[course.key](),
+                'currentTime': rng.randint(0, 600),
+                'code': 'html5',
+            })
+
+        if event_type in Events.NAVIGATIONAL_EVENTS:
+            subsection_id, units = self.pick_subsection[course.key]()
+            if event_type == Events.UI_LINK_CLICKED:
+                target_unit = rng.choice(units)
+                return json.dumps({
+                    'target_url': f'https://lms.example.com/courses/{course.key}/jump_to/'
+                                  f'{course.usage_key("vertical", target_unit)}',
+                    'current_url': f'https://lms.example.com/courses/{course.key}/courseware/',
+                })
+
+            body = {'id': course.usage_key('sequential', subsection_id)}
+            if event_type in Events.INTERNAL_NAVIGATION_EVENTS:
+                old = rng.randint(1, len(units))
+                body.update({'old': old, 'new': rng.randint(1, len(units)) if event_type == Events.SEQ_GOTO else (
+                    min(old + 1, len(units)) if event_type == Events.SEQ_NEXT else max(old - 1, 1)
+                )})
+            else:
+                body.update({'current_tab': 1, 'tab_count': len(units), 'widget_placement': 'top'})
+            return json.dumps(body)
+
+        return json.dumps({'GET': {}, 'POST': {}})
+
+    def events(self, count):
+        """
+        Yield `count` of the tracking log events as dicts, ordered by time.
+        """
+        for _ in range(count):
+            self.time += timedelta(milliseconds=self.rng.randint(1, 50))
+            event_type = self.rng.choices(self.event_types, cum_weights=self.event_cum_weights)[0]
+            course = self.pick_course()
+            user_id = self.pick_user()
+
+            if event_type == PAGE_VIEW:
+                event_type = f'/courses/{course.key}/courseware/'
+
+            yield {
+                'event_type': event_type,
+                'event_source': 'browser' if event_type in Events.VIDEO_VIEW_EVENTS + Events.NAVIGATIONAL_EVENTS
+                else 'server',
+                'time': self.time.isoformat(),
+                'username': f'learner{user_id}',
+                'context': {
+                    'course_id': course.key,
+                    'org_id': 'BenchX',
+                    'user_id': user_id,
+                    'path': f'/courses/{course.key}/',
+                },
+                'event': self._event_body(event_type, course, user_id),
+            }
+
+    def lines(self, count):
+        """
+        Yield `count` of the tracking log lines.
+        """
+        for event in self.events(count):
+            yield json.dumps(event) + '\n'
+
+    def write(self, path, count):
+        """
+        Write `count` of the events into the tracking log file (gzipped if path ends with `.gz`).
+        """
+        open_func = gzip.open if path.endswith('.gz') else open
+        with open_func(path, 'wt') as log_file:
+            log_file.writelines(self.lines(count))
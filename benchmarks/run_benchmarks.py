@@ -0,0 +1,274 @@
+"""
+Benchmarks of the log collector throughput.
+
+Runs the ingestion of the synthetic tracking log, every pipeline `format`/`push_to_database` and the Processor
+end to end, and reports events per second, database queries per event and peak RSS of the process.
+
+Usage (from the edx-platform virtualenv, the database must be a disposable one):
+    DJANGO_SETTINGS_MODULE=lms.envs.test python -m benchmarks.run_benchmarks --events 100000 --migrate
+"""
+import argparse
+from contextlib import contextmanager
+import gzip
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.log_generator import TrackingLogGenerator
+import django
+from django.core.management import call_command
+from django.db import connection, transaction
+from opaque_keys.edx.keys import CourseKey
+
+django.setup()
+
+from rg_instructor_analytics_log_collector import models
+from rg_instructor_analytics_log_collector.processors.course_outline import (
+    course_outline_cache, CourseOutline, OutlineSubsection
+)
+from rg_instructor_analytics_log_collector.processors.processor import Processor
+from rg_instructor_analytics_log_collector.repository import IRepository, MySQlRepository
+
+AGGREGATE_MODELS = [
+    models.EnrollmentByDay,
+    models.VideoViewsByUser,
+    models.VideoViewsByBlock,
+    models.VideoViewsByDay,
+    models.DiscussionActivity,
+    models.DiscussionActivityByDay,
+    models.StudentStepCourse,
+    models.LastCourseVisitByUser,
+    models.CourseVisitsByDay,
+]
+
+BENCHMARKS = ['ingest', 'pipelines', 'processor']
+
+
+class PerRecordRepository(MySQlRepository):
+    """
+    Repository storing log records one by one (the baseline for the batched ingestion).
+    """
+
+    def store_new_log_messages(self, batch):
+        """
+        Store records with the default per-record implementation.
+        """
+        IRepository.store_new_log_messages(self, batch)
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting the queries and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):  # NOQA
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def get_peak_rss_mb():
+    """
+    Return peak RSS of the process in megabytes (`ru_maxrss` is in kilobytes on Linux and in bytes on macOS).
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+@contextmanager
+def measure(name, results):
+    """
+    Measure the wrapped code, the caller sets `result['events']` to the number of the handled events.
+    """
+    result = {'benchmark': name, 'events': 0}
+    counter = QueryCounter()
+    start = time.perf_counter()
+
+    with connection.execute_wrapper(counter):
+        yield result
+
+    seconds = time.perf_counter() - start
+    events = result['events'] or 1
+    result.update({
+        'seconds': round(seconds, 3),
+        'events_per_second': round(result['events'] / seconds, 1) if seconds else None,
+        'queries': counter.count,
+        'queries_per_event': round(counter.count / events, 4),
+        'query_seconds': round(counter.duration, 3),
+        'peak_rss_mb': round(get_peak_rss_mb(), 1),
+    })
+    results.append(result)
+
+
+def seed_course_outlines(generator):
+    """
+    Put outlines of the synthetic courses into the cache, so the student step pipeline does not need a modulestore.
+    """
+    for course in generator.courses:
+        course_key = CourseKey.from_string(course.key)
+        course_outline_cache.set(course_key, CourseOutline([
+            [
+                OutlineSubsection(
+                    location=course.usage_key('sequential', subsection_id),
+                    block_id=subsection_id,
+                    units=units,
+                ) for subsection_id, units in section
+            ] for section in course.sections
+        ]))
+
+
+def reset_aggregates():
+    """
+    Delete results of the pipelines and their checkpoints.
+    """
+    for model in AGGREGATE_MODELS + [models.LastProcessedLog]:
+        model.objects.all().delete()
+
+
+def reset_log_records():
+    """
+    Delete loaded log records.
+    """
+    reset_aggregates()
+    models.LogTable.objects.all().delete()
+
+
+def bench_ingest(log_path, events, results):
+    """
+    Benchmark `IRepository.add_new_log_records` with the per-record, the queued and the batched storing.
+
+    Records loaded by the last (batched) run are left for the pipelines and processor benchmarks.
+    """
+    repositories = [
+        ('ingest:per-record', PerRecordRepository()),
+        ('ingest:queued', MySQlRepository(ingest_queue_depth=4)),
+        ('ingest', MySQlRepository()),
+    ]
+    for name, repository in repositories:
+        reset_log_records()
+        with gzip.open(log_path) as log_file, measure(name, results) as result:
+            result['events'] = events
+            repository.add_new_log_records(log_file)
+
+        stored_events = models.LogTable.objects.count()
+        if stored_events != events:
+            print(f'WARNING: {events} events are generated, {stored_events} are stored.')
+
+
+def bench_pipelines(results):
+    """
+    Benchmark `format` and `push_to_database` of every pipeline on the loaded log records.
+    """
+    for pipeline in Processor.available_pipelines:
+        reset_aggregates()
+        records = list(pipeline.get_query())
+        formatted_records = []
+
+        with measure(f'format:{pipeline.alias}', results) as result:
+            for record in records:
+                formatted_record = pipeline.format(record)
+                if formatted_record:
+                    formatted_records.append(formatted_record)
+            result['events'] = len(records)
+
+        with measure(f'push:{pipeline.alias}', results) as result, transaction.atomic():
+            if pipeline.write_behind:
+                chunk_size = Processor.CHUNK_SIZE_PROCESSOR
+                for start in range(0, len(formatted_records), chunk_size):
+                    pipeline.push_to_database_batch(formatted_records[start:start + chunk_size])
+            else:
+                for formatted_record in formatted_records:
+                    pipeline.push_to_database(formatted_record)
+            result['events'] = len(formatted_records)
+
+
+def bench_processor(events, results):
+    """
+    Benchmark `Processor.process` of all pipelines, per pipeline and with the fan-out.
+    """
+    aliases = [pipeline.alias for pipeline in Processor.available_pipelines]
+    for name, fan_out in [('processor', False), ('processor:fan-out', True)]:
+        reset_aggregates()
+        with measure(name, results) as result:
+            Processor(aliases, fan_out=fan_out).process()
+            result['events'] = events
+
+
+def print_results(results):
+    """
+    Print results as a table.
+    """
+    columns = ['benchmark', 'events', 'seconds', 'events_per_second', 'queries_per_event', 'peak_rss_mb']
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print('  '.join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    """
+    Run benchmarks.
+    """
+    parser = argparse.ArgumentParser(description='Benchmarks of the log collector throughput')
+    parser.add_argument('--events', type=int, default=100000, help='Number of the generated events')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic tracking log generator')
+    parser.add_argument('--courses', type=int, default=20, help='Number of the synthetic courses')
+    parser.add_argument('--users', type=int, default=5000, help='Number of the synthetic users')
+    parser.add_argument(
+        '--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS, help='Run only the chosen benchmarks'
+    )
+    parser.add_argument('--migrate', action='store_true', help='Apply the log collector migrations first')
+    parser.add_argument('--output', help='Write results into the JSON file (to compare the runs)')
+    parser.add_argument(
+        '--allow-non-sqlite', action='store_true',
+        help='Allow to run against not SQLite database, ALL the log collector tables are wiped (use the disposable '
+             'database, e.g. MySQL in docker)'
+    )
+    args = parser.parse_args()
+
+    if connection.vendor != 'sqlite' and not args.allow_non_sqlite:
+        print(f'Benchmarks wipe the log collector tables, pass --allow-non-sqlite to run on {connection.vendor}.')
+        sys.exit(1)
+
+    if args.migrate:
+        call_command('migrate', 'rg_instructor_analytics_log_collector', verbosity=0)
+
+    generator = TrackingLogGenerator(seed=args.seed, courses=args.courses, users=args.users)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, 'tracking.log.gz')
+        generator.write(log_path, args.events)
+
+        # NOTE: pipelines and processor benchmarks handle the log records loaded by the ingestion.
+        if 'ingest' in args.only:
+            bench_ingest(log_path, args.events, results)
+        else:
+            reset_log_records()
+            with gzip.open(log_path) as log_file:
+                MySQlRepository().add_new_log_records(log_file)
+
+    seed_course_outlines(generator)
+    if 'pipelines' in args.only:
+        bench_pipelines(results)
+    if 'processor' in args.only:
+        bench_processor(args.events, results)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'database': connection.vendor, 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
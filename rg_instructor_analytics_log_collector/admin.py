@@ -61,14 +61,7 @@ class LastProcessedLogAdmin(admin.ModelAdmin):
     Django admin customizations for LastProcessedLog model.
     """
 
-    list_display = ('processor', 'log_time',)
-    raw_id_fields = ('log_table',)
-
-    def log_time(self, obj):
-        """
-        Format for LastProcessedLog field.
-        """
-        return obj.log_table.log_time
+    list_display = ('processor', 'log_time', 'log_id',)
 
 
 class LogTableAdmin(admin.ModelAdmin):
@@ -89,6 +82,8 @@ class StudentStepCourseAdmin(admin.ModelAdmin):
 
 
 admin.site.register(models.ProcessedZipLog, admin.ModelAdmin)
+admin.site.register(models.LogFileCheckpoint, admin.ModelAdmin)
+admin.site.register(models.StorageListingCheckpoint, admin.ModelAdmin)
 admin.site.register(models.LogTable, LogTableAdmin)
 admin.site.register(models.EnrollmentByDay, admin.ModelAdmin)
 admin.site.register(models.LastProcessedLog, LastProcessedLogAdmin)
@@ -13,3 +13,9 @@ class RgIALogCollectorAppConfig(AppConfig):
             }
         },
     }
+
+    def ready(self):
+        """
+        Connect signal handlers.
+        """
+        from rg_instructor_analytics_log_collector import signals  # NOQA
@@ -2,10 +2,18 @@
 Defines the abstract base class that all backends should be based on.
 """
 from abc import ABCMeta, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 import gzip
 import logging
+import multiprocessing
+import os
+import tempfile
 from typing import Generator, Tuple
 
+from rg_instructor_analytics_log_collector.backends.streaming import iter_file_chunks
+from rg_instructor_analytics_log_collector.instrumentation import metrics
+from rg_instructor_analytics_log_collector.log_parser import iter_parsed_batches, parse_archive
 from rg_instructor_analytics_log_collector.processors.processor import Processor
 from rg_instructor_analytics_log_collector.repository import MySQlRepository
 
@@ -24,14 +32,27 @@ class BaseLogCollectorBackend(metaclass=ABCMeta):
         self,
         delete_logs: bool = False,
         reload_logs: bool = False,
+        fan_out: bool = False,
+        ingest_workers: int = 0,
+        ingest_queue_depth: int = 0,
         **kwargs
     ):
         self.delete_logs = delete_logs
         self.reload_logs = reload_logs
+        if fan_out:
+            self.processor = Processor([pipeline.alias for pipeline in self.processor.pipelines], fan_out=fan_out)
+        if ingest_queue_depth:
+            self.repository = MySQlRepository(ingest_queue_depth=ingest_queue_depth)
         # NOTE: streaming_read argument clarifying the process of reading tracking log files from the storage.
         #  If True the additional StreamReader class will be required to be setup from the codec library.
         #  Look at the `repository.IRepository.add_new_log_records` method for more details.
         self.streaming_read = False
+        # NOTE: names of the already processed archived files, loaded once per cycle (see `load_and_process`).
+        self.processed_files = set()
+        # NOTE: sizes of the listed not yet processed files by their names (see `_set_backlog`).
+        self.backlog = {}
+        # NOTE: number of the worker processes parsing archived files ahead of the current one (0 - disabled).
+        self.ingest_workers = ingest_workers
 
     @abstractmethod
     def _get_sorted_files_for_processing(self) -> Generator[Tuple[str, ...], None, None]:
@@ -43,31 +64,194 @@ class BaseLogCollectorBackend(metaclass=ABCMeta):
         """
         raise NotImplementedError
 
-    def load_and_process(self):
+    def load_and_process(self) -> bool:
         """
         Load and Process logs collected from the tracking log files.
+
+        return: (bool) True if new records were loaded, so more work may be waiting for the next cycle.
         """
+        has_new_records = False
+        self.processed_files = set() if self.reload_logs else self.repository.get_processed_zip_files()
         files_for_processing = self._get_sorted_files_for_processing()
+        if self.ingest_workers:
+            files_for_processing = self._parse_archives_ahead(files_for_processing)
 
         for file_name, file in files_for_processing:
             is_archived = file_name.endswith('.gz')
-
-            # Load part:
-            open_func = gzip.open if is_archived else open
             logger.info(f'Started work with the next log file: {file_name}')
 
-            # NOTE: gzip.open works fine with the streaming archived files and we need handle separately only unpacked
-            #  files from file-storage services (for ex: s3)
-            if self.streaming_read and not is_archived:
-                self.repository.add_new_log_records(file, streaming_read=self.streaming_read)
-            else:
-                with open_func(file) as log_file:
-                    self.repository.add_new_log_records(log_file)
-
-            # Process part:
-            if is_archived:
-                self.repository.mark_as_processed_source(file_name)
-            self.processor.process()
-            if self.delete_logs and is_archived:
-                self.processor.delete_logs()
+            with metrics.labels(backend=type(self).__name__, file=file_name):
+                # Load part:
+                with metrics.measure('load'):
+                    if isinstance(file, Future):
+                        has_new_records = self._load_parsed_file(file) or has_new_records
+                    else:
+                        has_new_records = self._load_file(file_name, file) or has_new_records
+
+                # Process part:
+                if is_archived:
+                    self.repository.mark_as_processed_source(file_name)
+                    self.processed_files.add(file_name)
+                with metrics.measure('process'):
+                    self.processor.process()
+                if self.delete_logs and is_archived:
+                    with metrics.measure('delete_logs'):
+                        self.processor.delete_logs()
+            self.backlog.pop(file_name, None)
             logger.info(f'Finished work with log file: {file_name}')
+
+        return has_new_records
+
+    def has_backlog(self) -> bool:
+        """
+        Return True if work is still pending at the end of the cycle, so the next cycle should start immediately.
+
+        The cycle processes all listed files, so only the files left after a failure are pending by default.
+        """
+        return bool(self.backlog)
+
+    def get_loaded_records_count(self) -> int:
+        """
+        Return the number of the log records loaded by the backend (for the events rate metrics).
+        """
+        return self.repository.loaded_records_counter
+
+    def get_backlog(self) -> dict:
+        """
+        Return sizes in bytes of the files waiting for the processing by their names (for the status metrics).
+
+        These are the files of the cycle's listing left not processed (files are removed from it once processed), the
+        storage is not listed again, files uploaded during the cycle are reported after the next listing.
+        """
+        return dict(self.backlog)
+
+    def _set_backlog(self, files):
+        """
+        Store the listed files waiting for the processing.
+
+        Not archived files are re-read every cycle, so backends do not count them.
+        :param files: iterable of tuples: (file_name, size in bytes)
+        """
+        self.backlog = dict(files)
+
+    def _parse_archives_ahead(self, files):
+        """
+        Yield tuples (file_name, file) with archived files parsed by the worker processes ahead of the current one.
+
+        Archived files are replaced with the futures of `log_parser.parse_archive`, up to `ingest_workers` files are
+        parsed ahead. Files are yielded in the listing order, so they are stored, marked and processed in it.
+        :param files: iterable of tuples (file_name, file) of `_get_sorted_files_for_processing`.
+        """
+        pending = deque()
+        executor = None
+        try:
+            for file_name, file in files:
+                if not file_name.endswith('.gz'):
+                    # NOTE: not archived files are loaded in the current process (e.g. incrementally), and the file
+                    #  object may be valid until the next file is requested only (see `Prefetcher.iterate`).
+                    while pending:
+                        yield pending.popleft()
+                    yield file_name, file
+                    continue
+
+                if executor is None:
+                    # NOTE: forked workers inherit the configured Django and do not use the database connection.
+                    executor = ProcessPoolExecutor(self.ingest_workers, mp_context=multiprocessing.get_context('fork'))
+                pending.append((file_name, self._submit_archive(executor, file)))
+                while len(pending) > self.ingest_workers:
+                    yield pending.popleft()
+
+            while pending:
+                yield pending.popleft()
+        finally:
+            if executor is not None:
+                # NOTE: `shutdown(cancel_futures=True)` is not available on Python 3.8.
+                for _, future in pending:
+                    future.cancel()
+                executor.shutdown(wait=True)
+                for _, future in pending:
+                    self._remove_temporary_file(future.batches_path)
+
+    def _submit_archive(self, executor, file) -> Future:
+        """
+        Submit the archived file to the worker process.
+
+        File objects from the file-storage services are spooled into the temporary file by chunks, so the worker reads
+        it from the disk and the memory does not depend on the size of the file. The temporary file is removed as soon
+        as the worker is done with it (or the parsing is cancelled).
+
+        The worker writes the parsed records by batches into the temporary file (`batches_path` of the future), which
+        is removed once it is loaded (see `_load_parsed_file`).
+        """
+        with tempfile.NamedTemporaryFile(suffix='.batches', delete=False) as batches_file:
+            batches_path = batches_file.name
+
+        if isinstance(file, str):
+            future = executor.submit(parse_archive, file, batches_path)
+            future.batches_path = batches_path
+            return future
+
+        with tempfile.NamedTemporaryFile(suffix='.gz', delete=False) as archive:
+            try:
+                for chunk in self._iter_file_chunks(file):
+                    archive.write(chunk)
+            except BaseException:
+                os.remove(archive.name)
+                os.remove(batches_path)
+                raise
+
+        future = executor.submit(parse_archive, archive.name, batches_path)
+        future.batches_path = batches_path
+        future.add_done_callback(lambda _: os.remove(archive.name))
+        return future
+
+    @staticmethod
+    def _remove_temporary_file(path):
+        """
+        Remove the temporary file if it still exists.
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _iter_file_chunks(self, file):
+        """
+        Read the file object from the file-storage service by chunks.
+        """
+        return iter_file_chunks(file)
+
+    def _load_parsed_file(self, parsed_file: Future) -> bool:
+        """
+        Store records of the archived file parsed by the worker process into the repository.
+
+        return: (bool) True if the file contained records, that were not loaded before.
+        """
+        try:
+            lines_counter, records_counter = parsed_file.result()
+            logger.debug(f'Parsed {records_counter} of {lines_counter} log lines by the ingest worker')
+            self.repository.add_parsed_log_records(iter_parsed_batches(parsed_file.batches_path))
+        finally:
+            self._remove_temporary_file(parsed_file.batches_path)
+        return not self.reload_logs
+
+    def _load_file(self, file_name, file) -> bool:
+        """
+        Load records of the single tracking log file into the repository.
+
+        return: (bool) True if the file contained records, that were not loaded before.
+        """
+        is_archived = file_name.endswith('.gz')
+        open_func = gzip.open if is_archived else open
+
+        # NOTE: gzip.open works fine with the streaming archived files and we need handle separately only unpacked
+        #  files from file-storage services (for ex: s3)
+        if self.streaming_read and not is_archived:
+            self.repository.add_new_log_records(file, streaming_read=self.streaming_read)
+        else:
+            with open_func(file) as log_file:
+                self.repository.add_new_log_records(log_file)
+
+        # NOTE: not archived files from the file-storage services are re-read on every cycle, so they are not counted
+        #  as new records.
+        return is_archived and not self.reload_logs
@@ -1,14 +1,14 @@
 """
 Defines the backend class to work with the tracking logs stored un the Azure Blob storage.
 """
-import gzip
-from io import BytesIO
 import logging
 from typing import Generator, Tuple
 
-from azure.storage.blob import BlobClient, ContainerClient, StorageStreamDownloader
+from azure.storage.blob import ContainerClient, StorageStreamDownloader
 
 from rg_instructor_analytics_log_collector.backends.base_backend import BaseLogCollectorBackend
+from rg_instructor_analytics_log_collector.backends.prefetch import MB, Prefetcher
+from rg_instructor_analytics_log_collector.backends.streaming import iter_gunzip, iter_lines
 
 
 logger = logging.getLogger(__name__)
@@ -16,14 +16,19 @@ logger = logging.getLogger(__name__)
 
 class BlobBackend(BaseLogCollectorBackend):
 
-    def __init__(self, conn_str, container_name, **kwargs):
+    def __init__(self, conn_str, container_name, prefetch: int = 0, prefetch_max_mb: int = 256, **kwargs):
         super().__init__(**kwargs)
         self.conn_str = conn_str
         self.container_name = container_name
+        # NOTE: the container client (its HTTP pipeline and connection pool) is shared by all blob downloads.
         self.blob = ContainerClient.from_connection_string(
             conn_str=self.conn_str,
             container_name=self.container_name,
         )
+        # NOTE: the next `prefetch` blobs are downloaded concurrently while the current one is loaded and processed.
+        self.prefetcher = prefetch and Prefetcher(
+            workers=prefetch, depth=prefetch, max_in_flight_bytes=prefetch_max_mb * MB
+        )
 
     def _file_filter(self, file) -> bool:
         """
@@ -31,49 +36,50 @@ class BlobBackend(BaseLogCollectorBackend):
         """
         is_tracking_log_file = file.name.split('.')[-1] in ('gz', 'log')
         if not self.reload_logs:
-            return is_tracking_log_file and file.name not in self.repository.get_processed_zip_files()
+            return is_tracking_log_file and file.name not in self.processed_files
         return is_tracking_log_file
 
     def _get_sorted_files_for_processing(self) -> Generator[Tuple[str, StorageStreamDownloader], None, None]:
         """
         Generator for tracking log files from Azure Blob.
 
-        return: Generator of tuples: (file_name, <file StorageStreamDownloader from blob service>)
+        return: Generator of tuples: (file_name, <file StorageStreamDownloader from blob service or prefetched file>)
         """
-        file_names = (
-            file.name for file in sorted(self.blob.list_blobs(), key=lambda file: file.last_modified)
+        files = [
+            file for file in sorted(self.blob.list_blobs(), key=lambda file: file.last_modified)
             if self._file_filter(file)
-        )
+        ]
+        self._set_backlog((file.name, file.size) for file in files if file.name.endswith('.gz'))
 
-        return (
-            (f_name, BlobClient.from_connection_string(
-                conn_str=self.conn_str,
-                container_name=self.container_name,
-                blob_name=f_name
-            ).download_blob()) for f_name in file_names
-        )
+        if self.prefetcher:
+            return self.prefetcher.iterate(files, describe=lambda file: (file.name, file.size), read=self._read_blob)
+
+        return ((file.name, self.blob.download_blob(file.name)) for file in files)
+
+    def _read_blob(self, file, start, end) -> Generator[bytes, None, None]:
+        """
+        Read the blob, or its inclusive byte range if `end` is set, by chunks.
+        """
+        length = end - start + 1 if end is not None else None
+        return self.blob.download_blob(file.name, offset=start, length=length).chunks()
 
-    def load_and_process(self):
+    def _iter_file_chunks(self, file):
         """
-        Load and Process logs collected from the tracking log files.
+        Read the blob downloader or the prefetched file by chunks.
         """
-        files_for_processing = self._get_sorted_files_for_processing()
-
-        for file_name, file in files_for_processing:
-            is_archived = file_name.endswith('.gz')
-
-            # Load part:
-            logger.info(f'Started work with the next log file: {file_name}')
-
-            file_descriptor = file.readall()
-            if is_archived:
-                with gzip.open(BytesIO(file_descriptor)) as log_file:
-                    self.repository.add_new_log_records(log_file)
-                self.repository.mark_as_processed_source(file_name)
-            else:
-                self.repository.add_new_log_records(file_descriptor.splitlines())
-
-            self.processor.process()
-            if self.delete_logs and is_archived:
-                self.processor.delete_logs()
-            logger.info(f'Finished work with log file: {file_name}')
+        return file.chunks() if isinstance(file, StorageStreamDownloader) else super()._iter_file_chunks(file)
+
+    def _load_file(self, file_name, file):
+        """
+        Load records of the single tracking log file into the repository.
+
+        The blob is downloaded, decompressed and split into lines by chunks, so the memory does not depend on its size.
+        """
+        is_archived = file_name.endswith('.gz')
+
+        chunks = self._iter_file_chunks(file)
+        if is_archived:
+            chunks = iter_gunzip(chunks)
+        self.repository.add_new_log_records(iter_lines(chunks))
+
+        return is_archived and not self.reload_logs
@@ -1,9 +1,10 @@
 """
 Defines the backend class to work with the tracking logs stored un the file system.
 """
+import hashlib
 import logging
-from os import listdir
-from os.path import exists, getctime, isdir, join
+from os import fstat, listdir, stat as get_stat
+from os.path import exists, getctime, getsize, isdir, join
 from typing import Generator, Tuple
 
 from rg_instructor_analytics_log_collector.backends.base_backend import BaseLogCollectorBackend
@@ -12,11 +13,43 @@ from rg_instructor_analytics_log_collector.backends.base_backend import BaseLogC
 logger = logging.getLogger(__name__)
 
 
+class LogFileTail:
+    """
+    Iterator over the complete lines of the log file starting from the given byte offset.
+
+    `offset` always points to the end of the last yielded line, so it can be stored as a checkpoint.
+    `partial_line_size` is the size of the trailing line being written, that was left unread.
+    """
+
+    def __init__(self, log_file, offset: int = 0):
+        self.log_file = log_file
+        self.offset = offset
+        self.partial_line_size = 0
+        self.log_file.seek(offset)
+
+    def __iter__(self):  # NOQA
+        for line in iter(self.log_file.readline, b''):
+            if not line.endswith(b'\n'):
+                # NOTE: the last line is still being written, it will be read on the next cycle.
+                self.partial_line_size = len(line)
+                break
+            self.offset += len(line)
+            yield line
+
+
 class FileBackend(BaseLogCollectorBackend):
+    """
+    Backend for the tracking log files stored in the local directory.
+    """
+
+    # Amount of the leading bytes of the log file used to detect that the file was replaced or truncated.
+    FINGERPRINT_SIZE = 1024
 
     def __init__(self, tracking_log_dir, **kwargs):
         super().__init__(**kwargs)
         self.tracking_log_dir = tracking_log_dir
+        # NOTE: bytes appended to the not archived log files while they were read, by their paths (see `has_backlog`).
+        self.unread_sizes = {}
 
     def _file_filter(self, file: str) -> bool:
         """
@@ -26,7 +59,7 @@ class FileBackend(BaseLogCollectorBackend):
         """
         is_tracking_log_file = file.split('.')[-1] in ('gz', 'log')
         if not self.reload_logs:
-            return is_tracking_log_file and file not in self.repository.get_processed_zip_files()
+            return is_tracking_log_file and file not in self.processed_files
         return is_tracking_log_file
 
     def _get_sorted_files_for_processing(self) -> Generator[Tuple[str, str], None, None]:
@@ -38,9 +71,104 @@ class FileBackend(BaseLogCollectorBackend):
         if not exists(self.tracking_log_dir) or not isdir(self.tracking_log_dir):
             raise Exception(f"Can not find log directory by nex path: {self.tracking_log_dir}")
 
-        files = (
+        files = [
             f for f in sorted(
                 listdir(self.tracking_log_dir), key=lambda f: getctime(join(self.tracking_log_dir, f))
             ) if self._file_filter(f)
-        )
+        ]
+        self._set_backlog((file, getsize(join(self.tracking_log_dir, file))) for file in files if file.endswith('.gz'))
         return ((file, join(self.tracking_log_dir, file)) for file in files)
+
+    def _get_fingerprint(self, log_file, size: int) -> str:
+        """
+        Return the hash of the first `size` bytes of the log file.
+        """
+        log_file.seek(0)
+        return hashlib.sha256(log_file.read(min(size, self.FINGERPRINT_SIZE))).hexdigest()
+
+    def _get_start_offset(self, file_name: str, log_file) -> int:
+        """
+        Return the byte offset the not archived log file should be read from.
+
+        The stored checkpoint is discarded if the file was rotated (inode or leading bytes changed) or truncated.
+        """
+        if self.reload_logs:
+            return 0
+
+        checkpoint = self.repository.get_log_file_checkpoint(file_name)
+        if not checkpoint:
+            return 0
+
+        stat = fstat(log_file.fileno())
+        if checkpoint.inode != stat.st_ino:
+            logger.info(f'Log file {file_name} was rotated, read it from the beginning')
+            return 0
+        if stat.st_size < checkpoint.offset or (
+            checkpoint.fingerprint and self._get_fingerprint(log_file, checkpoint.offset) != checkpoint.fingerprint
+        ):
+            logger.info(f'Log file {file_name} was truncated, read it from the beginning')
+            return 0
+
+        return checkpoint.offset
+
+    def _load_file(self, file_name: str, file: str) -> bool:
+        """
+        Load records of the tracking log file.
+
+        Not archived log file is still being written, so only the lines appended since the previous read are loaded.
+        """
+        if file_name.endswith('.gz'):
+            return super()._load_file(file_name, file)
+
+        with open(file, 'rb') as log_file:
+            offset = self._get_start_offset(file, log_file)
+            stat = fstat(log_file.fileno())
+            if offset == stat.st_size:
+                logger.info(f'Log file {file_name} has no new records')
+                self.unread_sizes[file] = 0
+                return False
+
+            log_file_tail = LogFileTail(log_file, offset)
+            self.repository.add_new_log_records(log_file_tail)
+            size = fstat(log_file.fileno()).st_size
+            self.unread_sizes[file] = max(size - log_file_tail.offset - log_file_tail.partial_line_size, 0)
+
+            self.repository.update_log_file_checkpoint(
+                file,
+                inode=stat.st_ino,
+                size=size,
+                offset=log_file_tail.offset,
+                fingerprint=self._get_fingerprint(log_file, log_file_tail.offset),
+            )
+
+        return log_file_tail.offset > offset
+
+    def has_backlog(self) -> bool:
+        """
+        Return True if the listed files are left or the not archived log file was appended faster than it was read.
+
+        Records appended after the read are not counted (they are handled after the file system event), as well as
+        the trailing line being written, so the busy log file does not make the cycles run without a delay.
+        """
+        return super().has_backlog() or any(self.unread_sizes.values())
+
+    def get_backlog(self) -> dict:
+        """
+        Return sizes in bytes of the files waiting for the processing, including not archived log files.
+
+        Not archived log files are counted by the bytes after the stored checkpoint offset.
+        """
+        backlog = super().get_backlog()
+        for file_name in listdir(self.tracking_log_dir):
+            if not file_name.endswith('.log'):
+                continue
+            path = join(self.tracking_log_dir, file_name)
+            try:
+                stat = get_stat(path)
+            except FileNotFoundError:
+                continue
+            checkpoint = self.repository.get_log_file_checkpoint(path)
+            offset = checkpoint.offset if checkpoint and checkpoint.inode == stat.st_ino else 0
+            if stat.st_size > offset:
+                backlog[file_name] = stat.st_size - offset
+        return backlog
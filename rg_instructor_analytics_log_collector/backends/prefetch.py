@@ -0,0 +1,141 @@
+"""
+Bounded concurrent prefetching of the tracking log files from the file-storage services.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+import logging
+from tempfile import SpooledTemporaryFile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class PrefetchedFile:
+    """
+    Tracking log file downloaded (or being downloaded) into the spooled temporary file.
+    """
+
+    def __init__(self, name, size, spool_max_size):
+        self.name = name
+        self.size = size
+        self.file = SpooledTemporaryFile(max_size=spool_max_size)
+        self.futures = []
+        self._lock = threading.Lock()
+
+    def write(self, offset, chunks):
+        """
+        Write chunks of the file part starting from the offset (parts are written concurrently).
+        """
+        position = offset
+        for chunk in chunks:
+            with self._lock:
+                self.file.seek(position)
+                self.file.write(chunk)
+            position += len(chunk)
+
+    def result(self):
+        """
+        Wait for all parts of the file and return the file object rewound to the start.
+        """
+        for future in self.futures:
+            future.result()
+        self.file.seek(0)
+        return self.file
+
+    def close(self):
+        """
+        Cancel not started downloads and drop the file.
+        """
+        for future in self.futures:
+            future.cancel()
+        wait(self.futures)
+        self.file.close()
+
+
+class Prefetcher:
+    """
+    Fetch the next files in the thread pool while the current one is handled.
+
+    Files are yielded in the order of the sources. Large files are fetched with the concurrent ranged reads of
+    `part_size`. The number of the files fetched ahead is limited by `depth` and the total size of the fetched not
+    yet handled files (including the current one) by `max_in_flight_bytes`, a file larger than the budget is fetched
+    alone. Files are kept in memory up to `spool_max_size` and in the temporary files on the disk above it.
+    """
+
+    def __init__(self, workers=4, depth=4, max_in_flight_bytes=256 * MB, part_size=8 * MB, spool_max_size=16 * MB):
+        self.workers = workers
+        self.depth = depth
+        self.max_in_flight_bytes = max_in_flight_bytes
+        self.part_size = part_size
+        self.spool_max_size = spool_max_size
+        self.in_flight_bytes = 0
+
+    def _submit(self, executor, source, name, size, read):
+        """
+        Start fetching of the file.
+        """
+        prefetched = PrefetchedFile(name, size, self.spool_max_size)
+
+        if size > self.part_size:
+            ranges = [(start, min(start + self.part_size, size) - 1) for start in range(0, size, self.part_size)]
+        else:
+            ranges = [(0, None)]
+
+        for start, end in ranges:
+            prefetched.futures.append(
+                executor.submit(lambda start=start, end=end: prefetched.write(start, read(source, start, end)))
+            )
+        self.in_flight_bytes += size
+        return prefetched
+
+    def iterate(self, sources, describe, read):
+        """
+        Yield tuples (file_name, file object) of the prefetched sources.
+
+        File object is valid until the next file is requested.
+        :param sources: iterable of the file sources (e.g. storage objects).
+        :param describe: function returning tuple (file_name, size in bytes) of the source.
+        :param read: function returning iterable of the bytes chunks of the source, accepts the source and the
+            inclusive byte range (start, end), end is None to read the whole source.
+        """
+        sources = iter(sources)
+        pending = deque()
+        next_source = next_description = None
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='log-prefetch') as executor:
+            try:
+                while True:
+                    # NOTE: one of the pending files becomes the current one, so `depth` files are fetched ahead.
+                    while len(pending) <= self.depth:
+                        if next_source is None:
+                            next_source = next(sources, None)
+                            if next_source is None:
+                                break
+                            next_description = describe(next_source)
+
+                        name, size = next_description
+                        if self.in_flight_bytes and self.in_flight_bytes + size > self.max_in_flight_bytes:
+                            break
+                        pending.append(self._submit(executor, next_source, name, size, read))
+                        next_source = None
+
+                    if not pending:
+                        break
+
+                    prefetched = pending.popleft()
+                    try:
+                        start = time.monotonic()
+                        file = prefetched.result()
+                        logger.debug(f'Waited {time.monotonic() - start:.3f}s for the file: {prefetched.name}')
+                        yield prefetched.name, file
+                    finally:
+                        self.in_flight_bytes -= prefetched.size
+                        prefetched.close()
+            finally:
+                while pending:
+                    prefetched = pending.popleft()
+                    self.in_flight_bytes -= prefetched.size
+                    prefetched.close()
@@ -1,21 +1,38 @@
 """
 Defines the backend class to work with the tracking logs stored un the S3 storage.
 """
+from collections import defaultdict, namedtuple
 import logging
 from typing import Generator, Tuple
 
 import boto3 as boto3
+from botocore.exceptions import ClientError
 from botocore.response import StreamingBody
 
 from rg_instructor_analytics_log_collector.backends.base_backend import BaseLogCollectorBackend
+from rg_instructor_analytics_log_collector.backends.prefetch import MB, Prefetcher
 
 
 logger = logging.getLogger(__name__)
 
+ListedObject = namedtuple('ListedObject', ['key', 'size', 'last_modified'])
+
 
 class S3Backend(BaseLogCollectorBackend):
 
-    def __init__(self, aws_access_key_id, aws_secret_access_key, bucket_name, **kwargs):
+    READ_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(
+        self,
+        aws_access_key_id,
+        aws_secret_access_key,
+        bucket_name,
+        prefetch: int = 0,
+        prefetch_max_mb: int = 256,
+        s3_prefix: str = '',
+        s3_incremental: bool = False,
+        **kwargs
+    ):
         super().__init__(**kwargs)
         self.s3 = boto3.resource(
             's3',
@@ -24,6 +41,16 @@ class S3Backend(BaseLogCollectorBackend):
         )
         self.bucket = self.s3.Bucket(bucket_name)
         self.streaming_read = True
+        self.prefix = s3_prefix
+        # NOTE: incremental listing of every top level prefix starts after its stored key, see `_list_objects`.
+        self.incremental = s3_incremental
+        self.listed_keys = []
+        # NOTE: top level prefixes of the incremental listing (see `_list_prefixes`).
+        self.listed_prefixes = set()
+        # NOTE: the next `prefetch` objects are downloaded concurrently while the current one is loaded and processed.
+        self.prefetcher = prefetch and Prefetcher(
+            workers=prefetch, depth=prefetch, max_in_flight_bytes=prefetch_max_mb * MB
+        )
 
     def _file_filter(self, obj) -> bool:
         """
@@ -31,20 +58,151 @@ class S3Backend(BaseLogCollectorBackend):
         """
         is_tracking_log_file = obj.key.split('.')[-1] in ('gz', 'log')
         if not self.reload_logs:
-            return is_tracking_log_file and obj.key not in self.repository.get_processed_zip_files()
+            return is_tracking_log_file and obj.key not in self.processed_files
         return is_tracking_log_file
 
+    def load_and_process(self) -> bool:
+        """
+        Load and Process logs collected from the tracking log files, then advance the incremental listing.
+        """
+        has_new_records = super().load_and_process()
+        if self.incremental and not self.reload_logs:
+            self._update_listing_checkpoints()
+        return has_new_records
+
+    def _get_listing_source(self, prefix: str) -> str:
+        """
+        Return the name of the listing checkpoint of the top level prefix.
+        """
+        return f's3://{self.bucket.name}/{prefix}'
+
+    def _get_top_level_prefix(self, key: str) -> str:
+        """
+        Return the top level prefix of the key (the prefix of the backend for the keys directly under it).
+        """
+        separator = key.find('/', len(self.prefix))
+        return key[:separator + 1] if separator != -1 else self.prefix
+
+    def _paginate(self, **params) -> Generator[dict, None, None]:
+        """
+        List pages of the bucket objects.
+        """
+        yield from self.s3.meta.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket.name, **params)
+
+    def _list_objects(self) -> Generator[ListedObject, None, None]:
+        """
+        List objects of the bucket (under the prefix).
+
+        In the incremental mode the keys directly under the prefix (flat layout) and every top level prefix (for ex.
+        the host one) are listed after their own stored key, so the keys uploaded late to one prefix are not skipped
+        because of the other prefixes, and the not archived keys listed before the stored key are listed by name.
+        """
+        if not self.incremental or self.reload_logs:
+            pages = self._paginate(Prefix=self.prefix)
+        else:
+            pages = self._list_prefixes()
+
+        for page in pages:
+            for obj in page.get('Contents', []):
+                yield ListedObject(obj['Key'], obj['Size'], obj['LastModified'])
+
+    def _list_prefixes(self) -> Generator[dict, None, None]:
+        """
+        List pages of the keys directly under the prefix and of every top level prefix after their stored keys.
+
+        Top level prefixes listed before the stored key of the prefix of the backend are stored with it (see
+        `_update_listing_checkpoints`), as the listing after the key does not return them.
+        """
+        self.listed_prefixes = set()
+        root_pages = self._list_after_checkpoint(self.prefix, Delimiter='/')
+        for page in root_pages:
+            self.listed_prefixes.update(common_prefix['Prefix'] for common_prefix in page.get('CommonPrefixes', []))
+            yield page
+
+        for prefix in sorted(self.listed_prefixes):
+            yield from self._list_after_checkpoint(prefix)
+
+    def _list_after_checkpoint(self, prefix, **params) -> Generator[dict, None, None]:
+        """
+        List pages of the prefix after its stored key, stored keys are listed by name (prefixes are collected).
+        """
+        checkpoint = self.repository.get_listing_checkpoint(self._get_listing_source(prefix))
+        if not checkpoint:
+            yield from self._paginate(Prefix=prefix, **params)
+            return
+
+        for key in checkpoint.live_keys.splitlines():
+            if key.endswith('/'):
+                self.listed_prefixes.add(key)
+                continue
+            page = self.s3.meta.client.list_objects_v2(Bucket=self.bucket.name, Prefix=key, MaxKeys=1)
+            yield {'Contents': [obj for obj in page.get('Contents', []) if obj['Key'] == key]}
+        yield from self._paginate(Prefix=prefix, StartAfter=checkpoint.last_key, **params)
+
+    def _update_listing_checkpoints(self):
+        """
+        Store the last listed key of every top level prefix, all the archived files up to which are processed.
+
+        Keys directly under the prefix of the backend (flat layout) have their own stored key. The key stops before the
+        first not processed archive of the prefix. The not archived log files listed before it (for ex. `tracking.log`
+        before `tracking.log-20240131.gz`) are stored to be listed by name, as well as the top level prefixes listed
+        before the key of the prefix of the backend.
+        """
+        keys_by_prefix = defaultdict(list)
+        for key in sorted(self.listed_keys):
+            keys_by_prefix[self._get_top_level_prefix(key)].append(key)
+
+        for prefix, keys in keys_by_prefix.items():
+            last_key, live_keys = None, []
+            for key in keys:
+                extension = key.split('.')[-1]
+                if extension == 'log':
+                    live_keys.append(key)
+                    continue
+                if extension == 'gz' and key not in self.processed_files:
+                    break
+                last_key = key
+
+            if not last_key:
+                continue
+            if prefix == self.prefix:
+                live_keys.extend(self.listed_prefixes)
+            self.repository.update_listing_checkpoint(
+                self._get_listing_source(prefix), last_key, sorted(key for key in live_keys if key < last_key)
+            )
+
     def _get_sorted_files_for_processing(self) -> Generator[Tuple[str, StreamingBody], None, None]:
         """
         Generator for tracking log files from S3.
 
         return: Generator of tuples: (file_name, <file StreamingBody from s3 service>)
         """
-        if self.bucket not in self.s3.buckets.all():
-            raise Exception(f"Can not find required bucket: {self.bucket} in s3 service, please check access params.")
-        objs = (
-            obj for obj in sorted(self.bucket.objects.all(), key=lambda obj: obj.last_modified)
+        try:
+            self.s3.meta.client.head_bucket(Bucket=self.bucket.name)
+        except ClientError as err:
+            raise Exception(
+                f"Can not find required bucket: {self.bucket} in s3 service, please check access params ({err})."
+            )
+
+        listed_objs = list(self._list_objects())
+        self.listed_keys = [obj.key for obj in listed_objs]
+        objs = [
+            obj for obj in sorted(listed_objs, key=lambda obj: obj.last_modified)
             if self._file_filter(obj)
-        )
+        ]
+        self._set_backlog((obj.key, obj.size) for obj in objs if obj.key.endswith('.gz'))
 
-        return ((obj.key, obj.Object().get()['Body']) for obj in objs)
+        if self.prefetcher:
+            return self.prefetcher.iterate(objs, describe=lambda obj: (obj.key, obj.size), read=self._read_object)
+
+        return ((obj.key, self.bucket.Object(obj.key).get()['Body']) for obj in objs)
+
+    def _read_object(self, obj, start, end) -> Generator[bytes, None, None]:
+        """
+        Read the object, or its inclusive byte range if `end` is set, by chunks.
+
+        NOTE: it is called from the prefetcher threads, so it uses the thread-safe client instead of the resource.
+        """
+        params = {'Range': f'bytes={start}-{end}'} if end is not None else {}
+        response = self.s3.meta.client.get_object(Bucket=self.bucket.name, Key=obj.key, **params)
+        return response['Body'].iter_chunks(self.READ_CHUNK_SIZE)
@@ -0,0 +1,82 @@
+"""
+Defines the backend class to replay the live events spooled by the `RGAnalyticsBackend` in the `spool` mode.
+"""
+import logging
+import os
+from typing import Generator, Tuple
+
+from django.db import transaction
+
+from rg_instructor_analytics_log_collector.backends.base_backend import BaseLogCollectorBackend
+from rg_instructor_analytics_log_collector.backends.tracking_backend import load_event_data
+from rg_instructor_analytics_log_collector.spool import Spool
+
+logger = logging.getLogger(__name__)
+
+
+class SpoolBackend(BaseLogCollectorBackend):
+    """
+    Backend processing the spooled live events with the pipelines.
+
+    Every segment is processed in a single transaction and deleted after the commit, so the segment is replayed
+    entirely if the processing is interrupted (e.g. the database is not available).
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, spool_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.spool = Spool(spool_dir)
+        self.processed_events_counter = 0
+
+    def _get_sorted_files_for_processing(self) -> Generator[Tuple[str, str], None, None]:
+        """
+        Generator for the spool segments ready for the processing.
+
+        return: Generator of tuples: (segment_name, path_to_segment)
+        """
+        segments = self.spool.get_segments()
+        self._set_backlog((os.path.basename(path), os.path.getsize(path)) for path in segments)
+        return ((os.path.basename(path), path) for path in segments)
+
+    def get_loaded_records_count(self) -> int:
+        """
+        Return the number of the processed spooled events.
+        """
+        return self.processed_events_counter
+
+    def load_and_process(self) -> bool:
+        """
+        Process the live events of the spool segments in order.
+
+        return: (bool) True if any segment was processed, so more work may be waiting for the next cycle.
+        """
+        has_new_records = False
+
+        for segment_name, segment_path in self._get_sorted_files_for_processing():
+            logger.info(f'Started work with the next spool segment: {segment_name}')
+            events_counter = 0
+
+            with transaction.atomic():
+                batch = []
+                for record in self.spool.read_segment(segment_path):
+                    try:
+                        batch.append(load_event_data(record))
+                    except (ValueError, KeyError):
+                        logger.error(f'Can not parse the spooled event: {record}')
+                        continue
+                    if len(batch) >= self.BATCH_SIZE:
+                        self.processor.process_batch(batch)
+                        events_counter += len(batch)
+                        batch = []
+                if batch:
+                    self.processor.process_batch(batch)
+                    events_counter += len(batch)
+
+            self.spool.commit(segment_path)
+            self.processed_events_counter += events_counter
+            self.backlog.pop(segment_name, None)
+            has_new_records = True
+            logger.info(f'Finished work with spool segment: {segment_name} (events: {events_counter})')
+
+        return has_new_records
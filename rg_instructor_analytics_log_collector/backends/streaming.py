@@ -0,0 +1,77 @@
+"""
+Streaming decompression and line splitting of the tracking log files downloaded by chunks.
+
+Memory is bounded by the size of the chunks (and the longest line), not by the size of the file.
+"""
+from typing import Generator, Iterable
+import zlib
+
+DECOMPRESSED_CHUNK_SIZE = 1024 * 1024
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def iter_file_chunks(file, chunk_size: int = READ_CHUNK_SIZE) -> Generator[bytes, None, None]:
+    """
+    Read binary file object by chunks.
+    """
+    return iter(lambda: file.read(chunk_size), b'')
+
+
+def iter_gunzip(chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+    """
+    Decompress gzip data by chunks.
+
+    Supports multi-member gzip files (e.g. concatenated archives) like `gzip.open`, trailing zero padding is ignored.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # NOTE: if the current member got any data (the next member starts with the new decompressor).
+    has_data = False
+
+    for chunk in chunks:
+        while chunk:
+            if not has_data:
+                chunk = chunk.lstrip(b'\x00')
+                if not chunk:
+                    break
+            has_data = True
+
+            data = decompressor.decompress(chunk, DECOMPRESSED_CHUNK_SIZE)
+            if data:
+                yield data
+
+            if decompressor.eof:
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                has_data = False
+            else:
+                chunk = decompressor.unconsumed_tail
+
+    data = decompressor.flush()
+    if data:
+        yield data
+    if has_data and not decompressor.eof:
+        raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+    """
+    Split data chunks into lines (with the line endings), lines can be split across the chunk boundaries.
+    """
+    parts = []
+
+    for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b'\n', start)
+            if end < 0:
+                if start < len(chunk):
+                    parts.append(chunk[start:])
+                break
+
+            parts.append(chunk[start:end + 1])
+            yield b''.join(parts)
+            parts = []
+            start = end + 1
+
+    if parts:
+        yield b''.join(parts)
@@ -1,20 +1,275 @@
 """
 Module with the backend for handling Live Event Tracking.
 """
+import atexit
+import json
 from logging import getLogger
+import os
+import queue
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, InterfaceError, OperationalError
+from django.utils.dateparse import parse_datetime
 
 from rg_instructor_analytics_log_collector.processors.processor import Processor
+from rg_instructor_analytics_log_collector.spool import Spool
 
 log = getLogger(__name__)
 
+MODE_SYNC = 'sync'
+MODE_ASYNC = 'async'
+MODE_SPOOL = 'spool'
+
+OVERFLOW_DROP = 'drop'
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_SPILL = 'spill'
+
+
+class EventJSONEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder of the live events, values unknown to the DjangoJSONEncoder are stored as strings.
+    """
+
+    def default(self, o):  # NOQA
+        try:
+            return super().default(o)
+        except TypeError:
+            return str(o)
+
+
+def dump_event_data(event_data) -> str:
+    """
+    Serialize the live event data into the JSON line.
+    """
+    return json.dumps(event_data, cls=EventJSONEncoder)
+
+
+def load_event_data(line: str) -> dict:
+    """
+    Deserialize the live event data from the JSON line (result of `dump_event_data`).
+    """
+    event_data = json.loads(line)
+    if isinstance(event_data['log_time'], str):
+        event_data['log_time'] = parse_datetime(event_data['log_time'])
+    return event_data
+
+
+class AsyncEventsWorker:
+    """
+    Background worker processing the queued live events by micro-batches.
+
+    The worker thread is started lazily in the process, that puts the first event (so it is (re)started in every
+    forked web server worker). Events that do not fit the queue are handled according to the `overflow`:
+    - drop: the event is dropped and counted;
+    - block: the caller waits up to `block_timeout` seconds for the free space, then the event is dropped;
+    - spill: the event is appended to the `spill_path` file, which is replayed when the queue is drained.
+
+    If the database is not available, the batch is appended to the `spill_path` file (if it is set), otherwise it is
+    retried up to `max_retries` times with the growing `retry_interval` before it is dropped.
+    """
+
+    def __init__(
+        self,
+        processor,
+        queue_size=10000,
+        batch_size=500,
+        flush_interval=1.0,
+        overflow=OVERFLOW_DROP,
+        block_timeout=1.0,
+        spill_path=None,
+        shutdown_timeout=10.0,
+        max_retries=3,
+        retry_interval=1.0,
+    ):
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_BLOCK, OVERFLOW_SPILL):
+            raise ValueError(f'Unknown overflow behavior: {overflow}')
+        if overflow == OVERFLOW_SPILL and not spill_path:
+            raise ValueError('spill_path is required for the spill overflow behavior')
+
+        self.processor = processor
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self.shutdown_timeout = shutdown_timeout
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.dropped_counter = 0
+        self.spilled_counter = 0
+        self.processed_counter = 0
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _ensure_started(self):
+        """
+        Start the worker thread in the current process.
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='rg-analytics-events-worker', daemon=True)
+            self._thread.start()
+            if self._pid is None:
+                atexit.register(self.close)
+            self._pid = os.getpid()
+
+    def put(self, event_data):
+        """
+        Enqueue the live event data.
+        """
+        self._ensure_started()
+        try:
+            if self.overflow == OVERFLOW_BLOCK:
+                self._queue.put(event_data, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event_data)
+        except queue.Full:
+            if self.overflow == OVERFLOW_SPILL:
+                self._spill([event_data])
+            else:
+                self.dropped_counter += 1
+                if self.dropped_counter == 1 or not self.dropped_counter % 1000:
+                    log.warning(f'RG LC live events queue is full, dropped events: {self.dropped_counter}')
+
+    def _spill(self, events_data):
+        """
+        Append the events data to the spill file.
+        """
+        lines = ''.join(dump_event_data(event_data) + '\n' for event_data in events_data)
+        with self._lock:
+            with open(self.spill_path, 'a') as spill_file:
+                spill_file.write(lines)
+            self.spilled_counter += len(events_data)
+
+    def _get_batch(self):
+        """
+        Return up to `batch_size` of the queued events, waiting up to `flush_interval` for the first one.
+        """
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch):
+        """
+        Process the batch of the events, the worker never stops on errors.
+
+        Batches failed because the database is not available are spilled or retried (see the class description).
+        """
+        for attempt in range(self.max_retries + 1):
+            close_old_connections()
+            try:
+                self.processor.process_batch(batch)
+            except (InterfaceError, OperationalError):
+                if self.spill_path:
+                    log.warning(f'RG LC database is not available, the batch of {len(batch)} live events is spilled')
+                    self._spill(batch)
+                    return
+                if attempt < self.max_retries:
+                    log.warning(f'RG LC database is not available, the batch of {len(batch)} live events is retried')
+                    time.sleep(self.retry_interval * 2 ** attempt)
+                    continue
+                self.dropped_counter += len(batch)
+                log.exception(f'RG LC failed to process the batch of {len(batch)} live events, events are dropped')
+                return
+            except Exception:
+                log.exception(f'RG LC failed to process the batch of {len(batch)} live events')
+            self.processed_counter += len(batch)
+            return
+
+    def _replay_spill(self):
+        """
+        Process the events of the spill file, if it exists.
+        """
+        replay_path = f'{self.spill_path}.replay'
+        with self._lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.rename(self.spill_path, replay_path)
+
+        batch = []
+        with open(replay_path) as replay_file:
+            for line in replay_file:
+                try:
+                    batch.append(load_event_data(line))
+                except (ValueError, KeyError):
+                    log.error(f'RG LC can not parse the spilled event: {line}')
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._process(batch)
+                    batch = []
+        if batch:
+            self._process(batch)
+        os.remove(replay_path)
+
+    def _run(self):
+        """
+        Process the queued events until the worker is closed and the queue is drained.
+        """
+        try:
+            while not self._stopped.is_set() or not self._queue.empty():
+                batch = self._get_batch()
+                if batch:
+                    self._process(batch)
+                elif self.spill_path:
+                    self._replay_spill()
+            if self.spill_path:
+                self._replay_spill()
+        finally:
+            connection.close()
+
+    def close(self):
+        """
+        Flush the queued events and stop the worker (called on the process shutdown).
+        """
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._stopped.set()
+        self._thread.join(self.shutdown_timeout)
+        if self._thread.is_alive():
+            log.warning(f'RG LC live events worker is not finished in {self.shutdown_timeout}s, '
+                        f'{self._queue.qsize()} events are lost')
+
 
 class RGAnalyticsBackend:
     """
     Event tracker backend that handle live events and store data into RG IA database.
+
+    In the `async` mode `send` only enqueues the event, events are processed by the background worker in
+    micro-batches (see `AsyncEventsWorker` for the options).
+    In the `spool` mode `send` only appends the event to the durable local spool (see `Spool` for the options),
+    events are processed by the Log Watcher with the `spool` backend.
     """
 
     processor = Processor(["enrollment", "video_views", "discussion", "student_step", "course_activity"])
 
+    def __init__(self, mode=MODE_SYNC, **options):
+        if mode not in (MODE_SYNC, MODE_ASYNC, MODE_SPOOL):
+            raise ValueError(f'Unknown RG analytics backend mode: {mode}')
+        self.worker = AsyncEventsWorker(self.processor, **options) if mode == MODE_ASYNC else None
+        self.spool = Spool(**options) if mode == MODE_SPOOL else None
+
     def send(self, event):
         """
         Handle and store event's data into the database.
@@ -28,5 +283,17 @@ class RGAnalyticsBackend:
         except KeyError:
             log.exception(f'The structure of the event does not contain expected fields: {event}')
             return
+
+        if self.worker:
+            self.worker.put(event_data)
+            return
+
+        if self.spool:
+            try:
+                self.spool.append(dump_event_data(event_data))
+            except OSError:
+                log.exception(f'RG LC can not spool the event: {event_data["message_type"]}')
+            return
+
         log.debug(f'RG LC processing following event: {event_data["message_type"]}')
         self.processor.process(event_data)
@@ -0,0 +1,162 @@
+"""
+Module with the watchers of the tracking log directory and the scheduler of the log collector cycles.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import time
+
+log = logging.getLogger(__name__)
+
+# inotify event masks, see `man 7 inotify`
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+
+class PollingWatcher:
+    """
+    Watcher, that detects changes of the tracking log directory by comparing snapshots of the files stats.
+    """
+
+    def __init__(self, directory: str, poll_interval: float = 5):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> dict:
+        """
+        Return dict in format {<file name>: (<inode>, <size>, <modification time>)} of the tracking log files.
+        """
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.split('.')[-1] in ('gz', 'log'):
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except OSError as err:
+            log.warning(f'Can not read log directory {self.directory}: {err}')
+        return snapshot
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the tracking log files are changed or timeout is expired.
+
+        return: (bool) True if changes were detected.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+            snapshot = self._take_snapshot()
+            if snapshot != self._snapshot:
+                self._snapshot = snapshot
+                return True
+
+    def close(self):
+        """
+        Release watcher resources.
+        """
+        pass
+
+
+class InotifyWatcher:
+    """
+    Watcher, that wakes up on the file creation, append and rotation events provided by the Linux inotify API.
+    """
+
+    EVENTS_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, directory: str):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError('Can not find libc to use inotify')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.EVENTS_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {directory}')
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the tracking log directory is changed or timeout is expired.
+
+        return: (bool) True if changes were detected.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+
+        # NOTE: all pending events are dropped, the log collector rescans the whole directory anyway.
+        while True:
+            try:
+                if not os.read(self.fd, self.READ_SIZE):
+                    break
+            except BlockingIOError:
+                break
+        return True
+
+    def close(self):
+        """
+        Release inotify file descriptor.
+        """
+        os.close(self.fd)
+
+
+def get_file_watcher(directory: str, poll_interval: float = 5):
+    """
+    Return inotify based watcher of the tracking log directory or polling one if inotify is not available.
+    """
+    try:
+        return InotifyWatcher(directory)
+    except (OSError, AttributeError) as err:
+        log.info(f'inotify is not available ({err}), fall back to the polling watcher')
+        return PollingWatcher(directory, poll_interval)
+
+
+class AdaptiveScheduler:
+    """
+    Scheduler of the log collector cycles.
+
+    Next cycle starts immediately while there is a backlog, otherwise the delay grows from `min_delay` up to
+    `max_delay` while the log collector stays idle.
+    """
+
+    def __init__(self, min_delay: float = 1, max_delay: float = 300, backoff_factor: float = 2):
+        self.min_delay = min_delay
+        self.max_delay = max(max_delay, min_delay)
+        self.backoff_factor = backoff_factor
+        self.delay = 0
+
+    def next_delay(self, has_backlog: bool) -> float:
+        """
+        Return delay (in seconds) before the next cycle.
+        """
+        if has_backlog:
+            self.delay = 0
+        elif not self.delay:
+            self.delay = self.min_delay
+        else:
+            self.delay = min(self.delay * self.backoff_factor, self.max_delay)
+        return self.delay
+
+    def reset(self):
+        """
+        Drop the idle backoff, for ex. after new data is detected.
+        """
+        self.delay = 0
@@ -0,0 +1,370 @@
+"""
+Per-stage timing and query-count instrumentation of the log collecting and processing.
+
+Stages (e.g. `read`, `parse`, `store`, `format`, `push`) collect wall time, calls, SQL queries count and time, rows
+in and out. Values are aggregated by the stage name and labels (`backend`, `file`, `pipeline`) and emitted to the
+configured sinks on `flush` (the Log Watcher flushes metrics after every cycle).
+
+Instrumentation is disabled until `metrics.configure` is called. With the `sample_rate` below 1 only the sampled
+stage instances (e.g. files, chunks) are measured, others cost a single random number.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import logging
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+from django.db import connection
+
+log = logging.getLogger(__name__)
+
+FIELDS = ('calls', 'seconds', 'queries', 'query_seconds', 'rows_in', 'rows_out')
+
+
+class Stage:
+    """
+    Accumulated measurement of the stage instance.
+
+    Every `with stage:` block is measured as a call, SQL queries of the block are counted if the block runs inside
+    of the `Metrics.measure`. Accumulated values are added to the metrics on `commit`.
+    """
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.calls = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self._started = 0.0
+
+    def __enter__(self):  # NOQA
+        self.metrics.get_stack().append(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):  # NOQA
+        self.seconds += time.perf_counter() - self._started
+        self.calls += 1
+        self.metrics.get_stack().pop()
+
+    def commit(self):
+        """
+        Add the accumulated values to the metrics.
+        """
+        self.metrics.add(self)
+
+
+class NullStage:
+    """
+    Stage of the disabled or not sampled instrumentation, does nothing.
+    """
+
+    rows_in = 0
+    rows_out = 0
+
+    def __enter__(self):  # NOQA
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):  # NOQA
+        pass
+
+    def __setattr__(self, key, value):  # NOQA
+        pass
+
+    def commit(self):
+        """
+        Do nothing.
+        """
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class Metrics:
+    """
+    Registry of the stages metrics.
+    """
+
+    def __init__(self):
+        self.sinks = []
+        self.sample_rate = 1.0
+        self._stats = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        """
+        Return True if any sink is configured.
+        """
+        return bool(self.sinks)
+
+    def configure(self, sinks, sample_rate=1.0):
+        """
+        Enable instrumentation.
+
+        :param sinks: list of the sinks (see `get_sink`).
+        :param sample_rate: fraction of the measured stage instances (0 < sample_rate <= 1).
+        """
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f'Sample rate must be in (0, 1]: {sample_rate}')
+        self.sinks = list(sinks)
+        self.sample_rate = sample_rate
+
+    def get_stack(self):
+        """
+        Return the stack of the entered stages of the current thread.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def labels(self, **labels):
+        """
+        Add labels to the stages created in the block (in the current thread).
+        """
+        previous_labels = getattr(self._local, 'labels', {})
+        self._local.labels = dict(previous_labels, **labels)
+        try:
+            yield
+        finally:
+            self._local.labels = previous_labels
+
+    def stage(self, name, **labels):
+        """
+        Return the stage for the accumulated measurement (NULL_STAGE if it is not sampled), see `Stage`.
+        """
+        if not self.sinks or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return NULL_STAGE
+        return Stage(self, name, dict(getattr(self._local, 'labels', {}), **labels))
+
+    @contextmanager
+    def measure(self, name, **labels):
+        """
+        Measure the block as a single stage call including its SQL queries.
+
+        Queries are attributed to the innermost entered stage.
+        """
+        stage = self.stage(name, **labels)
+        if stage is NULL_STAGE:
+            yield stage
+            return
+
+        try:
+            if getattr(self._local, 'is_counting_queries', False):
+                # NOTE: queries wrapper is already installed by the outer stage.
+                with stage:
+                    yield stage
+            else:
+                self._local.is_counting_queries = True
+                try:
+                    with connection.execute_wrapper(self._count_query), stage:
+                        yield stage
+                finally:
+                    self._local.is_counting_queries = False
+        finally:
+            stage.commit()
+
+    def _count_query(self, execute, sql, params, many, context):
+        """
+        Attribute the query to the innermost entered stage.
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stack = self.get_stack()
+            if stack:
+                stack[-1].queries += 1
+                stack[-1].query_seconds += time.perf_counter() - started
+
+    def iter_timed(self, iterable, stage):
+        """
+        Measure getting of every item of the iterable as a call of the stage, items are counted as the rows in.
+        """
+        if stage is NULL_STAGE:
+            return iterable
+        return self._iter_timed(iter(iterable), stage)
+
+    @staticmethod
+    def _iter_timed(iterator, stage):
+        """
+        Yield items of the iterator measured by the stage.
+        """
+        while True:
+            with stage:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            stage.rows_in += 1
+            yield item
+
+    def add(self, stage):
+        """
+        Add values of the stage.
+        """
+        key = (stage.name, tuple(sorted(stage.labels.items())))
+        with self._lock:
+            stats = self._stats[key]
+            for field in FIELDS:
+                stats[field] += getattr(stage, field)
+
+    def flush(self):
+        """
+        Emit the collected metrics to the sinks and reset them.
+        """
+        if not self.sinks:
+            return
+
+        with self._lock:
+            snapshot = [(name, dict(labels), stats) for (name, labels), stats in self._stats.items()]
+            self._stats.clear()
+
+        for sink in self.sinks:
+            try:
+                sink.emit(snapshot, self.sample_rate)
+            except Exception:
+                log.exception(f'RG LC failed to emit metrics to {sink}')
+
+
+class LogSink:
+    """
+    Emit every stage metrics as a JSON log line.
+    """
+
+    def emit(self, snapshot, sample_rate):
+        """
+        Log the snapshot.
+        """
+        for name, labels, stats in snapshot:
+            log.info('RG LC metrics: {}'.format(json.dumps(
+                dict(stage=name, sample_rate=sample_rate, **labels, **stats), sort_keys=True
+            )))
+
+
+class PrometheusTextfileSink:
+    """
+    Write cumulative metrics to the Prometheus textfile (for the node exporter textfile collector).
+
+    The `file` label is not exported (it has unbounded cardinality), metrics are summed over it. Sampled values are
+    scaled by `1 / sample_rate`, so the counters estimate the totals of all stage instances.
+    """
+
+    PREFIX = 'rg_log_collector_stage'
+    EXCLUDED_LABELS = ('file',)
+
+    def __init__(self, path):
+        self.path = path
+        self._totals = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+
+    def emit(self, snapshot, sample_rate):
+        """
+        Add the snapshot to the totals and rewrite the file atomically.
+        """
+        for name, labels, stats in snapshot:
+            labels = tuple(sorted(
+                (key, value) for key, value in dict(labels, stage=name).items() if key not in self.EXCLUDED_LABELS
+            ))
+            totals = self._totals[labels]
+            for field in FIELDS:
+                totals[field] += stats[field] / sample_rate if sample_rate < 1 else stats[field]
+
+        lines = []
+        for field in FIELDS:
+            metric = f'{self.PREFIX}_{field}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for labels, totals in sorted(self._totals.items()):
+                labels_text = ','.join('{}="{}"'.format(key, str(value).replace('"', '\\"')) for key, value in labels)
+                lines.append(f'{metric}{{{labels_text}}} {totals[field]}')
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as metrics_file:
+            metrics_file.write('\n'.join(lines) + '\n')
+        os.replace(metrics_file.name, self.path)
+
+
+class StatsdSink:
+    """
+    Send metrics as statsd counters over UDP: `<prefix>.<stage>[.<label value>...].<field>:<value>|c[|@<rate>]`.
+
+    Time fields are sent in milliseconds, the `file` label is not sent (it has unbounded cardinality). Sampled values
+    are sent with the sample rate, so the statsd server scales them.
+    """
+
+    EXCLUDED_LABELS = ('file',)
+    MAX_PACKET_SIZE = 1432
+
+    def __init__(self, host, port, prefix='rg_log_collector'):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @staticmethod
+    def _sanitize(value):
+        """
+        Return the metric name part without the statsd special characters.
+        """
+        return ''.join(char if char.isalnum() or char in '-_' else '_' for char in str(value))
+
+    def emit(self, snapshot, sample_rate):
+        """
+        Send the snapshot by packets.
+        """
+        packet = []
+        rate_suffix = f'|@{sample_rate}' if sample_rate < 1 else ''
+        for name, labels, stats in snapshot:
+            parts = [self.prefix, name] + [
+                self._sanitize(value) for key, value in sorted(labels.items()) if key not in self.EXCLUDED_LABELS
+            ]
+            for field in FIELDS:
+                value = stats[field]
+                if field.endswith('seconds'):
+                    field, value = field.replace('seconds', 'ms'), value * 1000
+                line = '{}.{}:{}|c{}'.format('.'.join(parts), field, round(value, 3), rate_suffix)
+                if packet and sum(len(item) + 1 for item in packet) + len(line) > self.MAX_PACKET_SIZE:
+                    self._send(packet)
+                    packet = []
+                packet.append(line)
+        if packet:
+            self._send(packet)
+
+    def _send(self, lines):
+        """
+        Send the packet, statsd metrics are best-effort.
+        """
+        try:
+            self.socket.sendto('\n'.join(lines).encode('utf-8'), self.address)
+        except OSError:
+            log.warning(f'RG LC can not send metrics to statsd {self.address}')
+
+
+def get_sink(spec):
+    """
+    Return the sink by its specification: `log`, `prometheus:<path>` or `statsd:<host>:<port>`.
+    """
+    kind, _, options = spec.partition(':')
+    if kind == 'log' and not options:
+        return LogSink()
+    if kind == 'prometheus' and options:
+        return PrometheusTextfileSink(options)
+    if kind == 'statsd' and options:
+        host, _, port = options.rpartition(':')
+        if host and port.isdigit():
+            return StatsdSink(host, port)
+    raise ValueError(f'Unknown metrics sink: {spec}')
+
+
+metrics = Metrics()
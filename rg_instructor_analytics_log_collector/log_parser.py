@@ -0,0 +1,154 @@
+"""
+Parsing of the tracking log lines into the LogTable records.
+
+The module does not use the database, so archived files can be parsed in the worker processes (see
+`BaseLogCollectorBackend` `ingest_workers`).
+"""
+from collections import OrderedDict
+import gzip
+import hashlib
+import json
+import logging
+import pickle
+import sys
+import threading
+from typing import Tuple
+
+from rg_instructor_analytics_log_collector.backends.streaming import iter_gunzip, iter_lines
+
+log = logging.getLogger(__name__)
+
+# NOTE: fields of the parsed record, records of the worker processes are passed as tuples in this order.
+RECORD_FIELDS = ('message_type', 'message_type_hash', 'log_time', 'user_name', 'log_message')
+# NOTE: number of the records in the batch written by the worker process (see `parse_archive`).
+PARSED_BATCH_SIZE = 1024
+# NOTE: there are a few thousand of the distinct event types, the least recently used ones are evicted above the limit.
+EVENT_TYPES_MAX_SIZE = 10000
+
+
+class EventTypes:
+    """
+    Bounded LRU table of the interned event types: {<message_type>: (<message_type>, <sha256 hash>, <id>)}.
+
+    Event types are hashed once per process (the table is reused across files and cycles, and is inherited by the
+    forked ingest workers). Records of the same event type share the interned strings of the type and its hash.
+    IDs are small integers assigned in the order of the first appearance, evicted types get the new IDs.
+    """
+
+    def __init__(self, max_size: int = EVENT_TYPES_MAX_SIZE):
+        self.max_size = max_size
+        self._types = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):  # NOQA
+        return len(self._types)
+
+    def get(self, message_type: str) -> Tuple[str, str, int]:
+        """
+        Return the interned event type, its hash and ID.
+        """
+        entry = self._types.get(message_type)
+        if entry is not None:
+            try:
+                self._types.move_to_end(message_type)
+            except KeyError:
+                # NOTE: the type is evicted by the other thread, the entry is still valid.
+                pass
+            return entry
+
+        with self._lock:
+            entry = self._types.get(message_type)
+            if entry is None:
+                entry = (
+                    sys.intern(message_type), hashlib.sha256(message_type.encode('utf-8')).hexdigest(), self._next_id
+                )
+                self._next_id += 1
+                self._types[message_type] = entry
+                if len(self._types) > self.max_size:
+                    self._types.popitem(last=False)
+        return entry
+
+
+event_types = EventTypes()
+
+
+def parse_log_string(log_string):
+    """
+    Parse the tracking log line into the LogTable record.
+
+    :param log_string: (str or bytes) the log line.
+    return: (dict) the record fields (see `RECORD_FIELDS`) or None if the line is broken.
+    """
+    try:
+        if type(log_string) is not str:
+            # it is bytes in python 3
+            log_string = log_string.decode('utf-8')
+        json_log = json.loads(log_string)
+        message_type, message_type_hash, _ = event_types.get(
+            'event_type' in json_log and json_log['event_type'] or json_log['name']
+        )
+        data = {
+            'message_type': message_type,
+            'message_type_hash': message_type_hash,
+            'log_time': 'time' in json_log and json_log['time'] or json_log['timestamp'],
+            'log_message': log_string,
+            'user_name': json_log.get('username', json_log.get('context', {}).get('username'))
+        }
+    except ValueError as e:
+        log.error('can not parse json from the log string ({})\n\t{}'.format(log_string, repr(e)))
+    except (IndexError, KeyError) as e:
+        log.exception('corrupted structure of the log json ({})\n\t{}'.format(log_string, repr(e)))
+    else:
+        return data
+    return None
+
+
+def parse_archive(source, batches_path, batch_size=PARSED_BATCH_SIZE):
+    """
+    Decompress and parse the archived tracking log file into the batches file (runs in the worker process).
+
+    Records are written to the file as the pickled lists of up to `batch_size` tuples of `RECORD_FIELDS`, so neither
+    the worker nor the parent process holds the whole file in memory (see `iter_parsed_batches`).
+    :param source: path to the archived file or its compressed content (bytes).
+    :param batches_path: path to the file the batches are written to.
+    return: (tuple) the number of the read lines and the number of the parsed records.
+    """
+    with open(batches_path, 'wb') as batches_file:
+        if isinstance(source, str):
+            with gzip.open(source) as log_file:
+                return _write_batches(log_file, batches_file, batch_size)
+        return _write_batches(iter_lines(iter_gunzip([source])), batches_file, batch_size)
+
+
+def iter_parsed_batches(batches_path):
+    """
+    Yield the batches of the records tuples written by `parse_archive`.
+    """
+    with open(batches_path, 'rb') as batches_file:
+        while True:
+            try:
+                yield pickle.load(batches_file)
+            except EOFError:
+                return
+
+
+def _write_batches(lines, batches_file, batch_size):
+    """
+    Parse the log lines into the records tuples and write them by batches.
+    """
+    lines_counter = records_counter = 0
+    batch = []
+    for log_string in lines:
+        lines_counter += 1
+        data = parse_log_string(log_string)
+        if data is not None:
+            batch.append(tuple(data[field] for field in RECORD_FIELDS))
+            if len(batch) >= batch_size:
+                pickle.dump(batch, batches_file, pickle.HIGHEST_PROTOCOL)
+                records_counter += len(batch)
+                batch = []
+    if batch:
+        pickle.dump(batch, batches_file, pickle.HIGHEST_PROTOCOL)
+        records_counter += len(batch)
+    return lines_counter, records_counter
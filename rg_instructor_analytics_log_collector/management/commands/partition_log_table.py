@@ -0,0 +1,55 @@
+"""
+Management command for the partition-based retention of the LogTable records.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from rg_instructor_analytics_log_collector import retention
+
+
+class Command(BaseCommand):
+    """
+    Partition LogTable by log time, create future partitions and drop the processed ones.
+    """
+
+    help = (
+        'Maintain RANGE partitions of LogTable on log_time (MySQL only): create partitions ahead of time and drop the '
+        'partitions older than the oldest pipeline checkpoint. Use --convert once to partition the existing table.'
+    )
+
+    def add_arguments(self, parser):  # NOQA
+        parser.add_argument(
+            '--convert', action='store_true',
+            help='Convert the not partitioned LogTable (rebuilds the table, long operation for the large tables)'
+        )
+        parser.add_argument(
+            '--period', choices=sorted(retention.PERIODS), default=retention.PERIOD_DAY,
+            help='Period of the partitions of the converted table (default: day)'
+        )
+        parser.add_argument(
+            '--ahead', type=int, default=7,
+            help='Number of the partitions created ahead of the current one (default: 7)'
+        )
+        parser.add_argument(
+            '--keep-processed', action='store_true', help='Do not drop the partitions of the processed records'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Print SQL statements without executing them')
+
+    def handle(self, *args, **options):  # NOQA
+        statements = []
+        try:
+            if options['convert']:
+                statements += retention.get_partitioning_statements(options['period'], options['ahead'])
+            elif not retention.get_partitions():
+                raise CommandError('LogTable is not partitioned, run the command with --convert first')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not options['convert']:
+            statements += retention.get_future_partitions_statements(options['ahead'])
+            if not options['keep_processed']:
+                statements += retention.get_drop_partitions_statements()
+
+        for statement in statements:
+            self.stdout.write(statement)
+        if not options['dry_run']:
+            retention.execute(statements)
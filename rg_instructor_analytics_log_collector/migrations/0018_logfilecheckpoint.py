@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rg_instructor_analytics_log_collector', '0017_auto_20191126_0629'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogFileCheckpoint',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('file_name', models.CharField(max_length=255, unique=True)),
+                ('inode', models.BigIntegerField(default=0)),
+                ('size', models.BigIntegerField(default=0)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('fingerprint', models.CharField(blank=True, default='', max_length=64)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+
+import zlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+# NOTE: the users set codec is copied from `user_id_set.UserIdSet` as of this migration, so later changes of the module
+# do not change the data written by the migration.
+def _to_bytes(user_ids):
+    if not user_ids:
+        return b''
+
+    encoded = bytearray()
+    previous = 0
+    for user_id in sorted(user_ids):
+        delta = user_id - previous
+        previous = user_id
+        while delta >= 0x80:
+            encoded.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        encoded.append(delta)
+    return zlib.compress(bytes(encoded))
+
+
+def _from_bytes(data):
+    user_ids = set()
+    if not data:
+        return user_ids
+
+    user_id = delta = shift = 0
+    for byte in zlib.decompress(bytes(data)):
+        delta |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        user_id += delta
+        user_ids.add(user_id)
+        delta = shift = 0
+    return user_ids
+
+
+def _from_comma_separated(users_ids):
+    return {int(user_id) for user_id in (users_ids or '').split(',') if user_id.strip()}
+
+
+def _to_comma_separated(user_ids):
+    return ','.join(str(user_id) for user_id in sorted(user_ids))
+
+
+def _convert(apps, model_names, convert_row, fields):
+    for model_name in model_names:
+        model = apps.get_model('rg_instructor_analytics_log_collector', model_name)
+        batch = []
+        for row in model.objects.all().iterator():
+            convert_row(row)
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_update(batch, fields)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, fields)
+
+
+def pack_users_ids(apps, schema_editor):
+    """
+    Copy comma separated users ids into the packed users set.
+
+    The deprecated `users_ids` are kept for the external readers (they are not updated anymore).
+    """
+    def convert_row(row):
+        row.users_set = _to_bytes(_from_comma_separated(row.users_ids))
+
+    _convert(apps, ['CourseVisitsByDay', 'VideoViewsByDay'], convert_row, ['users_set'])
+
+
+def unpack_users_ids(apps, schema_editor):
+    """
+    Restore comma separated users ids from the packed users set.
+    """
+    def convert_row(row):
+        row.users_ids = _to_comma_separated(_from_bytes(row.users_set))
+        row.users_set = b''
+
+    _convert(apps, ['CourseVisitsByDay', 'VideoViewsByDay'], convert_row, ['users_ids', 'users_set'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rg_instructor_analytics_log_collector', '0018_logfilecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursevisitsbyday',
+            name='users_set',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='videoviewsbyday',
+            name='users_set',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(pack_users_ids, unpack_users_ids),
+    ]
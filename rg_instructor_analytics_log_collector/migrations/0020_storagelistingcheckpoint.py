@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rg_instructor_analytics_log_collector', '0019_users_set'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageListingCheckpoint',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('last_key', models.CharField(blank=True, default='', max_length=1024)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
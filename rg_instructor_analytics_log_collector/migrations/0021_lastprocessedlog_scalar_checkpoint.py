@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+
+from django.db import migrations, models
+
+
+def copy_checkpoints(apps, schema_editor):
+    """
+    Store log time and id of the last processed LogTable records in the checkpoints.
+    """
+    model = apps.get_model('rg_instructor_analytics_log_collector', 'LastProcessedLog')
+    for row in model.objects.select_related('log_table'):
+        row.log_time = row.log_table.log_time
+        row.log_id = row.log_table_id
+        row.save(update_fields=['log_time', 'log_id'])
+
+
+def restore_checkpoints(apps, schema_editor):
+    """
+    Restore references to the last processed LogTable records, checkpoints of the deleted records are removed.
+    """
+    model = apps.get_model('rg_instructor_analytics_log_collector', 'LastProcessedLog')
+    log_table_model = apps.get_model('rg_instructor_analytics_log_collector', 'LogTable')
+    for row in model.objects.all():
+        if log_table_model.objects.filter(id=row.log_id).exists():
+            row.log_table_id = row.log_id
+            row.save(update_fields=['log_table'])
+        else:
+            row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rg_instructor_analytics_log_collector', '0020_storagelistingcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lastprocessedlog',
+            name='log_time',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='lastprocessedlog',
+            name='log_id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='lastprocessedlog',
+            name='log_table',
+            field=models.ForeignKey(
+                null=True, on_delete=models.deletion.CASCADE, to='rg_instructor_analytics_log_collector.LogTable'
+            ),
+        ),
+        migrations.RunPython(copy_checkpoints, restore_checkpoints),
+        migrations.RemoveField(
+            model_name='lastprocessedlog',
+            name='log_table',
+        ),
+        migrations.AlterField(
+            model_name='lastprocessedlog',
+            name='log_time',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='lastprocessedlog',
+            name='log_id',
+            field=models.BigIntegerField(),
+        ),
+    ]
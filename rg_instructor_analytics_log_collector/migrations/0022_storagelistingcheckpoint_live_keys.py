@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rg_instructor_analytics_log_collector', '0021_lastprocessedlog_scalar_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storagelistingcheckpoint',
+            name='live_keys',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
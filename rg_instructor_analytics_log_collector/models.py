@@ -5,6 +5,34 @@ from django.core.validators import validate_comma_separated_integer_list
 from django.db import models
 
 from openedx.core.djangoapps.xmodule_django.models import CourseKeyField
+from rg_instructor_analytics_log_collector.user_id_set import UserIdSet
+
+
+class DistinctUsersMixin:
+    """
+    Access to the per-day distinct users stored in the `users_set` field.
+
+    NOTE: `users_ids` comma separated field is deprecated, it keeps the users collected before the `users_set` was
+    introduced and is not updated anymore.
+    """
+
+    def get_users_set(self) -> UserIdSet:
+        """
+        Return distinct users of the day.
+        """
+        return UserIdSet.from_bytes(self.users_set)
+
+    def set_users_set(self, users: UserIdSet):
+        """
+        Store distinct users of the day.
+        """
+        self.users_set = users.to_bytes()
+
+    def get_users_ids(self):
+        """
+        Return list of the distinct users ids (as strings, like the legacy `users_ids.split(',')`).
+        """
+        return [str(user_id) for user_id in self.get_users_set()]
 
 
 class ProcessedZipLog(models.Model):
@@ -15,6 +43,39 @@ class ProcessedZipLog(models.Model):
     file_name = models.TextField(max_length=256)
 
 
+class LogFileCheckpoint(models.Model):
+    """
+    Read position of the uncompressed tracking log file, which is still being written.
+    """
+
+    file_name = models.CharField(max_length=255, unique=True)
+    inode = models.BigIntegerField(default=0)
+    size = models.BigIntegerField(default=0)
+    offset = models.BigIntegerField(default=0)
+    fingerprint = models.CharField(max_length=64, blank=True, default='')
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):  # NOQA
+        return '{} {}'.format(self.file_name, self.offset)
+
+
+class StorageListingCheckpoint(models.Model):
+    """
+    The last key of the file-storage listing prefix, all the archived tracking log files up to which are processed.
+
+    `live_keys` are the newline separated not archived log files listed before the `last_key`, they are re-listed on
+    every cycle.
+    """
+
+    source = models.CharField(max_length=255, unique=True)
+    last_key = models.CharField(max_length=1024, blank=True, default='')
+    live_keys = models.TextField(blank=True, default='')
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):  # NOQA
+        return '{} {}'.format(self.source, self.last_key)
+
+
 class LogTable(models.Model):
     """
     Log Records parsed from tracking gzipped log file.
@@ -65,7 +126,10 @@ class EnrollmentByDay(models.Model):
 
 class LastProcessedLog(models.Model):
     """
-    Last processed LogTable by Processor.
+    Last processed LogTable record by Processor.
+
+    The record is stored by its `log_time` and `id` (not a foreign key), so log records are deleted without
+    cascades and foreign key checks.
     """
 
     ENROLLMENT = 'EN'
@@ -82,13 +146,14 @@ class LastProcessedLog(models.Model):
         (COURSE_ACTIVITY, 'Course activity'),
     )
 
-    log_table = models.ForeignKey(LogTable, on_delete=models.CASCADE)
+    log_time = models.DateTimeField()
+    log_id = models.BigIntegerField()
     processor = models.CharField(max_length=2, choices=PROCESSOR_CHOICES, unique=True)
 
     @classmethod
     def get_last_date(cls):
         """Return the last log date."""
-        return cls.objects.all().aggregate(models.Min('log_table__log_time')).get('log_table__log_time__min')
+        return cls.objects.all().aggregate(models.Min('log_time')).get('log_time__min')
 
 
 class VideoViewsByUser(models.Model):
@@ -127,7 +192,7 @@ class VideoViewsByBlock(models.Model):
         return '{} {}'.format(self.course, self.video_block_id)
 
 
-class VideoViewsByDay(models.Model):
+class VideoViewsByDay(DistinctUsersMixin, models.Model):
     """
     Day's Video Views info.
     """
@@ -137,6 +202,7 @@ class VideoViewsByDay(models.Model):
     day = models.DateField()
     total = models.IntegerField(default=0)
     users_ids = models.TextField(blank=True, null=True, validators=[validate_comma_separated_integer_list])
+    users_set = models.BinaryField(blank=True, default=b'')
 
     class Meta:  # NOQA
         unique_together = ('course', 'day', 'video_block_id')
@@ -223,13 +289,14 @@ class LastCourseVisitByUser(models.Model):
         return '{}, user_id - {}'.format(self.course, self.user_id)
 
 
-class CourseVisitsByDay(models.Model):
+class CourseVisitsByDay(DistinctUsersMixin, models.Model):
     """
     Track the intensity of visits the course by the day.
     """
 
     course = CourseKeyField(max_length=255)
     users_ids = models.TextField(default='', validators=[validate_comma_separated_integer_list])
+    users_set = models.BinaryField(blank=True, default=b'')
     day = models.DateField(db_index=True)
     total = models.IntegerField(default=0)
 
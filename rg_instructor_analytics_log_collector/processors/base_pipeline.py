@@ -3,6 +3,9 @@ Collection of the base pipelines.
 """
 
 from abc import ABCMeta, abstractmethod
+import json
+
+from django.db.models import Q
 
 from rg_instructor_analytics_log_collector.models import LastProcessedLog, LogTable
 
@@ -29,6 +32,11 @@ class BasePipeline(metaclass=ABCMeta):
     Processor name for the last processed LogTable.
     """
     processor_name = None
+    """
+    Pipeline collects formatted records of the chunk and pushes them with `push_batch_to_database`.
+    Should be set only if `format` of the next record does not depend on the pushed previous ones.
+    """
+    write_behind = False
 
     def is_process_event(self, event_type):
         """
@@ -38,29 +46,66 @@ class BasePipeline(metaclass=ABCMeta):
             return True
         return False
 
+    @staticmethod
+    def get_event_body(record, live_event: bool = False):
+        """
+        Return decoded event of the record.
+
+        Records of the fan-out processing are decoded once by the Processor and carry the result in `event_body`.
+        :param record:  raw log record (or json object if live_event == True).
+        :param live_event: flag to handle live events.
+        """
+        if live_event:
+            return record.get('log_message')
+
+        event_body = getattr(record, 'event_body', None)
+        if event_body is None:
+            event_body = json.loads(record.log_message)
+        return event_body
+
     def retrieve_last_date(self):
         """
         Fetch the moment of time daily enrollments were lastly updated.
 
         :return: DateTime or None
         """
-        last_processed_log_table = LastProcessedLog.objects.filter(
+        return LastProcessedLog.objects.filter(
             processor=self.processor_name
-        ).first()
+        ).values_list('log_time', flat=True).first()
 
-        return last_processed_log_table and last_processed_log_table.log_table.log_time
+    def retrieve_last_processed_log(self):
+        """
+        Fetch the position of the last processed LogTable record.
+
+        :return: tuple (log_time, log_id) or None
+        """
+        return LastProcessedLog.objects.filter(
+            processor=self.processor_name
+        ).values_list('log_time', 'log_id').first()
+
+    @staticmethod
+    def get_not_processed_filter(last_processed_log):
+        """
+        Return the filter of the LogTable records after the last processed one in the (log_time, id) order.
+
+        Records sharing the `log_time` of the last processed one are kept if their id is greater, so the processing
+        resumed after a crash does not skip them.
+        :param last_processed_log: tuple (log_time, log_id) (see `retrieve_last_processed_log`).
+        """
+        log_time, log_id = last_processed_log
+        return Q(log_time__gt=log_time) | Q(log_time=log_time, id__gt=log_id)
 
     def get_query(self):
         """
         Return list of the raw logs with type, that suitable for the given pipeline.
         """
         query = LogTable.objects.filter(message_type__in=self.supported_types)
-        last_processed_log_date = self.retrieve_last_date()
+        last_processed_log = self.retrieve_last_processed_log()
 
-        if last_processed_log_date:
-            query = query.filter(log_time__gt=last_processed_log_date)
+        if last_processed_log:
+            query = query.filter(self.get_not_processed_filter(last_processed_log))
 
-        return query.order_by('log_time')
+        return query.order_by('log_time', 'id')
 
     @abstractmethod
     def format(self, record, live_event: bool = False):
@@ -83,10 +128,22 @@ class BasePipeline(metaclass=ABCMeta):
         """
         pass
 
+    def push_to_database_batch(self, formatted_records):
+        """
+        Push to db final result of the chunk of records.
+
+        Used for the pipelines with `write_behind` set, pushes records one by one by default.
+        """
+        for formatted_record in formatted_records:
+            self.push_to_database(formatted_record)
+
     def update_last_processed_log(self, last_record):
         """
         Create or update last processed LogTable by Processor.
+
+        Processor calls it once per chunk, inside the chunk's transaction.
         """
         if last_record:
             LastProcessedLog.objects.update_or_create(processor=self.processor_name,
-                                                      defaults={'log_table': last_record})
+                                                      defaults={'log_time': last_record.log_time,
+                                                                'log_id': last_record.id})
@@ -1,17 +1,22 @@
 """
 Collection of the course activity pipeline.
 """
-import json
 import logging
 
+from django.db import IntegrityError, transaction
 from opaque_keys.edx.keys import CourseKey
 
 from rg_instructor_analytics_log_collector.models import CourseVisitsByDay, LastCourseVisitByUser, LastProcessedLog, \
     LogTable
 from rg_instructor_analytics_log_collector.processors.base_pipeline import BasePipeline
+from rg_instructor_analytics_log_collector.user_id_set import UserIdSet, UserIdSetCache
 
 log = logging.getLogger(__name__)
 
+# NOTE: decoded distinct users of the recently visited days, so the repeated visits of the live events do not decode
+#  the stored set.
+days_users_cache = UserIdSetCache()
+
 
 class CourseActivityPipeline(BasePipeline):
     """
@@ -20,18 +25,19 @@ class CourseActivityPipeline(BasePipeline):
 
     alias = 'course_activity'
     processor_name = LastProcessedLog.COURSE_ACTIVITY
+    write_behind = True
 
     def get_query(self):
         """
         Return list of the raw logs with type, that suitable for the given pipeline.
         """
         query = LogTable.objects.all()
-        last_processed_log_date = self.retrieve_last_date()
+        last_processed_log = self.retrieve_last_processed_log()
 
-        if last_processed_log_date:
-            query = query.filter(log_time__gt=last_processed_log_date)
+        if last_processed_log:
+            query = query.filter(self.get_not_processed_filter(last_processed_log))
 
-        return query.order_by('created')
+        return query.order_by('log_time', 'id')
 
     def format(self, record, live_event=False):
         """
@@ -40,7 +46,7 @@ class CourseActivityPipeline(BasePipeline):
         record: could be QuerySet (or json object if live_event == True)
         """
         data = None
-        event_body = record.get('log_message') if live_event else json.loads(record.log_message)
+        event_body = self.get_event_body(record, live_event)
         try:
             course_id = event_body['context']['course_id']
             user_id = event_body['context']['user_id']
@@ -69,29 +75,100 @@ class CourseActivityPipeline(BasePipeline):
     def push_to_database(self, record):
         """
         Save Course Activity info to the database.
+
+        The visit is written with the same path as the chunk (see `_push_visits`), so the users set of the recently
+        visited day is not decoded for every live event. If rows were created concurrently, the push is retried once
+        with the created rows.
+        """
+        try:
+            with transaction.atomic():
+                self._push_visits([record])
+        except IntegrityError:
+            with transaction.atomic():
+                self._push_visits([record])
+
+    def push_to_database_batch(self, records):
+        """
+        Save Course Activity info of the chunk of records to the database.
+
+        Visits are folded in memory per (course, user) and per (course, day), so the users set of the day is decoded,
+        merged and encoded once per chunk, the result is written with bulk inserts and updates. Falls back to the
+        per-record push if rows were created concurrently (for ex. by the live events backend).
+        """
+        try:
+            with transaction.atomic():
+                self._push_visits(records)
+        except IntegrityError:
+            log.warning('Course visits were changed concurrently, fall back to per-record push')
+            super().push_to_database_batch(records)
+
+    def _push_visits(self, records):
+        """
+        Bulk write the last visits of the users and the visits of the days.
+
+        Decoded users sets of the days are kept in the `days_users_cache`, so the visits of the known users do not
+        decode the stored set and are not written.
         """
-        course = CourseKey.from_string(record['course_id'])
-        user_id = str(record['user_id'])
-        log_time = record['log_time']
-
-        last_visit_by_user, created_last_visit = LastCourseVisitByUser.objects.get_or_create(
-            course=course,
-            user_id=user_id,
-            defaults={'log_time': log_time}
-        )
-
-        if not created_last_visit and last_visit_by_user.log_time < log_time:
-            last_visit_by_user.log_time = log_time
-            last_visit_by_user.save()
-
-        course_visits_by_day, created_course_visits = CourseVisitsByDay.objects.get_or_create(
-            course=course,
-            day=log_time.date(),
-        )
-
-        list_users_ids = course_visits_by_day.users_ids.split(',') if course_visits_by_day.users_ids else []
-
-        if user_id not in list_users_ids:
-            course_visits_by_day.users_ids += ',{}'.format(user_id) if list_users_ids else user_id
-            course_visits_by_day.total += 1
-            course_visits_by_day.save()
+        courses = {course_id: CourseKey.from_string(course_id) for course_id in {r['course_id'] for r in records}}
+        course_keys = {str(course): course for course in courses.values()}
+        last_visits = {}
+        days_users = {}
+        for record in records:
+            course = str(courses[record['course_id']])
+            log_time = record['log_time']
+            user_key = (course, int(record['user_id']))
+            if user_key not in last_visits or last_visits[user_key] < log_time:
+                last_visits[user_key] = log_time
+            days_users.setdefault((course, log_time.date()), UserIdSet()).add(record['user_id'])
+
+        saved_last_visits = {
+            (str(row.course), row.user_id): row for row in LastCourseVisitByUser.objects.filter(
+                course__in=list(course_keys.values()), user_id__in={user_id for _, user_id in last_visits},
+            )
+        }
+        new_last_visits, changed_last_visits = [], []
+        for (course, user_id), log_time in last_visits.items():
+            last_visit_by_user = saved_last_visits.get((course, user_id))
+            if last_visit_by_user is None:
+                new_last_visits.append(
+                    LastCourseVisitByUser(course=course_keys[course], user_id=user_id, log_time=log_time)
+                )
+            elif last_visit_by_user.log_time < log_time:
+                last_visit_by_user.log_time = log_time
+                changed_last_visits.append(last_visit_by_user)
+        if new_last_visits:
+            LastCourseVisitByUser.objects.bulk_create(new_last_visits)
+        if changed_last_visits:
+            LastCourseVisitByUser.objects.bulk_update(changed_last_visits, ['log_time'])
+
+        saved_days = {
+            (str(row.course), row.day): row for row in CourseVisitsByDay.objects.filter(
+                course__in=list(course_keys.values()), day__in={day for _, day in days_users},
+            )
+        }
+        new_days, changed_days, stored_days = [], [], []
+        for (course, day), day_users in days_users.items():
+            course_visits_by_day = saved_days.get((course, day))
+            if course_visits_by_day is None:
+                course_visits_by_day = CourseVisitsByDay(course=course_keys[course], day=day, total=len(day_users))
+                course_visits_by_day.set_users_set(day_users)
+                new_days.append(course_visits_by_day)
+                stored_days.append(((course, day), course_visits_by_day, day_users))
+                continue
+
+            users = days_users_cache.pop((course, day), course_visits_by_day.users_set)
+            new_users_count = sum(1 for user_id in day_users if user_id not in users)
+            if new_users_count:
+                users.update(day_users)
+                course_visits_by_day.set_users_set(users)
+                course_visits_by_day.total += new_users_count
+                changed_days.append(course_visits_by_day)
+            stored_days.append(((course, day), course_visits_by_day, users))
+        if new_days:
+            CourseVisitsByDay.objects.bulk_create(new_days)
+        if changed_days:
+            CourseVisitsByDay.objects.bulk_update(changed_days, ['users_set', 'total'])
+
+        # NOTE: sets of the rolled back writes are not reused, as they do not match the users set of the row.
+        for key, course_visits_by_day, users in stored_days:
+            days_users_cache.put(key, course_visits_by_day.users_set, users)
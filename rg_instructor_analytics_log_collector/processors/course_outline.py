@@ -0,0 +1,211 @@
+"""
+Cache of the flattened course outlines for the navigation events resolution.
+"""
+from collections import namedtuple, OrderedDict
+import logging
+import threading
+import time
+
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
+
+from rg_instructor_analytics_log_collector.instrumentation import metrics
+
+log = logging.getLogger(__name__)
+
+OutlineSubsection = namedtuple('OutlineSubsection', ['location', 'block_id', 'units'])
+
+
+class CourseOutline:
+    """
+    Flattened outline of the course.
+
+    Keeps ordered sections -> subsections -> units block ids and the indexes to resolve the navigation events
+    with dictionary lookups instead of the modulestore tree walking.
+    """
+
+    def __init__(self, sections):
+        """
+        Construct outline.
+
+        :param sections: list of the sections, every section is a list of OutlineSubsection.
+        """
+        self.sections = sections
+        self.subsections = {}
+        self.units = []
+        self.unit_positions = {}
+
+        for section_position, subsections in enumerate(sections):
+            for subsection_position, subsection in enumerate(subsections):
+                self.subsections[subsection.block_id] = (section_position, subsection_position)
+                for unit_block_id in subsection.units:
+                    # NOTE: the first occurrence wins, as for the course tree walking.
+                    self.unit_positions.setdefault(unit_block_id, len(self.units))
+                    self.units.append((unit_block_id, section_position, subsection_position))
+
+    @classmethod
+    def from_course(cls, course):
+        """
+        Build outline from the course block loaded with the `depth` of 3 (course -> section -> subsection -> unit).
+        """
+        return cls([
+            [
+                OutlineSubsection(
+                    location=str(subsection.location),
+                    block_id=subsection.location.block_id,
+                    units=[unit.location.block_id for unit in subsection.get_children()],
+                ) for subsection in section.get_children()
+            ] for section in course.get_children()
+        ])
+
+    def get_subsection(self, subsection_block_id):
+        """
+        Return OutlineSubsection by the block id or None.
+        """
+        position = self.subsections.get(subsection_block_id)
+        if position is None:
+            return None
+        section_position, subsection_position = position
+        return self.sections[section_position][subsection_position]
+
+    def get_unit_subsection(self, unit_block_id):
+        """
+        Return OutlineSubsection the unit belongs to or None.
+        """
+        position = self.unit_positions.get(unit_block_id)
+        if position is None:
+            return None
+        _, section_position, subsection_position = self.units[position]
+        return self.sections[section_position][subsection_position]
+
+    def get_next_unit(self, subsection_block_id):
+        """
+        Return the unit the "next" button of the last unit in the subsection leads to.
+
+        It is the first unit of the next subsection in the section ('' if the next subsection is empty),
+        or the first unit of the next section. None if there is no such unit.
+        """
+        section_position, subsection_position = self.subsections[subsection_block_id]
+        subsections = self.sections[section_position]
+
+        if subsection_position + 1 < len(subsections):
+            units = subsections[subsection_position + 1].units
+            return units[0] if units else ''
+
+        if section_position + 1 < len(self.sections):
+            try:
+                return self.sections[section_position + 1][0].units[0]
+            except IndexError:
+                pass
+        return None
+
+    def get_previous_unit(self, subsection_block_id):
+        """
+        Return the unit the "previous" button of the first unit in the subsection leads to.
+
+        It is the last unit of the previous subsection in the section, or the last unit of the previous section
+        if the subsection is the first one. None if there is no such unit.
+        """
+        section_position, subsection_position = self.subsections[subsection_block_id]
+
+        if subsection_position > 0:
+            units = self.sections[section_position][subsection_position - 1].units
+            return units[-1] if units else None
+
+        if section_position > 0:
+            try:
+                return self.sections[section_position - 1][-1].units[-1]
+            except IndexError:
+                pass
+        return None
+
+
+class CourseOutlineCache:
+    """
+    LRU cache of the course outlines with TTL.
+
+    Outlines are invalidated on the course publishing (see `signals`). Course is published by the Studio process,
+    so for the other processes TTL limits the staleness, and the outline is rebuilt on the lookup miss.
+    """
+
+    MAX_SIZE = 128
+    TTL = 600
+    MISS_REFRESH_INTERVAL = 60
+
+    def __init__(self, max_size=MAX_SIZE, ttl=TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._outlines = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build(self, course_key):
+        """
+        Load the course from the modulestore and build its outline.
+        """
+        try:
+            with metrics.measure('modulestore'):
+                course = modulestore().get_course(course_key, depth=3)
+        except ItemNotFoundError as err:
+            log.info('Course {} not found.'.format(err))
+            return None
+
+        if not course:
+            log.info('Course {} not found.'.format(course_key))
+            return None
+        return CourseOutline.from_course(course)
+
+    def get(self, course_key, refresh=False):
+        """
+        Return outline of the course or None if course is not found.
+
+        :param course_key: CourseKey of the course.
+        :param refresh: rebuild outline if it was built more than `MISS_REFRESH_INTERVAL` seconds ago.
+        """
+        key = str(course_key)
+        now = time.monotonic()
+
+        with self._lock:
+            cached = self._outlines.get(key)
+            if cached:
+                built_at, outline = cached
+                is_expired = now - built_at > self.ttl
+                is_refreshed = refresh and now - built_at > self.MISS_REFRESH_INTERVAL
+                if not is_expired and not is_refreshed:
+                    self._outlines.move_to_end(key)
+                    return outline
+
+        outline = self._build(course_key)
+
+        if outline is None:
+            self.invalidate(key)
+        else:
+            self.set(key, outline)
+        return outline
+
+    def set(self, course_key, outline):
+        """
+        Put the prebuilt outline of the course (e.g. for the synthetic courses of the benchmarks).
+        """
+        key = str(course_key)
+        with self._lock:
+            self._outlines[key] = (time.monotonic(), outline)
+            self._outlines.move_to_end(key)
+            while len(self._outlines) > self.max_size:
+                self._outlines.popitem(last=False)
+
+    def invalidate(self, course_key):
+        """
+        Drop outline of the course.
+        """
+        with self._lock:
+            self._outlines.pop(str(course_key), None)
+
+    def clear(self):
+        """
+        Drop all outlines.
+        """
+        with self._lock:
+            self._outlines.clear()
+
+
+course_outline_cache = CourseOutlineCache()
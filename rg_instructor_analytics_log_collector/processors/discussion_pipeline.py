@@ -1,10 +1,11 @@
 """
 Collection of the discussion pipeline.
 """
-
-import json
+from collections import Counter
 import logging
 
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 
@@ -24,6 +25,14 @@ class DiscussionPipeline(BasePipeline):
     alias = 'discussion'
     supported_types = Events.DISCUSSION_EVENTS
     processor_name = LastProcessedLog.DISCUSSION_ACTIVITY
+    write_behind = True
+
+    """
+    Fields identifying the Discussion Activity (all the formatted record fields).
+    """
+    natural_key_fields = (
+        'event_type', 'user_id', 'course', 'category_id', 'commentable_id', 'discussion_id', 'thread_type', 'log_time',
+    )
 
     def format(self, record, live_event=False):
         """
@@ -32,7 +41,7 @@ class DiscussionPipeline(BasePipeline):
         record: could be QuerySet (or json object if live_event == True)
         """
         data = None
-        event_body = record.get('log_message') if live_event else json.loads(record.log_message)
+        event_body = self.get_event_body(record, live_event)
 
         try:
             course = CourseKey.from_string(event_body['context']['course_id'])
@@ -81,3 +90,66 @@ class DiscussionPipeline(BasePipeline):
             )
             disc_day_activity.total = 1 if disc_day_created else (disc_day_activity.total + 1)
             disc_day_activity.save()
+
+    @classmethod
+    def get_natural_key(cls, record):
+        """
+        Return the hashable key of the formatted record or DiscussionActivity row.
+        """
+        get_value = record.get if isinstance(record, dict) else lambda field: getattr(record, field)
+        return tuple(
+            str(get_value(field)) if field == 'course' else get_value(field) for field in cls.natural_key_fields
+        )
+
+    def push_to_database_batch(self, records):
+        """
+        Save Discussion Activities of the chunk of records to the database.
+
+        Records are deduplicated in memory, already saved activities are found with a single query over the
+        (user_id, course) index, new ones are written with bulk insert, and day counters are incremented once per
+        (course, day). Falls back to the per-record push if day rows were created concurrently (for ex. by the
+        live events backend).
+        """
+        try:
+            with transaction.atomic():
+                self._push_new_activities(records)
+        except IntegrityError:
+            log.warning('Discussion activities were changed concurrently, fall back to per-record push')
+            super().push_to_database_batch(records)
+
+    def _push_new_activities(self, records):
+        """
+        Bulk insert not saved Discussion Activities and increment their day counters.
+        """
+        new_records = {}
+        for record in records:
+            new_records.setdefault(self.get_natural_key(record), record)
+
+        log_times = [record['log_time'] for record in new_records.values()]
+        saved_activities = DiscussionActivity.objects.filter(
+            user_id__in={record['user_id'] for record in new_records.values()},
+            course__in={record['course'] for record in new_records.values()},
+            log_time__range=(min(log_times), max(log_times)),
+        )
+        for activity in saved_activities:
+            new_records.pop(self.get_natural_key(activity), None)
+
+        if not new_records:
+            return
+
+        DiscussionActivity.objects.bulk_create(DiscussionActivity(**record) for record in new_records.values())
+
+        day_increments = Counter((record['course'], record['log_time'].date()) for record in new_records.values())
+        saved_days = set(DiscussionActivityByDay.objects.filter(
+            course__in={course for course, _ in day_increments},
+            day__in={day for _, day in day_increments},
+        ).values_list('course', 'day'))
+
+        new_days = []
+        for (course, day), increment in day_increments.items():
+            if (course, day) in saved_days:
+                DiscussionActivityByDay.objects.filter(course=course, day=day).update(total=F('total') + increment)
+            else:
+                new_days.append(DiscussionActivityByDay(course=course, day=day, total=increment))
+        if new_days:
+            DiscussionActivityByDay.objects.bulk_create(new_days)
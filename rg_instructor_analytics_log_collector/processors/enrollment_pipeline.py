@@ -1,10 +1,11 @@
 """
 Collection of the enrollment pipeline.
 """
-
-import json
+from collections import defaultdict
+from datetime import date
 import logging
 
+from django.db import IntegrityError, transaction
 from django.db.models import F
 from opaque_keys.edx.keys import CourseKey
 
@@ -23,6 +24,7 @@ class EnrollmentPipeline(BasePipeline):
     alias = 'enrollment'
     supported_types = Events.ENROLLMENT_EVENTS
     processor_name = LastProcessedLog.ENROLLMENT
+    write_behind = True
 
     def format(self, record, live_event=False):
         """
@@ -30,7 +32,7 @@ class EnrollmentPipeline(BasePipeline):
 
         record: could be QuerySet (or json object if live_event == True)
         """
-        event_body = record.get('log_message') if live_event else json.loads(record.log_message)
+        event_body = self.get_event_body(record, live_event)
 
         data = {
             'is_enrolled': (record.get('message_type') if live_event else record.message_type) == Events.USER_ENROLLED,
@@ -86,3 +88,92 @@ class EnrollmentPipeline(BasePipeline):
         if enrollment_for_the_following_days:
             total_delta = 1 if user_is_enrolled else -1
             enrollment_for_the_following_days.update(total=F('total') + total_delta)
+
+    @staticmethod
+    def get_daily_deltas(records):
+        """
+        Fold formatted records into per-(course, day) enrollment deltas.
+
+        return: dict in format {<course_id>: {<day>: [<enrolled>, <unenrolled>]}}
+        """
+        deltas = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        for record in records:
+            day_deltas = deltas[record['course']][record['log_time'].date()]
+            day_deltas[0 if record['is_enrolled'] else 1] += 1
+        return deltas
+
+    @staticmethod
+    def update_totals(previous_total, rows):
+        """
+        Recompute `total` of the consecutive day rows as the running sum of the daily enrollment changes.
+
+        :param previous_total: total of the last day before the first row.
+        :param rows: EnrollmentByDay rows of the course ordered by day.
+        :return: list of the rows with the changed total.
+        """
+        changed_rows = []
+        total = previous_total
+        for row in rows:
+            total += row.enrolled - row.unenrolled
+            if row.total != total:
+                row.total = total
+                changed_rows.append(row)
+        return changed_rows
+
+    def push_to_database_batch(self, records):
+        """
+        Save Enrollment info of the chunk of records to the database.
+
+        Daily deltas of the chunk are added to the day rows, then totals are recomputed as the running sum only from
+        the earliest touched day of every course (the result is the same as of the per-record push, that shifts totals
+        of all the following days on every event). Falls back to the per-record push if rows were created
+        concurrently (for ex. by the live events backend).
+        """
+        try:
+            with transaction.atomic():
+                self._push_daily_deltas(self.get_daily_deltas(records))
+        except IntegrityError:
+            log.warning('Enrollments were changed concurrently, fall back to per-record push')
+            super().push_to_database_batch(records)
+
+    def _push_daily_deltas(self, deltas):
+        """
+        Apply per-(course, day) enrollment deltas with bulk inserts and updates.
+        """
+        created_rows = []
+        changed_rows = {}
+        today = date.today()
+
+        for course_id, day_deltas in deltas.items():
+            course = CourseKey.from_string(course_id)
+            first_day = min(day_deltas)
+
+            enrollment_for_the_last_day = EnrollmentByDay.objects.filter(
+                course=course,
+                day__lt=first_day
+            ).order_by('day').last()
+            rows = {row.day: row for row in EnrollmentByDay.objects.filter(course=course, day__gte=first_day)}
+
+            for day, (enrolled, unenrolled) in day_deltas.items():
+                row = rows.get(day)
+                if row is None:
+                    row = rows[day] = EnrollmentByDay(course=course, day=day)
+                    created_rows.append(row)
+                else:
+                    changed_rows[row.pk] = row
+                row.enrolled += enrolled
+                row.unenrolled += unenrolled
+                row.last_updated = today
+
+            ordered_rows = [rows[day] for day in sorted(rows)]
+            previous_total = enrollment_for_the_last_day.total if enrollment_for_the_last_day else 0
+            for row in self.update_totals(previous_total, ordered_rows):
+                if row.pk:
+                    changed_rows[row.pk] = row
+
+        if created_rows:
+            EnrollmentByDay.objects.bulk_create(created_rows)
+        if changed_rows:
+            EnrollmentByDay.objects.bulk_update(
+                list(changed_rows.values()), ['total', 'enrolled', 'unenrolled', 'last_updated']
+            )
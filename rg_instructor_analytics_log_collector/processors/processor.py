@@ -1,12 +1,18 @@
 """
 Processor module.
 """
+from collections import defaultdict
 from datetime import datetime
+import json
 import logging
 
-from django.db import transaction
+from django.db import InterfaceError, OperationalError, transaction
+from django.db.models import Q
 
+from rg_instructor_analytics_log_collector import retention
+from rg_instructor_analytics_log_collector.instrumentation import metrics
 from rg_instructor_analytics_log_collector.models import LastProcessedLog, LogTable
+from rg_instructor_analytics_log_collector.processors.base_pipeline import BasePipeline
 from rg_instructor_analytics_log_collector.processors.course_activity_pipeline import CourseActivityPipeline
 from rg_instructor_analytics_log_collector.processors.discussion_pipeline import DiscussionPipeline
 from rg_instructor_analytics_log_collector.processors.enrollment_pipeline import EnrollmentPipeline
@@ -32,14 +38,16 @@ class Processor:
     CHUNK_SIZE_PROCESSOR = 10000
     CHUNK_SIZE_DELETE = 50000
 
-    def __init__(self, alias_list):
+    def __init__(self, alias_list, fan_out=False):
         """
         Construct Processor.
 
         :param alias_list: list of the pipelines that will be loaded to the current worker.
+        :param fan_out: read and decode LogTable records once for all pipelines (see `process_fan_out`).
         """
         super().__init__()
         self.pipelines = [x for x in self.available_pipelines if x.alias in alias_list]
+        self.fan_out = fan_out
 
     def process(self, event_data=None):
         """
@@ -48,6 +56,9 @@ class Processor:
         Fetch data records from pipelines and
         store them in a database.
         """
+        if not event_data and self.fan_out:
+            return self.process_fan_out()
+
         for pipeline in self.pipelines:
             if event_data and pipeline.is_process_event(event_data['message_type']):
                 data_record = pipeline.format(event_data, live_event=True)
@@ -56,33 +67,21 @@ class Processor:
             else:
                 records = pipeline.get_query()
 
-                if not records.exists():
-                    logging.debug('{} processor stopped at {} (no records)'.format(pipeline.alias, datetime.now()))
-                    continue
-
                 time_start = datetime.now()
-                logging.info('{} processor started at {}'.format(pipeline.alias, time_start))
-
-                chunk_size = self.CHUNK_SIZE_PROCESSOR
                 records_counter = 0
                 records_pushed_counter = 0
-                records_count = records.count()
-
-                for offset in range(0, records_count, chunk_size):
 
-                    logging.info('{}: total records: {}. processing from {} to {}'.format(
-                        pipeline.alias, records_count, offset, offset + chunk_size
-                    ))
+                with metrics.labels(pipeline=pipeline.alias):
+                    for chunk in self.iterate_chunks(records, pipeline.alias):
+                        if not records_counter:
+                            logging.info('{} processor started at {}'.format(pipeline.alias, time_start))
 
-                    for record in records[offset:offset + chunk_size]:
-                        # Format raw log to the internal format.
-                        data_record = pipeline.format(record)
-                        records_counter += 1
+                        records_counter += len(chunk)
+                        records_pushed_counter += self.process_chunk(pipeline, chunk)
 
-                        if data_record:
-                            pipeline.push_to_database(data_record)
-                            records_pushed_counter += 1
-                        pipeline.update_last_processed_log(record)
+                if not records_counter:
+                    logging.debug('{} processor stopped at {} (no records)'.format(pipeline.alias, datetime.now()))
+                    continue
 
                 logging.info(
                     '{} processor stopped at {} (processed: {}, saved: {}, rate: {} rps)'.format(
@@ -91,8 +90,253 @@ class Processor:
                     )
                 )
 
+    @staticmethod
+    def process_chunk(pipeline, chunk):
+        """
+        Format and push the chunk of records as a single unit of work.
+
+        Pipeline's writes and checkpoint are committed in one transaction, so the processing is resumed
+        from the last committed chunk after a crash.
+        :return: number of the saved records.
+        """
+        data_records = []
+        records_pushed_counter = 0
+        format_stage, push_stage = metrics.stage('format'), metrics.stage('push')
+        with transaction.atomic():
+            for record in chunk:
+                # Format raw log to the internal format.
+                with format_stage:
+                    data_record = pipeline.format(record)
+
+                if data_record:
+                    if pipeline.write_behind:
+                        data_records.append(data_record)
+                    else:
+                        with push_stage:
+                            pipeline.push_to_database(data_record)
+                    records_pushed_counter += 1
+            if data_records:
+                with push_stage:
+                    pipeline.push_to_database_batch(data_records)
+            with metrics.measure('checkpoint'):
+                pipeline.update_last_processed_log(chunk[-1])
+
+        format_stage.rows_in = len(chunk)
+        format_stage.rows_out = push_stage.rows_in = records_pushed_counter
+        format_stage.commit()
+        push_stage.commit()
+        return records_pushed_counter
+
+    def iterate_chunks(self, records, alias):
+        """
+        Yield lists of the records ordered by (log_time, id) using keyset pagination.
+
+        Every chunk is fetched with a separate query, that seeks to the last record of the previous chunk,
+        so the cost of the query does not depend on the number of already processed records.
+        :param records: QuerySet of the LogTable records.
+        :param alias: name of the pipeline for the progress logging.
+        """
+        records = records.order_by('log_time', 'id')
+        chunk_size = self.CHUNK_SIZE_PROCESSOR
+        first_log_time = newest_log_time = None
+        chunk_filter = Q()
+
+        while True:
+            with metrics.measure('fetch') as fetch_stage:
+                chunk = list(records.filter(chunk_filter)[:chunk_size].iterator())
+                fetch_stage.rows_out = len(chunk)
+            if not chunk:
+                return
+
+            yield chunk
+
+            if len(chunk) < chunk_size:
+                return
+
+            last_record = chunk[-1]
+            chunk_filter = (
+                Q(log_time__gt=last_record.log_time) | Q(log_time=last_record.log_time, id__gt=last_record.id)
+            )
+
+            # NOTE: progress is estimated by log time to avoid count() over the whole backlog.
+            if newest_log_time is None:
+                first_log_time = chunk[0].log_time
+                newest_log_time = LogTable.objects.order_by('-log_time').values_list('log_time', flat=True).first()
+            total_period = (newest_log_time - first_log_time).total_seconds()
+            progress = (last_record.log_time - first_log_time).total_seconds() / total_period if total_period else 1
+            logging.info('{}: processed records up to {} (~{:.0%} of the backlog)'.format(
+                alias, last_record.log_time, min(progress, 1)
+            ))
+
+    def get_dispatch_table(self):
+        """
+        Return the pipelines routing table.
+
+        :return: tuple(dict in format {<message_type>: [<pipeline>, ...]}, list of pipelines interested in all types)
+        """
+        catch_all_pipelines = [pipeline for pipeline in self.pipelines if not pipeline.supported_types]
+        dispatch_table = defaultdict(list)
+        for pipeline in self.pipelines:
+            for message_type in pipeline.supported_types or []:
+                dispatch_table[message_type].append(pipeline)
+        for pipelines in dispatch_table.values():
+            pipelines.extend(catch_all_pipelines)
+        return dict(dispatch_table), catch_all_pipelines
+
+    def process_fan_out(self):
+        """
+        Process records data of all pipelines with the single LogTable scan.
+
+        Records are read from the oldest pipeline checkpoint, every record is decoded once and routed to the
+        pipelines supporting its message type. Each pipeline skips records up to its own checkpoint in the
+        (log_time, id) order.
+        """
+        dispatch_table, catch_all_pipelines = self.get_dispatch_table()
+        last_logs = {pipeline.alias: pipeline.retrieve_last_processed_log() for pipeline in self.pipelines}
+
+        records = LogTable.objects.all()
+        if not catch_all_pipelines:
+            records = records.filter(message_type__in=list(dispatch_table))
+        if all(last_logs.values()):
+            records = records.filter(BasePipeline.get_not_processed_filter(min(last_logs.values())))
+
+        time_start = datetime.now()
+        records_counter = 0
+        pipelines_counters = {pipeline.alias: [0, 0] for pipeline in self.pipelines}
+
+        for chunk in self.iterate_chunks(records, 'fan-out'):
+            if not records_counter:
+                logging.info('fan-out processor started at {}'.format(time_start))
+
+            write_behind_records = {pipeline.alias: [] for pipeline in self.pipelines if pipeline.write_behind}
+            decode_stage = metrics.stage('decode')
+            stages = {
+                pipeline.alias: tuple(metrics.stage(name, pipeline=pipeline.alias) for name in ('format', 'push'))
+                for pipeline in self.pipelines
+            }
+            with transaction.atomic():
+                for record in chunk:
+                    records_counter += 1
+                    with decode_stage:
+                        record.event_body = json.loads(record.log_message)
+
+                    for pipeline in dispatch_table.get(record.message_type, catch_all_pipelines):
+                        last_log = last_logs[pipeline.alias]
+                        if last_log and (record.log_time, record.id) <= last_log:
+                            continue
+
+                        format_stage, push_stage = stages[pipeline.alias]
+                        # Format raw log to the internal format.
+                        with format_stage:
+                            data_record = pipeline.format(record)
+                        format_stage.rows_in += 1
+                        pipelines_counters[pipeline.alias][0] += 1
+
+                        if data_record:
+                            if pipeline.write_behind:
+                                write_behind_records[pipeline.alias].append(data_record)
+                            else:
+                                with push_stage:
+                                    pipeline.push_to_database(data_record)
+                            format_stage.rows_out += 1
+                            push_stage.rows_in += 1
+                            pipelines_counters[pipeline.alias][1] += 1
+
+                for pipeline in self.pipelines:
+                    if write_behind_records.get(pipeline.alias):
+                        with stages[pipeline.alias][1]:
+                            pipeline.push_to_database_batch(write_behind_records[pipeline.alias])
+
+                # NOTE: the chunk is scanned for every pipeline, so checkpoints are moved to its end even if
+                #  the last records are not supported by the pipeline.
+                last_record = chunk[-1]
+                with metrics.measure('checkpoint'):
+                    for pipeline in self.pipelines:
+                        last_log = last_logs[pipeline.alias]
+                        if not last_log or (last_record.log_time, last_record.id) > last_log:
+                            pipeline.update_last_processed_log(last_record)
+
+            decode_stage.rows_in = len(chunk)
+            decode_stage.commit()
+            for format_stage, push_stage in stages.values():
+                format_stage.commit()
+                push_stage.commit()
+
+        if not records_counter:
+            logging.debug('fan-out processor stopped at {} (no records)'.format(datetime.now()))
+            return
+
+        for alias, (pipeline_records_counter, records_pushed_counter) in pipelines_counters.items():
+            logging.info('{} processor: processed: {}, saved: {}'.format(
+                alias, pipeline_records_counter, records_pushed_counter
+            ))
+        logging.info(
+            'fan-out processor stopped at {} (processed: {}, rate: {} rps)'.format(
+                datetime.now(), records_counter,
+                int(records_counter / (datetime.now() - time_start).total_seconds())
+            )
+        )
+
+    def process_batch(self, events_data):
+        """
+        Process a micro-batch of the live events.
+
+        Every event is routed only to the pipelines supporting its message type (unlike `process`, that runs the
+        LogTable processing of the other pipelines). Write-behind pipelines push the batch with
+        `push_to_database_batch`. Each pipeline pushes the batch in its own savepoint, so a failure of the one
+        pipeline does not lose the events of the others. Database availability errors roll back the whole batch and
+        are raised, so the caller may retry (or spill) the batch without applying it to any pipeline twice.
+        :param events_data: list of the live events data (see `RGAnalyticsBackend.send`).
+        :return: number of the saved records.
+        """
+        dispatch_table, catch_all_pipelines = self.get_dispatch_table()
+        pipelines_events = defaultdict(list)
+        for event_data in events_data:
+            for pipeline in dispatch_table.get(event_data['message_type'], catch_all_pipelines):
+                pipelines_events[pipeline.alias].append(event_data)
+
+        records_pushed_counter = 0
+        with transaction.atomic():
+            for pipeline in self.pipelines:
+                if not pipelines_events[pipeline.alias]:
+                    continue
+                try:
+                    with transaction.atomic():
+                        pipeline_records_pushed_counter = 0
+                        data_records = []
+                        for event_data in pipelines_events[pipeline.alias]:
+                            data_record = pipeline.format(event_data, live_event=True)
+                            if not data_record:
+                                continue
+                            if pipeline.write_behind:
+                                data_records.append(data_record)
+                            else:
+                                pipeline.push_to_database(data_record)
+                            pipeline_records_pushed_counter += 1
+                        if data_records:
+                            pipeline.push_to_database_batch(data_records)
+                except (InterfaceError, OperationalError):
+                    # NOTE: the database is not available, the batch is rolled back and the caller may retry it.
+                    raise
+                except Exception:
+                    log.exception('{} processor failed to process the batch of {} live events'.format(
+                        pipeline.alias, len(pipelines_events[pipeline.alias])
+                    ))
+                else:
+                    records_pushed_counter += pipeline_records_pushed_counter
+        return records_pushed_counter
+
     def delete_logs(self):
-        """Delete all unused log records."""
+        """
+        Delete all unused log records.
+
+        Partitions of the processed records are dropped if LogTable is partitioned (see the `partition_log_table`
+        command), otherwise records are deleted by chunks.
+        """
+        if retention.get_partitions():
+            retention.execute(retention.get_drop_partitions_statements() + retention.get_future_partitions_statements())
+            return
+
         last_date = LastProcessedLog.get_last_date()
 
         if last_date:
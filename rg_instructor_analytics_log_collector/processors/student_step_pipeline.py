@@ -10,12 +10,11 @@ from django.urls import resolve
 from django.urls.resolvers import Resolver404
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey, UsageKey
-from xmodule.modulestore.django import modulestore
-from xmodule.modulestore.exceptions import ItemNotFoundError
 
 from rg_instructor_analytics_log_collector.constants import Events
 from rg_instructor_analytics_log_collector.models import LastProcessedLog, StudentStepCourse
 from rg_instructor_analytics_log_collector.processors.base_pipeline import BasePipeline
+from rg_instructor_analytics_log_collector.processors.course_outline import course_outline_cache
 
 log = logging.getLogger(__name__)
 
@@ -29,6 +28,15 @@ class StudentStepPipeline(BasePipeline):
     supported_types = Events.NAVIGATIONAL_EVENTS
     processor_name = LastProcessedLog.STUDENT_STEP
 
+    @staticmethod
+    def _get_outline_subsection(outline, locator):
+        """
+        Return outline subsection by the locator of the subsection or its unit (MFE sends the unit locator).
+        """
+        if locator.block_type == 'vertical':
+            return outline.get_unit_subsection(locator.block_id)
+        return outline.get_subsection(locator.block_id)
+
     def get_units(self, event_body, event_type, body_context):
         """
         Get info of student path by units.
@@ -68,24 +76,13 @@ class StudentStepPipeline(BasePipeline):
                 return None, None, subsection_id
 
             if not last_step or last_step.event_type not in Events.INTERNAL_NAVIGATION_EVENTS:
-                try:
-                    course = modulestore().get_course(target_location.course_key, depth=1)
-                except ItemNotFoundError as err:
-                    logging.info('Course {} not found.'.format(err))
+                outline = course_outline_cache.get(target_location.course_key)
+                if not outline:
                     return None, None, subsection_id
-                else:
-                    if not course:
-                        logging.info('Course {} not found.'.format(target_location.course_key))
-                        return None, None, subsection_id
-
-                for section in course.get_children():
-                    if subsection_id:
-                        break
-
-                    for subsection in section.get_children():
-                        if current_unit in [c.location.block_id for c in subsection.get_children()]:
-                            subsection_id = subsection.location.__str__()
-                            break
+
+                if not subsection_id:
+                    subsection = outline.get_unit_subsection(current_unit)
+                    subsection_id = subsection and subsection.location
             else:
                 subsection_id = last_step.subsection_id
 
@@ -97,107 +94,47 @@ class StudentStepPipeline(BasePipeline):
                 logging.info('InvalidKeyError (subsection_id - "{}") {}'.format(subsection_id, err))
                 return current_unit, target_unit, subsection_id
 
-            try:
-                subsection_block = modulestore().get_item(sequential_locator, depth=1)
-                # to make the pipeline MFE-compatible
-                if sequential_locator.block_type == 'vertical':
-                    subsection_block = subsection_block.get_parent()
-            except ItemNotFoundError as err:
-                logging.info('Item {} not found.'.format(err))
+            outline = course_outline_cache.get(sequential_locator.course_key)
+            subsection = outline and self._get_outline_subsection(outline, sequential_locator)
+            if outline and not subsection:
+                # NOTE: the block could be added after the outline is cached.
+                outline = course_outline_cache.get(sequential_locator.course_key, refresh=True)
+                subsection = outline and self._get_outline_subsection(outline, sequential_locator)
+
+            if not subsection:
+                logging.info('Item {} not found.'.format(subsection_id))
                 return current_unit, target_unit, subsection_id
-            else:
-                if not subsection_block:
-                    logging.info('Item {} not found.'.format(subsection_id))
-                    return current_unit, target_unit, subsection_id
 
         if event_type in Events.INTERNAL_NAVIGATION_EVENTS:
             current_tab = event_body['old']
             target_tab = event_body['new']
-            unit_children = subsection_block.get_children()
+            unit_children = subsection.units
 
             try:
-                current_unit = unit_children[current_tab - 1].location.block_id
-                target_unit = unit_children[target_tab - 1].location.block_id
+                current_unit = unit_children[current_tab - 1]
+                target_unit = unit_children[target_tab - 1]
             except IndexError:
                 pass
 
         elif event_type == Events.UI_SEQ_NEXT:
             try:
                 # last unit in subsection
-                current_unit = subsection_block.get_children()[-1].location.block_id
+                current_unit = subsection.units[-1]
             except IndexError:
                 pass
 
-            is_next_subsection = False
-            section_block = subsection_block.get_parent()
-            for subsection in section_block.get_children():
-                if subsection.location.block_id == subsection_block.location.block_id:
-                    is_next_subsection = True
-                    continue
-
-                if is_next_subsection:
-                    try:
-                        # first unit in next subsection
-                        target_unit = subsection.get_children()[0].location.block_id
-                    except IndexError:
-                        target_unit = ''
-                        pass
-
-                    break
-
-            if target_unit is None:
-                is_next_section = False
-                for section in section_block.get_parent().get_children():
-                    if section.location.block_id == section_block.location.block_id:
-                        is_next_section = True
-                        continue
-
-                    if is_next_section:
-                        try:
-                            # first unit in next section -> first subsection
-                            target_unit = section.get_children()[0].get_children()[0].location.block_id
-                        except IndexError:
-                            pass
-
-                        break
+            # first unit in next subsection or in the next section
+            target_unit = outline.get_next_unit(subsection.block_id)
 
         elif event_type == Events.UI_SEQ_PREV:
             try:
                 # first unit in subsection
-                current_unit = subsection_block.get_children()[0].location.block_id
+                current_unit = subsection.units[0]
             except IndexError:
                 pass
 
-            prev_subsection = None
-            section_block = subsection_block.get_parent()
-
-            for subsection in section_block.get_children():
-
-                if subsection.location.block_id == subsection_block.location.block_id:
-                    if prev_subsection:
-                        try:
-                            # last unit in prev_subsection
-                            target_unit = prev_subsection.get_children()[-1].location.block_id
-                        except IndexError:
-                            pass
-                    break
-
-                prev_subsection = subsection
-
-            if prev_subsection is None:
-                prev_section = None
-
-                for section in section_block.get_parent().get_children():
-                    if section.location.block_id == section_block.location.block_id:
-                        if prev_section:
-                            try:
-                                # last unit in prev_section -> last subsection
-                                target_unit = prev_section.get_children()[-1].get_children()[-1].location.block_id
-                            except IndexError:
-                                pass
-                        break
-
-                    prev_section = section
+            # last unit in previous subsection or in the previous section
+            target_unit = outline.get_previous_unit(subsection.block_id)
 
         return current_unit, target_unit, subsection_id
 
@@ -207,7 +144,7 @@ class StudentStepPipeline(BasePipeline):
 
         record: could be QuerySet (or json object if live_event == True)
         """
-        event_body = record.get('log_message') if live_event else json.loads(record.log_message)
+        event_body = self.get_event_body(record, live_event)
 
         try:
             course = CourseKey.from_string(event_body['context']['course_id'])
@@ -4,6 +4,7 @@ Collection of the video views pipeline.
 import json
 import logging
 
+from django.db import IntegrityError, transaction
 from opaque_keys.edx.keys import CourseKey
 
 from rg_instructor_analytics_log_collector.constants import Events
@@ -20,6 +21,7 @@ class VideoViewsPipeline(BasePipeline):
     alias = 'video_views'
     supported_types = Events.VIDEO_VIEW_EVENTS
     processor_name = LastProcessedLog.VIDEO_VIEWS
+    write_behind = True
 
     def format(self, record, live_event=False):
         """
@@ -27,7 +29,7 @@ class VideoViewsPipeline(BasePipeline):
 
         record: could be QuerySet (or json object if live_event == True)
         """
-        event_body = record.get('log_message') if live_event else json.loads(record.log_message)
+        event_body = self.get_event_body(record, live_event)
         event_body_detail = json.loads(event_body['event'])
         try:
             data = {
@@ -69,20 +71,15 @@ class VideoViewsPipeline(BasePipeline):
         course = CourseKey.from_string(record['course_id'])
         user_id = record['user_id']
 
-        video_views_by_day, created_video_day = VideoViewsByDay.objects.get_or_create(
+        video_views_by_day, _ = VideoViewsByDay.objects.get_or_create(
             course=course,
             video_block_id=record['block_id'],
             day=record['log_time'].date(),
         )
-        list_users_ids = video_views_by_day.users_ids.split(',') if video_views_by_day.users_ids else []
+        users = video_views_by_day.get_users_set()
 
-        if created_video_day:
-            video_views_by_day.users_ids = user_id
-            video_views_by_day.total = 1
-            video_views_by_day.save()
-
-        elif str(user_id) not in list_users_ids:
-            video_views_by_day.users_ids += ',{}'.format(user_id)
+        if users.add(user_id):
+            video_views_by_day.set_users_set(users)
             video_views_by_day.total += 1
             video_views_by_day.save()
 
@@ -117,3 +114,149 @@ class VideoViewsPipeline(BasePipeline):
                 video_views_by_block.count_part_viewed -= 1
                 video_views_by_block.video_duration = video_views_by_user.viewed_time
                 video_views_by_block.save()
+
+    def push_to_database_batch(self, records):
+        """
+        Save Video Views info of the chunk of records to the database.
+
+        Records are applied to the in-memory copies of the affected rows with the same rules as `push_to_database`,
+        the final state is written with bulk inserts and updates. Falls back to the per-record push if rows were
+        created concurrently (for ex. by the live events backend).
+        """
+        try:
+            with transaction.atomic():
+                VideoViewsBuffer(records).flush()
+        except IntegrityError:
+            log.warning('Video views were changed concurrently, fall back to per-record push')
+            super().push_to_database_batch(records)
+
+
+class VideoViewsBuffer:
+    """
+    Write-behind buffer of the video views aggregates.
+
+    Folds a chunk of formatted records into per-(course, block, day), per-(course, user, block) and
+    per-(course, block) rows.
+    """
+
+    def __init__(self, records):
+        self.courses = {course_id: CourseKey.from_string(course_id) for course_id in {r['course_id'] for r in records}}
+        self.records = records
+
+        course_keys = list(self.courses.values())
+        block_ids = {record['block_id'] for record in records}
+
+        self.days = {
+            (str(row.course), row.video_block_id, row.day): row for row in VideoViewsByDay.objects.filter(
+                course__in=course_keys,
+                video_block_id__in=block_ids,
+                day__in={record['log_time'].date() for record in records},
+            )
+        }
+        self.users = {
+            (str(row.course), row.user_id, row.video_block_id): row for row in VideoViewsByUser.objects.filter(
+                course__in=course_keys,
+                user_id__in={int(record['user_id']) for record in records},
+                video_block_id__in=block_ids,
+            )
+        }
+        self.blocks = {
+            (str(row.course), row.video_block_id): row for row in VideoViewsByBlock.objects.filter(
+                course__in=course_keys,
+                video_block_id__in=block_ids,
+            )
+        }
+        # NOTE: new model instances are not hashable, so created and changed rows are tracked by their `id()`.
+        self.days_users = {}
+        self.created = set()
+        self.changed = set()
+
+    def _get_or_create(self, rows, key, model, **fields):
+        """
+        Return in-memory row by the key, new row is created (not saved) if it is absent.
+
+        return: tuple(row, created)
+        """
+        row = rows.get(key)
+        if row is not None:
+            return row, False
+
+        row = rows[key] = model(**fields)
+        self.created.add(id(row))
+        return row, True
+
+    def _apply(self, record):
+        """
+        Apply single record to the in-memory rows, see `VideoViewsPipeline.push_to_database`.
+        """
+        course_id = record['course_id']
+        course = self.courses[course_id]
+        user_id = record['user_id']
+        block_id = record['block_id']
+        day = record['log_time'].date()
+
+        day_key = (str(course), block_id, day)
+        video_views_by_day, _ = self._get_or_create(
+            self.days, day_key, VideoViewsByDay,
+            course=course, video_block_id=block_id, day=day,
+        )
+        users = self.days_users.get(day_key)
+        if users is None:
+            users = self.days_users[day_key] = video_views_by_day.get_users_set()
+
+        if users.add(user_id):
+            video_views_by_day.total += 1
+            self.changed.add(id(video_views_by_day))
+
+        video_views_by_user, created_video_views_by_user = self._get_or_create(
+            self.users, (str(course), int(user_id), block_id), VideoViewsByUser,
+            course=course, user_id=user_id, video_block_id=block_id,
+        )
+
+        if not video_views_by_user.is_completed:
+            try:
+                viewed_time = int(record['viewed_time'])
+            except ValueError:
+                viewed_time = 0
+
+            if viewed_time >= int(video_views_by_user.viewed_time):
+                video_views_by_user.viewed_time = viewed_time
+                video_views_by_user.is_completed = record['is_video_completed']
+                self.changed.add(id(video_views_by_user))
+
+            video_views_by_block, _ = self._get_or_create(
+                self.blocks, (str(course), block_id), VideoViewsByBlock,
+                course=course, video_block_id=block_id,
+            )
+
+            if created_video_views_by_user:
+                video_views_by_block.count_part_viewed += 1
+                self.changed.add(id(video_views_by_block))
+
+            if video_views_by_user.is_completed:
+                video_views_by_block.count_full_viewed += 1
+                video_views_by_block.count_part_viewed -= 1
+                video_views_by_block.video_duration = video_views_by_user.viewed_time
+                self.changed.add(id(video_views_by_block))
+
+    def flush(self):
+        """
+        Apply buffered records and write the result to the database.
+        """
+        for record in self.records:
+            self._apply(record)
+
+        for day_key, users in self.days_users.items():
+            self.days[day_key].set_users_set(users)
+
+        for model, rows, fields in (
+            (VideoViewsByDay, self.days, ['users_set', 'total']),
+            (VideoViewsByUser, self.users, ['viewed_time', 'is_completed']),
+            (VideoViewsByBlock, self.blocks, ['count_full_viewed', 'count_part_viewed', 'video_duration']),
+        ):
+            created_rows = [row for row in rows.values() if id(row) in self.created]
+            changed_rows = [row for row in rows.values() if id(row) in self.changed and id(row) not in self.created]
+            if created_rows:
+                model.objects.bulk_create(created_rows)
+            if changed_rows:
+                model.objects.bulk_update(changed_rows, fields)
@@ -4,22 +4,44 @@ Module for the provide general access to the storage for the logs (i.e. mySql).
 
 from abc import ABCMeta, abstractmethod
 import codecs
-import hashlib
-import json
 import logging
+import queue
+import threading
+import time
 
-from django.db import OperationalError
+from django.conf import settings
+from django.db import DataError, IntegrityError, OperationalError, transaction
+from django.utils import timezone
 
-from rg_instructor_analytics_log_collector.models import LogTable, ProcessedZipLog
+from rg_instructor_analytics_log_collector.instrumentation import metrics
+from rg_instructor_analytics_log_collector.log_parser import parse_log_string, RECORD_FIELDS
+from rg_instructor_analytics_log_collector.models import (
+    LogFileCheckpoint, LogTable, ProcessedZipLog, StorageListingCheckpoint
+)
 
 log = logging.getLogger(__name__)
 
+# NOTE: marker of the last item of the ingest queue.
+END_OF_BATCHES = object()
+
 
 class IRepository(metaclass=ABCMeta):
     """
     Base repository class.
     """
 
+    """
+    Number of the parsed log records passed to the storage (including already stored ones).
+    """
+    loaded_records_counter = 0
+    # Interval of the reader thread checks that the writer is stopped while the queue is full (in seconds).
+    QUEUE_POLL_INTERVAL = 0.1
+
+    def __init__(self, ingest_queue_depth: int = 0):
+        # NOTE: maximal number of the parsed batches waiting for the database write, if it is set the file is read and
+        #  parsed by the separate thread (see `_iter_queued_batches`), 0 - sequential reading, parsing and writing.
+        self.ingest_queue_depth = ingest_queue_depth
+
     def _get_logs_batch_size(self):
         """
         Provide batch size for the bulk operation.
@@ -43,29 +65,130 @@ class IRepository(metaclass=ABCMeta):
         if streaming_read:
             log_file_descriptor = codecs.getreader('utf-8')(log_file_descriptor)
 
-        for log_string in log_file_descriptor:
+        # NOTE: reading stage includes downloading and decompression of the file.
+        read_stage, parse_stage, store_stage = (metrics.stage(name) for name in ('read', 'parse', 'store'))
+        batches = self._iter_parsed_batches(log_file_descriptor, read_stage, parse_stage)
+        if self.ingest_queue_depth:
+            batches = self._iter_queued_batches(batches)
+
+        for batch in batches:
+            with store_stage:
+                self.store_new_log_messages(batch)
+            store_stage.rows_in += len(batch)
+            self.loaded_records_counter += len(batch)
+
+        parse_stage.rows_in = read_stage.rows_in
+        parse_stage.rows_out = store_stage.rows_in
+        for stage in (read_stage, parse_stage, store_stage):
+            stage.commit()
+
+    def _iter_parsed_batches(self, log_file_descriptor, read_stage, parse_stage):
+        """
+        Read and parse the log lines, yield batches of the parsed records.
+        """
+        batch_size = self._get_logs_batch_size()
+        batch = []
+
+        for log_string in metrics.iter_timed(log_file_descriptor, read_stage):
+            with parse_stage:
+                data = parse_log_string(log_string)
+            if data is not None:
+                batch.append(data)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+        if batch:
+            yield batch
+
+    def _iter_queued_batches(self, batches):
+        """
+        Yield batches produced by the reader thread through the bounded queue.
+
+        The reader thread reads and parses the file while the current thread writes to the database, the reader waits
+        while the queue is full (backpressure). Waits are measured as the stall stages: `read_stall` - the queue is
+        full, the database is the bottleneck; `store_stall` - the queue is empty, reading or parsing is the bottleneck.
+        """
+        batches_queue = queue.Queue(maxsize=self.ingest_queue_depth)
+        stopped = threading.Event()
+        # NOTE: stalls counters: {<stage name>: [<waits>, <seconds>]}.
+        stalls = {'read_stall': [0, 0.0], 'store_stall': [0, 0.0]}
+
+        def put(item):
             try:
-                if type(log_string) is not str:
-                    # it is bytes in python 3
-                    log_string = log_string.decode('utf-8')
-                json_log = json.loads(log_string)
-                data = {
-                    'message_type': 'event_type' in json_log and json_log['event_type'] or json_log['name'],
-                    'log_time': 'time' in json_log and json_log['time'] or json_log['timestamp'],
-                    'log_message': log_string,
-                    'user_name': json_log.get('username', json_log.get('context', {}).get('username'))
-                }
+                batches_queue.put_nowait(item)
+                return True
+            except queue.Full:
+                pass
+
+            started = time.perf_counter()
+            try:
+                while not stopped.is_set():
+                    try:
+                        batches_queue.put(item, timeout=self.QUEUE_POLL_INTERVAL)
+                        return True
+                    except queue.Full:
+                        pass
+                return False
+            finally:
+                stalls['read_stall'][0] += 1
+                stalls['read_stall'][1] += time.perf_counter() - started
+
+        def produce():
+            end = END_OF_BATCHES
+            try:
+                for batch in batches:
+                    if not put(batch):
+                        return
+            except Exception as e:
+                end = e
+            put(end)
+
+        reader = threading.Thread(target=produce, name='rg-log-reader', daemon=True)
+        reader.start()
+        try:
+            while True:
                 try:
-                    m_hash = hashlib.sha256(data['message_type']).hexdigest()
-                except TypeError:
-                    m_hash = hashlib.sha256(data['message_type'].encode('utf-8')).hexdigest()
-                data['message_type_hash'] = m_hash
-            except ValueError as e:
-                log.error('can not parse json from the log string ({})\n\t{}'.format(log_string, repr(e)))
-            except (IndexError, KeyError) as e:
-                log.exception('corrupted structure of the log json ({})\n\t{}'.format(log_string, repr(e)))
-            else:
-                self.store_new_log_message(data)
+                    item = batches_queue.get_nowait()
+                except queue.Empty:
+                    started = time.perf_counter()
+                    item = batches_queue.get()
+                    stalls['store_stall'][0] += 1
+                    stalls['store_stall'][1] += time.perf_counter() - started
+
+                if item is END_OF_BATCHES:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+            reader.join()
+            for name, (waits, seconds) in stalls.items():
+                stage = metrics.stage(name)
+                stage.calls, stage.seconds = waits, seconds
+                stage.commit()
+            log.debug('Ingest queue stalls: {}'.format(', '.join(
+                f'{name} {waits} ({seconds:.3f}s)' for name, (waits, seconds) in stalls.items()
+            )))
+
+    def add_parsed_log_records(self, batches):
+        """
+        Store the records parsed by the worker process (see `log_parser.parse_archive`) into the database.
+
+        batches: iterable of the lists of the records tuples of the `log_parser.RECORD_FIELDS`, only one of them is
+            held in memory at a time.
+        """
+        batch_size = self._get_logs_batch_size()
+        records_counter = 0
+        with metrics.measure('store') as store_stage:
+            for records in batches:
+                for start in range(0, len(records), batch_size):
+                    batch = [dict(zip(RECORD_FIELDS, record)) for record in records[start:start + batch_size]]
+                    self.store_new_log_messages(batch)
+                    self.loaded_records_counter += len(batch)
+                records_counter += len(records)
+            store_stage.rows_in = records_counter
 
     @abstractmethod
     def store_new_log_message(self, data):
@@ -74,6 +197,15 @@ class IRepository(metaclass=ABCMeta):
         """
         pass
 
+    def store_new_log_messages(self, batch):
+        """
+        Store a batch of the parsed log records into the database.
+
+        Fallback implementation stores records one by one, repositories are expected to override it with a bulk write.
+        """
+        for data in batch:
+            self.store_new_log_message(data)
+
     @abstractmethod
     def mark_as_processed_source(self, source_name):
         """
@@ -81,6 +213,34 @@ class IRepository(metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def get_log_file_checkpoint(self, file_name):
+        """
+        Return the stored read position of the not archived log file (None if file was never read).
+        """
+        pass
+
+    @abstractmethod
+    def update_log_file_checkpoint(self, file_name, inode, size, offset, fingerprint):
+        """
+        Store the read position of the not archived log file.
+        """
+        pass
+
+    @abstractmethod
+    def get_listing_checkpoint(self, source):
+        """
+        Return the stored last key and not archived keys of the file-storage listing (None if source was never listed).
+        """
+        pass
+
+    @abstractmethod
+    def update_listing_checkpoint(self, source, last_key, live_keys):
+        """
+        Store the last key and not archived keys of the file-storage listing.
+        """
+        pass
+
 
 class MySQlRepository(IRepository):
     """
@@ -103,17 +263,102 @@ class MySQlRepository(IRepository):
         #  solution. The proper fix proposal is discussed in the YT issue, please fide it by the link
         #  https://youtrack.raccoongang.com/issue/RGA-242?p=RGA2-424
         try:
-            LogTable.objects.get_or_create(
-                message_type_hash=data['message_type_hash'],
-                log_time=data['log_time'],
-                user_name=data['user_name'],
-                defaults={'log_message': data['log_message'], 'message_type': data['message_type']}
-            )
-        except OperationalError:
+            # NOTE: the savepoint keeps the transaction of the caller usable after the error.
+            with transaction.atomic():
+                LogTable.objects.get_or_create(
+                    message_type_hash=data['message_type_hash'],
+                    log_time=data['log_time'],
+                    user_name=data['user_name'],
+                    defaults={'log_message': data['log_message'], 'message_type': data['message_type']}
+                )
+        except (DataError, OperationalError):
             log.exception(f"Cannot store the record into database ({data['log_message']})")
 
+    def store_new_log_messages(self, batch):
+        """
+        Store a batch of parsed logs into the database with a single multi-row insert.
+
+        Records that already exist (by the `message_type_hash`, `log_time`, `user_name` unique key) are skipped. They
+        are filtered out by the existence query instead of `INSERT IGNORE`: MySQL does not treat NULL `user_name` values
+        as conflicting, and IGNORE turns data errors into warnings with truncated values. The batch is inserted in its
+        own savepoint, if it is rejected by the database (for ex. 4 byte UTF-8 characters, see the FIXME note in
+        `store_new_log_message`), the savepoint is rolled back and records are stored one by one (each in its own
+        savepoint), so only the broken records are lost and the transaction of the caller stays usable.
+        """
+        new_records = {}
+        for data in batch:
+            new_records.setdefault(self._get_record_key(data), data)
+
+        existing_keys = LogTable.objects.filter(
+            log_time__in={log_time for _, log_time, _ in new_records}
+        ).values_list('message_type_hash', 'log_time', 'user_name')
+        for key in existing_keys:
+            new_records.pop(key, None)
+
+        if not new_records:
+            return
+
+        try:
+            with transaction.atomic():
+                LogTable.objects.bulk_create(
+                    [
+                        LogTable(
+                            message_type_hash=data['message_type_hash'],
+                            message_type=data['message_type'],
+                            log_time=data['log_time'],
+                            user_name=data['user_name'],
+                            log_message=data['log_message'],
+                        ) for data in new_records.values()
+                    ],
+                    batch_size=self._get_logs_batch_size(),
+                )
+        except (DataError, IntegrityError, OperationalError):
+            log.warning(
+                f'Cannot store the batch of {len(new_records)} records into database, fall back to per-record insert'
+            )
+            super().store_new_log_messages(new_records.values())
+
+    @staticmethod
+    def _get_record_key(data):
+        """
+        Return the unique key of the parsed record with the `log_time` converted as the database returns it.
+        """
+        log_time = LogTable._meta.get_field('log_time').to_python(data['log_time'])
+        if settings.USE_TZ and timezone.is_naive(log_time):
+            log_time = timezone.make_aware(log_time, timezone.get_default_timezone())
+        return data['message_type_hash'], log_time, data['user_name']
+
     def mark_as_processed_source(self, source_name):
         """
         Mark given file name as processed.
         """
         ProcessedZipLog.objects.get_or_create(file_name=source_name)
+
+    def get_log_file_checkpoint(self, file_name):
+        """
+        Return the LogFileCheckpoint of the given file or None.
+        """
+        return LogFileCheckpoint.objects.filter(file_name=file_name).first()
+
+    def update_log_file_checkpoint(self, file_name, inode, size, offset, fingerprint):
+        """
+        Create or update the LogFileCheckpoint of the given file.
+        """
+        LogFileCheckpoint.objects.update_or_create(
+            file_name=file_name,
+            defaults={'inode': inode, 'size': size, 'offset': offset, 'fingerprint': fingerprint}
+        )
+
+    def get_listing_checkpoint(self, source):
+        """
+        Return the StorageListingCheckpoint of the given source or None.
+        """
+        return StorageListingCheckpoint.objects.filter(source=source).first()
+
+    def update_listing_checkpoint(self, source, last_key, live_keys):
+        """
+        Create or update the StorageListingCheckpoint of the given source.
+        """
+        StorageListingCheckpoint.objects.update_or_create(
+            source=source, defaults={'last_key': last_key, 'live_keys': '\n'.join(live_keys)}
+        )
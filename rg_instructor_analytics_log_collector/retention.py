@@ -0,0 +1,182 @@
+"""
+Partition-based retention of the LogTable records (MySQL only).
+
+LogTable is partitioned by RANGE of TO_DAYS(log_time) into daily or weekly partitions, the last partition
+(`VALUES LESS THAN MAXVALUE`) catches the records beyond the created ones. Processed records are deleted by dropping
+whole partitions, that takes seconds regardless of the number of records (unlike the chunked DELETE).
+"""
+from datetime import date, timedelta
+import logging
+from typing import List, Optional, Tuple
+
+from django.db import connection
+from django.utils import timezone
+
+from rg_instructor_analytics_log_collector.models import LastProcessedLog, LogTable
+
+log = logging.getLogger(__name__)
+
+PERIOD_DAY = 'day'
+PERIOD_WEEK = 'week'
+PERIODS = {
+    PERIOD_DAY: timedelta(days=1),
+    PERIOD_WEEK: timedelta(weeks=1),
+}
+MAXVALUE_PARTITION = 'pmax'
+# NOTE: MySQL TO_DAYS() is the proleptic Gregorian ordinal of the date counted from the year 0.
+TO_DAYS_OFFSET = 365
+
+
+def to_days(day: date) -> int:
+    """
+    Return MySQL TO_DAYS() of the date.
+    """
+    return day.toordinal() + TO_DAYS_OFFSET
+
+
+def from_days(days: int) -> date:
+    """
+    Return the date of MySQL TO_DAYS() value.
+    """
+    return date.fromordinal(int(days) - TO_DAYS_OFFSET)
+
+
+def get_partition_name(bound: date) -> str:
+    """
+    Return the name of the partition with the records before the bound day.
+    """
+    return f'p{bound:%Y%m%d}'
+
+
+def get_partition_definition(bound: Optional[date]) -> str:
+    """
+    Return the definition of the partition with the records before the bound day (all the rest if bound is None).
+    """
+    if bound is None:
+        return f'PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE'
+    return f'PARTITION {get_partition_name(bound)} VALUES LESS THAN ({to_days(bound)})'
+
+
+def get_bounds(first_bound: date, last_day: date, step: timedelta) -> List[date]:
+    """
+    Return partition bounds starting from `first_bound` with the `step` until the partition of the `last_day`.
+    """
+    bounds = [first_bound]
+    while bounds[-1] <= last_day:
+        bounds.append(bounds[-1] + step)
+    return bounds
+
+
+def get_partitions() -> List[Tuple[str, Optional[date]]]:
+    """
+    Return (name, bound day) of the LogTable partitions in order, bound of the MAXVALUE partition is None.
+
+    Empty list is returned if the table is not partitioned (or the database is not MySQL).
+    """
+    if connection.vendor != 'mysql':
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL '
+            'ORDER BY PARTITION_ORDINAL_POSITION',
+            [LogTable._meta.db_table]
+        )
+        rows = cursor.fetchall()
+
+    return [(name, None if description == 'MAXVALUE' else from_days(description)) for name, description in rows]
+
+
+def get_referencing_foreign_keys() -> List[Tuple[str, str]]:
+    """
+    Return (table, constraint name) of the foreign keys referencing LogTable (partitioned tables can't have them).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS '
+            'WHERE CONSTRAINT_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME = %s',
+            [LogTable._meta.db_table]
+        )
+        return list(cursor.fetchall())
+
+
+def get_partitioning_statements(period: str = PERIOD_DAY, ahead: int = 7) -> List[str]:
+    """
+    Return SQL statements converting LogTable into the partitioned one.
+
+    The primary key is extended with `log_time` (every unique key of the partitioned table must include it), and
+    the foreign keys referencing LogTable are dropped. Partitions are created from the oldest record up to `ahead`
+    periods after today. NOTE: the table is rebuilt, it is a long one-time operation for the large tables.
+    """
+    if connection.vendor != 'mysql':
+        raise ValueError('LogTable partitioning is supported on MySQL only')
+    if get_partitions():
+        raise ValueError('LogTable is already partitioned')
+
+    step = PERIODS[period]
+    today = timezone.now().date()
+    first_log_time = LogTable.objects.order_by('log_time').values_list('log_time', flat=True).first()
+    first_day = first_log_time.date() if first_log_time else today
+    if period == PERIOD_WEEK:
+        first_day -= timedelta(days=first_day.weekday())
+    bounds = get_bounds(first_day + step, today + step * ahead, step)
+
+    table = LogTable._meta.db_table
+    statements = [
+        f'ALTER TABLE `{referencing_table}` DROP FOREIGN KEY `{constraint}`'
+        for referencing_table, constraint in get_referencing_foreign_keys()
+    ]
+    partitions = ', '.join(get_partition_definition(bound) for bound in bounds + [None])
+    statements.append(
+        f'ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `log_time`) '
+        f'PARTITION BY RANGE (TO_DAYS(`log_time`)) ({partitions})'
+    )
+    return statements
+
+
+def get_future_partitions_statements(ahead: int = 7) -> List[str]:
+    """
+    Return SQL statements creating partitions up to `ahead` periods after today.
+
+    The period is the distance between the last two partition bounds. New partitions are split off the MAXVALUE
+    partition, that is instant while it is empty.
+    """
+    bounds = [bound for _, bound in get_partitions() if bound]
+    if len(bounds) < 2:
+        return []
+
+    step = bounds[-1] - bounds[-2]
+    new_bounds = get_bounds(bounds[-1], timezone.now().date() + step * ahead, step)[1:]
+    if not new_bounds:
+        return []
+
+    partitions = ', '.join(get_partition_definition(bound) for bound in new_bounds + [None])
+    return [
+        f'ALTER TABLE `{LogTable._meta.db_table}` REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO ({partitions})'
+    ]
+
+
+def get_drop_partitions_statements() -> List[str]:
+    """
+    Return SQL statements dropping the partitions with records older than the oldest pipeline checkpoint.
+    """
+    last_date = LastProcessedLog.get_last_date()
+    if not last_date:
+        return []
+
+    processed_partitions = [name for name, bound in get_partitions() if bound and bound <= last_date.date()]
+    if not processed_partitions:
+        return []
+
+    return [f'ALTER TABLE `{LogTable._meta.db_table}` DROP PARTITION {", ".join(processed_partitions)}']
+
+
+def execute(statements: List[str]):
+    """
+    Execute SQL statements (DDL statements are committed implicitly by MySQL).
+    """
+    with connection.cursor() as cursor:
+        for statement in statements:
+            log.info(f'LogTable retention: {statement}')
+            cursor.execute(statement)
@@ -10,7 +10,9 @@ def plugin_settings(settings):
     settings.EVENT_TRACKING_BACKENDS['tracking_logs']['OPTIONS']['backends'].update(
         {
             'rg_analytics': {
-                'ENGINE': 'rg_instructor_analytics_log_collector.backends.tracking_backend.RGAnalyticsBackend'
+                'ENGINE': 'rg_instructor_analytics_log_collector.backends.tracking_backend.RGAnalyticsBackend',
+                # NOTE: options of the live events processing, e.g. {"mode": "async", "overflow": "drop"}
+                'OPTIONS': getattr(settings, 'ENV_TOKENS', {}).get('RG_LOG_COLLECTOR_LIVE_EVENTS', {}),
             }
         }
     )
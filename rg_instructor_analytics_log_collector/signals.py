@@ -0,0 +1,15 @@
+"""
+Signal handlers of the rg_instructor_analytics_log_collector.
+"""
+from django.dispatch import receiver
+from xmodule.modulestore.django import SignalHandler
+
+from rg_instructor_analytics_log_collector.processors.course_outline import course_outline_cache
+
+
+@receiver(SignalHandler.course_published)
+def invalidate_course_outline(sender, course_key, **kwargs):
+    """
+    Drop the cached outline of the published course.
+    """
+    course_outline_cache.invalidate(course_key)
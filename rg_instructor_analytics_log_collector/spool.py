@@ -0,0 +1,266 @@
+"""
+Durable local spool of the live events.
+"""
+import atexit
+import fcntl
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+OPEN_SUFFIX = '.open'
+CLOSED_SUFFIX = '.spool'
+# NOTE: the new segment is locked by its writer before it is renamed to the open one.
+NEW_SUFFIX = '.new'
+
+
+def _fsync_dir(directory):
+    """
+    Make the files creation and renaming in the directory durable.
+    """
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _is_segment_locked(segment_path):
+    """
+    Return True if the open segment is locked by its writer (or it is already closed).
+    """
+    try:
+        with open(segment_path, 'rb') as segment:
+            try:
+                fcntl.flock(segment.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+    except FileNotFoundError:
+        return True
+    return False
+
+
+class Spool:
+    """
+    Append-only segmented file queue of the text records (lines).
+
+    Every writer process appends to its own open segment `<created ns>-<pid>.open`, that it holds the exclusive
+    `flock` of (the lock is released by the OS when the writer dies). The segment is closed (renamed to `.spool`) when
+    it exceeds `segment_size` bytes, becomes older than `segment_max_age` seconds, or on the process shutdown. Writes
+    are buffered and fsync-ed by the background thread every `fsync_interval` seconds, so an append costs microseconds
+    and only the records of the last interval may be lost on the host crash. Records are rejected when the spool
+    exceeds `max_size` bytes.
+
+    The consumer reads closed segments (and the open segments of the dead writers, that it can lock: the pid is not
+    checked as the writers may run in the other PID namespaces) in the creation order and deletes each of them after
+    its records are committed (`commit`), so records are delivered at least once.
+    """
+
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        spool_dir,
+        segment_size=8 * 1024 * 1024,
+        segment_max_age=60.0,
+        max_size=1024 * 1024 * 1024,
+        fsync_interval=0.2,
+    ):
+        self.spool_dir = spool_dir
+        self.segment_size = segment_size
+        self.segment_max_age = segment_max_age
+        self.max_size = max_size
+        self.fsync_interval = fsync_interval
+        self.rejected_counter = 0
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._segment = None
+        self._segment_path = None
+        self._segment_created = 0
+        self._segment_size = 0
+        self._buffer = bytearray()
+        self._is_dirty = False
+        self._spool_size = 0
+        self._flusher = None
+        self._stopped = threading.Event()
+
+    # Writer side.
+
+    def _ensure_started(self):
+        """
+        Start the background fsync thread in the current process (writer files are not shared with the forks).
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.spool_dir, exist_ok=True)
+            # NOTE: the segment and the buffered records of the parent process are left to the parent.
+            self._segment = None
+            self._buffer = bytearray()
+            self._spool_size = self._get_spool_size()
+            self._stopped.clear()
+            self._flusher = threading.Thread(target=self._run_flusher, name='rg-analytics-spool-flusher', daemon=True)
+            self._flusher.start()
+            if self._pid is None:
+                atexit.register(self.close)
+            self._pid = os.getpid()
+
+    def _get_spool_size(self):
+        """
+        Return the total size of the spool segments.
+        """
+        size = 0
+        for entry in os.scandir(self.spool_dir):
+            if entry.name.endswith((OPEN_SUFFIX, CLOSED_SUFFIX)):
+                try:
+                    size += entry.stat().st_size
+                except FileNotFoundError:
+                    pass  # NOTE: the segment is just consumed.
+        return size
+
+    def _open_segment(self):
+        """
+        Open the new segment of the current process.
+        """
+        self._segment_created = time.monotonic()
+        self._segment_size = 0
+        name = f'{time.time_ns():020d}-{os.getpid()}'
+        new_segment_path = os.path.join(self.spool_dir, name + NEW_SUFFIX)
+        self._segment_path = os.path.join(self.spool_dir, name + OPEN_SUFFIX)
+        self._segment = open(new_segment_path, 'ab', buffering=0)
+        fcntl.flock(self._segment.fileno(), fcntl.LOCK_EX)
+        os.rename(new_segment_path, self._segment_path)
+        _fsync_dir(self.spool_dir)
+
+    def _close_segment(self):
+        """
+        Fsync and close the current segment, make it available for the consumer.
+        """
+        if self._segment is None:
+            return
+        self._sync()
+        self._segment.close()
+        self._segment = None
+        os.rename(self._segment_path, self._segment_path[:-len(OPEN_SUFFIX)] + CLOSED_SUFFIX)
+        _fsync_dir(self.spool_dir)
+
+    def _write(self):
+        """
+        Write the buffered records to the current segment.
+        """
+        if self._buffer:
+            self._segment.write(self._buffer)
+            self._buffer = bytearray()
+            self._is_dirty = True
+
+    def _sync(self):
+        """
+        Write the buffered records of the current segment and flush them to the disk.
+        """
+        if self._segment is not None:
+            self._write()
+            if self._is_dirty:
+                os.fsync(self._segment.fileno())
+                self._is_dirty = False
+
+    def append(self, record: str) -> bool:
+        """
+        Append the record (a line without the line ending).
+
+        return: (bool) False if the record is rejected as the spool is full.
+        """
+        self._ensure_started()
+        line = (record + '\n').encode('utf-8')
+
+        with self._lock:
+            if self._spool_size + len(line) > self.max_size:
+                self.rejected_counter += 1
+                if self.rejected_counter == 1 or not self.rejected_counter % 1000:
+                    log.warning(f'RG LC spool {self.spool_dir} is full, rejected records: {self.rejected_counter}')
+                return False
+
+            if self._segment is None:
+                self._open_segment()
+            self._buffer += line
+            if len(self._buffer) >= self.BUFFER_SIZE:
+                self._write()
+            self._segment_size += len(line)
+            self._spool_size += len(line)
+
+            if self._segment_size >= self.segment_size:
+                self._close_segment()
+        return True
+
+    def _run_flusher(self):
+        """
+        Fsync the records every `fsync_interval` seconds and close the aged segments.
+        """
+        while not self._stopped.wait(self.fsync_interval):
+            try:
+                with self._lock:
+                    if self._segment is not None and time.monotonic() - self._segment_created > self.segment_max_age:
+                        self._close_segment()
+                    else:
+                        self._sync()
+                    # NOTE: the consumer deletes segments, so the size is refreshed to accept new records.
+                    self._spool_size = self._get_spool_size()
+            except OSError:
+                log.exception(f'RG LC can not sync the spool {self.spool_dir}')
+
+    def close(self):
+        """
+        Close the current segment of the process (called on the process shutdown).
+        """
+        if self._pid != os.getpid():
+            return
+        self._stopped.set()
+        with self._lock:
+            self._close_segment()
+
+    # Consumer side.
+
+    def get_segments(self):
+        """
+        Return paths of the segments ready for the consuming in the creation order.
+
+        Open segments of the dead writer processes (not locked by them) are consumed as well.
+        """
+        if not os.path.isdir(self.spool_dir):
+            return []
+
+        segments = []
+        for name in os.listdir(self.spool_dir):
+            if name.endswith(OPEN_SUFFIX):
+                if _is_segment_locked(os.path.join(self.spool_dir, name)):
+                    continue
+            elif not name.endswith(CLOSED_SUFFIX):
+                continue
+            segments.append(name)
+        return [os.path.join(self.spool_dir, name) for name in sorted(segments)]
+
+    @staticmethod
+    def read_segment(segment_path):
+        """
+        Yield records of the segment.
+
+        The last line, that is not completely written (by the crashed writer) is skipped.
+        """
+        with open(segment_path, encoding='utf-8') as segment:
+            for line in segment:
+                if not line.endswith('\n'):
+                    log.warning(f'RG LC skipped incomplete record of the spool segment {segment_path}')
+                    break
+                yield line[:-1]
+
+    @staticmethod
+    def commit(segment_path):
+        """
+        Delete the consumed segment.
+        """
+        os.remove(segment_path)
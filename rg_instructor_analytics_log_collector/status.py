@@ -0,0 +1,175 @@
+"""
+Processing lag and backlog metrics of the Log Watcher.
+
+Metrics are rendered in the Prometheus text format and served by the local HTTP endpoint (`/metrics`) or written to
+the file after every cycle. Database values come from the indexed lookups only: the newest `LogTable.log_time` and
+the pipeline checkpoints (`LastProcessedLog`).
+"""
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.db import connection
+
+from rg_instructor_analytics_log_collector.models import LastProcessedLog, LogTable
+
+log = logging.getLogger(__name__)
+
+PREFIX = 'rg_log_collector'
+# NOTE: windows of the events rate: (label, seconds).
+RATE_WINDOWS = (('1m', 60), ('5m', 300), ('15m', 900))
+
+
+class WatcherStatus:
+    """
+    Status of the Log Watcher backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.last_cycle_seconds = None
+        self.last_cycle_finished = None
+        self.cycles_counter = 0
+        # NOTE: (monotonic time, loaded records count) samples for the events rate.
+        self._samples = deque()
+        self._lock = threading.Lock()
+        self._add_sample()
+
+    def _add_sample(self):
+        """
+        Store the current loaded records count, samples older than the longest window are dropped.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, self.backend.get_loaded_records_count()))
+            while len(self._samples) > 2 and now - self._samples[1][0] > RATE_WINDOWS[-1][1]:
+                self._samples.popleft()
+
+    def record_cycle(self, seconds):
+        """
+        Store the results of the finished cycle.
+        """
+        self.last_cycle_seconds = seconds
+        self.last_cycle_finished = time.time()
+        self.cycles_counter += 1
+        self._add_sample()
+
+    def get_events_rates(self):
+        """
+        Return loaded events per second over the windows: {<window label>: <rate>}.
+
+        The rate is computed from the oldest sample within the window, so the window with fewer samples than its span
+        gives the rate since the oldest sample. If no sample is within the window (the last cycle is longer than it),
+        the newest sample is used and the rate spans the last cycle.
+        """
+        now = time.monotonic()
+        count = self.backend.get_loaded_records_count()
+        with self._lock:
+            samples = list(self._samples)
+
+        rates = {}
+        for label, window in RATE_WINDOWS:
+            window_samples = [sample for sample in samples if now - sample[0] <= window]
+            sample_time, sample_count = window_samples[0] if window_samples else samples[-1]
+            elapsed = now - sample_time
+            rates[label] = (count - sample_count) / elapsed if elapsed > 0 else 0.0
+        return rates
+
+    def get_pipelines_lag(self):
+        """
+        Return seconds between the newest log record and the pipelines checkpoints: {<pipeline alias>: <lag>}.
+        """
+        newest_log_time = LogTable.objects.order_by('-log_time').values_list('log_time', flat=True).first()
+        if newest_log_time is None:
+            return {}
+
+        aliases = {pipeline.processor_name: pipeline.alias for pipeline in self.backend.processor.pipelines}
+        return {
+            aliases[processor]: max((newest_log_time - log_time).total_seconds(), 0.0)
+            for processor, log_time in LastProcessedLog.objects.values_list('processor', 'log_time')
+            if processor in aliases
+        }
+
+    def render(self):
+        """
+        Return metrics in the Prometheus text format.
+        """
+        backend_label = f'backend="{type(self.backend).__name__}"'
+        lines = [f'# TYPE {PREFIX}_pipeline_lag_seconds gauge']
+        for pipeline, lag in sorted(self.get_pipelines_lag().items()):
+            lines.append(f'{PREFIX}_pipeline_lag_seconds{{pipeline="{pipeline}"}} {lag}')
+
+        backlog = self.backend.get_backlog()
+        lines += [
+            f'# TYPE {PREFIX}_backlog_files gauge',
+            f'{PREFIX}_backlog_files{{{backend_label}}} {len(backlog)}',
+            f'# TYPE {PREFIX}_backlog_bytes gauge',
+            f'{PREFIX}_backlog_bytes{{{backend_label}}} {sum(backlog.values())}',
+            f'# TYPE {PREFIX}_cycles_total counter',
+            f'{PREFIX}_cycles_total {self.cycles_counter}',
+        ]
+        if self.last_cycle_seconds is not None:
+            lines += [
+                f'# TYPE {PREFIX}_last_cycle_seconds gauge',
+                f'{PREFIX}_last_cycle_seconds {self.last_cycle_seconds}',
+                f'# TYPE {PREFIX}_last_cycle_timestamp_seconds gauge',
+                f'{PREFIX}_last_cycle_timestamp_seconds {self.last_cycle_finished}',
+            ]
+
+        lines.append(f'# TYPE {PREFIX}_events_per_second gauge')
+        for window, rate in self.get_events_rates().items():
+            lines.append(f'{PREFIX}_events_per_second{{window="{window}"}} {rate}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Write metrics to the file atomically.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as status_file:
+            status_file.write(self.render())
+        os.replace(status_file.name, path)
+
+    def serve(self, host, port):
+        """
+        Serve metrics by the HTTP endpoint `/metrics` in the background thread.
+
+        return: HTTP server (call `shutdown` to stop it).
+        """
+        status = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            """
+            Handler of the metrics endpoint.
+            """
+
+            def do_GET(self):  # NOQA
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                try:
+                    body = status.render().encode('utf-8')
+                except Exception:
+                    log.exception('RG LC can not render the status metrics')
+                    self.send_error(500)
+                    return
+                finally:
+                    # NOTE: every request is handled in a new thread with its own database connection.
+                    connection.close()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # NOQA
+                log.debug(format, *args)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='rg-analytics-status', daemon=True).start()
+        return server
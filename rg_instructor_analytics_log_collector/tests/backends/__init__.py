@@ -0,0 +1 @@
+"""Test backends functionality."""
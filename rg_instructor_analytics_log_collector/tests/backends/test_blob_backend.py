@@ -0,0 +1,81 @@
+"""Test the `BlobBackend` files loading."""
+import gzip
+from io import BytesIO
+import os
+from unittest import skipUnless, TestCase
+
+from azure.storage.blob import StorageStreamDownloader
+from mock import Mock
+
+from rg_instructor_analytics_log_collector.backends.blob_backend import BlobBackend
+from rg_instructor_analytics_log_collector.backends.prefetch import Prefetcher
+
+# NOTE: set to the connection string of the Azurite local emulator to run the tests against it. The explicit
+#  well-known development account is used by default (`UseDevelopmentStorage=true` is not parsed by the
+#  azure-storage-blob 12.8).
+AZURITE_CONNECTION_STRING = os.environ.get('AZURITE_CONNECTION_STRING')
+DEVELOPMENT_CONNECTION_STRING = (
+    'DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;'
+    'AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;'
+    'BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1'
+)
+
+LINES = [b'{"event_type": "play_video", "time": "2024-01-01T00:00:%02d"}\n' % second for second in range(60)]
+
+
+class TestBlobBackend(TestCase):
+    """Test `BlobBackend` streaming load of the files."""
+
+    def setUp(self):
+        """Prepare backend with the repository collecting loaded lines."""
+        self.backend = BlobBackend(
+            AZURITE_CONNECTION_STRING or DEVELOPMENT_CONNECTION_STRING, 'tracking-logs', reload_logs=True
+        )
+        self.loaded_lines = []
+        self.backend.repository = Mock(
+            add_new_log_records=lambda log_file_descriptor: self.loaded_lines.extend(log_file_descriptor)
+        )
+
+    def test_load_archived_file(self):
+        """Ensure archived blob is decompressed by chunks."""
+        archive = gzip.compress(b''.join(LINES))
+        downloader = Mock(spec=StorageStreamDownloader)
+        downloader.chunks.return_value = iter([archive[:10], archive[10:50], archive[50:]])
+        self.backend._load_file('tracking.log-1.gz', downloader)
+        self.assertEqual(self.loaded_lines, LINES)
+
+    def test_load_not_archived_file(self):
+        """Ensure lines split across the chunks are joined."""
+        content = b''.join(LINES)
+        downloader = Mock(spec=StorageStreamDownloader)
+        downloader.chunks.return_value = iter([content[:33], content[33:1000], content[1000:]])
+        self.backend._load_file('tracking.log', downloader)
+        self.assertEqual(self.loaded_lines, LINES)
+
+    def test_load_prefetched_file(self):
+        """Ensure prefetched archived file is loaded."""
+        self.backend._load_file('tracking.log-1.gz', BytesIO(gzip.compress(b''.join(LINES))))
+        self.assertEqual(self.loaded_lines, LINES)
+
+    @skipUnless(AZURITE_CONNECTION_STRING, 'Azurite connection string is not set')
+    def test_azurite(self):
+        """Ensure files are loaded from the Azurite container."""
+        self.load_from_azurite()
+
+    @skipUnless(AZURITE_CONNECTION_STRING, 'Azurite connection string is not set')
+    def test_azurite_prefetch(self):
+        """Ensure files are prefetched from the Azurite container with the ranged downloads."""
+        self.backend.prefetcher = Prefetcher(workers=2, depth=2, part_size=100)
+        self.load_from_azurite()
+
+    def load_from_azurite(self):
+        """Upload files into the Azurite container and load them."""
+        container = self.backend.blob
+        container.create_container()
+        self.addCleanup(container.delete_container)
+        container.upload_blob('tracking.log-1.gz', gzip.compress(b''.join(LINES[:30])))
+        container.upload_blob('tracking.log', b''.join(LINES[30:]))
+
+        for file_name, file in self.backend._get_sorted_files_for_processing():
+            self.backend._load_file(file_name, file)
+        self.assertCountEqual(self.loaded_lines, LINES)
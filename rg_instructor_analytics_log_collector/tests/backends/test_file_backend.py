@@ -0,0 +1,183 @@
+"""Test the `FileBackend` incremental reading of the not archived log file."""
+import gzip
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+
+from mock import Mock
+
+from rg_instructor_analytics_log_collector.backends.file_backend import FileBackend
+
+LINES = [b'{"event_type": "play_video", "time": "2024-01-01T00:00:%02d"}\n' % second for second in range(10)]
+
+
+class CheckpointRepository:
+    """Repository collecting the loaded lines and keeping the log file checkpoints in memory."""
+
+    def __init__(self):
+        """Prepare the repository."""
+        self.checkpoints = {}
+        self.lines = []
+
+    def get_log_file_checkpoint(self, file_name):
+        """Return the stored checkpoint."""
+        return self.checkpoints.get(file_name)
+
+    def update_log_file_checkpoint(self, file_name, **checkpoint):
+        """Store the checkpoint."""
+        self.checkpoints[file_name] = SimpleNamespace(**checkpoint)
+
+    def add_new_log_records(self, log_file_descriptor):
+        """Collect the lines."""
+        self.lines.extend(log_file_descriptor)
+
+    def get_processed_zip_files(self):
+        """Return no processed files."""
+        return set()
+
+    def mark_as_processed_source(self, file_name):
+        """Skip marking of the processed file."""
+
+
+class TestFileBackendTail(TestCase):
+    """Test `FileBackend` reading of the lines appended to the not archived log file."""
+
+    def setUp(self):
+        """Prepare the log directory and the backend with the in-memory repository."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'tracking.log')
+        self.backend = FileBackend(self.directory)
+        self.backend.repository = self.repository = CheckpointRepository()
+
+    def write(self, content, mode='ab'):
+        """Write the content to the log file."""
+        with open(self.path, mode) as log_file:
+            log_file.write(content)
+
+    def load(self):
+        """Load the log file and return the loaded lines."""
+        self.repository.lines = []
+        self.backend._load_file('tracking.log', self.path)
+        return self.repository.lines
+
+    def test_appended_lines(self):
+        """Ensure only the lines appended since the previous read are loaded."""
+        self.write(b''.join(LINES[:3]))
+        self.assertEqual(self.load(), LINES[:3])
+
+        self.write(b''.join(LINES[3:5]))
+        self.assertEqual(self.load(), LINES[3:5])
+        self.assertEqual(self.load(), [])
+        self.assertEqual(self.repository.checkpoints[self.path].offset, len(b''.join(LINES[:5])))
+
+    def test_partial_line(self):
+        """Ensure the trailing line being written is not consumed until it is complete."""
+        self.write(LINES[0] + LINES[1][:10])
+        self.assertEqual(self.load(), LINES[:1])
+        self.assertEqual(self.repository.checkpoints[self.path].offset, len(LINES[0]))
+
+        self.write(LINES[1][10:])
+        self.assertEqual(self.load(), LINES[1:2])
+
+    def test_rotation(self):
+        """Ensure the new file is read from the beginning after the rotation (inode change)."""
+        self.write(b''.join(LINES[:3]))
+        self.load()
+
+        os.rename(self.path, os.path.join(self.directory, 'tracking.log-1'))
+        # NOTE: the new file has the same leading bytes, so the rotation is detected by the inode only.
+        self.write(b''.join(LINES[:4]))
+        self.assertEqual(self.load(), LINES[:4])
+
+    def test_truncation(self):
+        """Ensure the file is read from the beginning after it was truncated."""
+        self.write(b''.join(LINES[:3]))
+        self.load()
+
+        self.write(LINES[5], mode='wb')
+        self.assertEqual(self.load(), LINES[5:6])
+
+    def test_fingerprint_mismatch(self):
+        """Ensure the file is read from the beginning if it was rewritten in place with the other content."""
+        self.write(b''.join(LINES[:3]))
+        self.load()
+
+        self.write(b''.join(LINES[5:9]), mode='r+b')
+        self.assertEqual(self.load(), LINES[5:9])
+
+    def test_reload_logs(self):
+        """Ensure the stored checkpoint is ignored with the `reload_logs`."""
+        self.write(b''.join(LINES[:3]))
+        self.load()
+
+        self.backend.reload_logs = True
+        self.assertEqual(self.load(), LINES[:3])
+
+    def test_has_backlog(self):
+        """Ensure only the records appended while the file was read are the backlog, not the loaded ones."""
+        self.write(b''.join(LINES[:3]) + LINES[3][:10])
+        self.load()
+        self.assertFalse(self.backend.has_backlog())
+
+        self.write(LINES[3][10:])
+        add_new_log_records = self.repository.add_new_log_records
+        self.repository.add_new_log_records = lambda log_file_descriptor: (
+            add_new_log_records(log_file_descriptor), self.write(LINES[4])
+        )
+        self.assertEqual(self.load(), LINES[3:4])
+        self.assertTrue(self.backend.has_backlog())
+
+        self.repository.add_new_log_records = add_new_log_records
+        self.assertEqual(self.load(), LINES[4:5])
+        self.assertFalse(self.backend.has_backlog())
+
+        self.backend.backlog = {'tracking.log-1.gz': 100}
+        self.assertTrue(self.backend.has_backlog())
+
+
+class TestFileBackendBacklog(TestCase):
+    """Test `FileBackend` backlog reported after the cycle."""
+
+    def setUp(self):
+        """Prepare the log directory and the backend with the in-memory repository."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.backend = FileBackend(self.directory)
+        self.backend.repository = CheckpointRepository()
+        self.backend.processor = Mock()
+
+    def write_archive(self, file_name, content):
+        """Write the archived log file."""
+        with gzip.open(os.path.join(self.directory, file_name), 'wb') as archive:
+            archive.write(content)
+
+    def test_backlog_after_cycle(self):
+        """Ensure listed files left not processed and not read bytes of the log file are the backlog."""
+        self.write_archive('tracking.log-1.gz', LINES[0])
+        with open(os.path.join(self.directory, 'tracking.log'), 'wb') as log_file:
+            log_file.write(b''.join(LINES[:3]))
+        self.backend.load_and_process()
+        self.assertEqual(self.backend.get_backlog(), {})
+        self.assertFalse(self.backend.has_backlog())
+
+        self.write_archive('tracking.log-2.gz', LINES[1])
+        with open(os.path.join(self.directory, 'tracking.log'), 'ab') as log_file:
+            log_file.write(LINES[3])
+
+        self.assertEqual(self.backend.get_backlog(), {'tracking.log': len(LINES[3])})
+
+    def test_failed_cycle_backlog(self):
+        """Ensure files of the failed cycle's listing are the backlog, the storage is not listed again."""
+        self.write_archive('tracking.log-1.gz', LINES[0])
+        self.write_archive('tracking.log-2.gz', LINES[1])
+        self.backend.processor = Mock(process=Mock(side_effect=RuntimeError('database is gone')))
+
+        with self.assertRaises(RuntimeError):
+            self.backend.load_and_process()
+        self.write_archive('tracking.log-3.gz', LINES[2])
+
+        self.assertEqual(set(self.backend.get_backlog()), {'tracking.log-1.gz', 'tracking.log-2.gz'})
+        self.assertTrue(self.backend.has_backlog())
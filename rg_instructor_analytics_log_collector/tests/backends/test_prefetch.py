@@ -0,0 +1,94 @@
+"""Test the `Prefetcher` of the tracking log files."""
+import threading
+from unittest import TestCase
+
+from ddt import data, ddt
+
+from rg_instructor_analytics_log_collector.backends.prefetch import Prefetcher
+
+
+class FakeStorage:
+    """Storage of the files, that records the concurrently fetched bytes."""
+
+    def __init__(self, files):
+        """Prepare files."""
+        self.files = files
+        self.requests = []
+        self.in_flight = set()
+        self.max_in_flight_bytes = 0
+        self.lock = threading.Lock()
+
+    def describe(self, name):
+        """Return name and size of the file."""
+        return name, len(self.files[name])
+
+    def read(self, name, start, end):
+        """Return the file or its byte range by 3 bytes chunks."""
+        with self.lock:
+            self.requests.append((name, start, end))
+            self.in_flight.add(name)
+            self.max_in_flight_bytes = max(
+                self.max_in_flight_bytes, sum(len(self.files[in_flight]) for in_flight in self.in_flight)
+            )
+        content = self.files[name][start:None if end is None else end + 1]
+        return [content[position:position + 3] for position in range(0, len(content), 3)]
+
+    def consume(self, prefetcher):
+        """Read all files through the prefetcher."""
+        result = []
+        for name, file in prefetcher.iterate(sorted(self.files), self.describe, self.read):
+            result.append((name, file.read()))
+            with self.lock:
+                self.in_flight.discard(name)
+        return result
+
+
+@ddt
+class TestPrefetcher(TestCase):
+    """Test `Prefetcher` logic."""
+
+    def setUp(self):
+        """Prepare storage."""
+        self.storage = FakeStorage({
+            f'tracking.log-{number}.gz': bytes(range(number * 10, number * 10 + 10 + number)) for number in range(8)
+        })
+
+    @data(1, 2, 8)
+    def test_order_and_content(self, depth):
+        """Ensure files are yielded in the order of the sources with the full content."""
+        result = self.storage.consume(Prefetcher(workers=depth, depth=depth, part_size=4))
+        self.assertEqual(result, sorted(self.storage.files.items()))
+
+    def test_ranged_reads(self):
+        """Ensure large files are read by the ranges and small ones entirely."""
+        self.storage.files = {'small.gz': b'12345', 'large.gz': b'0123456789ab'}
+        result = self.storage.consume(Prefetcher(part_size=5))
+        self.assertEqual(result, [('large.gz', b'0123456789ab'), ('small.gz', b'12345')])
+        self.assertEqual(
+            sorted(self.storage.requests),
+            [('large.gz', 0, 4), ('large.gz', 5, 9), ('large.gz', 10, 11), ('small.gz', 0, None)]
+        )
+
+    def test_max_in_flight_bytes(self):
+        """Ensure fetched not handled files fit the budget."""
+        prefetcher = Prefetcher(workers=4, depth=4, max_in_flight_bytes=25)
+        result = self.storage.consume(prefetcher)
+        self.assertEqual(len(result), 8)
+        self.assertLessEqual(self.storage.max_in_flight_bytes, 25)
+        self.assertEqual(prefetcher.in_flight_bytes, 0)
+
+    def test_larger_than_budget(self):
+        """Ensure the file larger than the budget is fetched alone."""
+        result = self.storage.consume(Prefetcher(max_in_flight_bytes=5))
+        self.assertEqual(result, sorted(self.storage.files.items()))
+        self.assertEqual(self.storage.max_in_flight_bytes, 17)
+
+    def test_error(self):
+        """Ensure fetching error is raised to the consumer and the budget is released."""
+        def read(name, start, end):
+            raise IOError('Connection reset')
+
+        prefetcher = Prefetcher()
+        with self.assertRaises(IOError):
+            list(prefetcher.iterate(sorted(self.storage.files), self.storage.describe, read))
+        self.assertEqual(prefetcher.in_flight_bytes, 0)
@@ -0,0 +1,169 @@
+"""Test the `S3Backend` against the local S3 stand-in."""
+import gzip
+import os
+from types import SimpleNamespace
+from unittest import skipUnless, TestCase
+
+from mock import ANY, Mock, patch
+
+from rg_instructor_analytics_log_collector.backends.s3_backend import S3Backend
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+
+@skipUnless(mock_aws, 'moto is not installed')
+class TestS3Backend(TestCase):
+    """Test `S3Backend` files fetching."""
+
+    def setUp(self):
+        """Prepare the bucket with the tracking logs."""
+        patcher = patch.dict(os.environ, {'AWS_DEFAULT_REGION': 'us-east-1'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock = mock_aws()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+
+        s3 = boto3.resource('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='tracking-logs')
+        self.files = {
+            'tracking.log-1.gz': gzip.compress(b'{"event_type": "play_video"}\n' * 1000),
+            'tracking.log-2.gz': gzip.compress(b'{"event_type": "pause_video"}\n' * 10),
+            'tracking.log': b'{"event_type": "seq_goto"}\n',
+        }
+        for key, content in self.files.items():
+            s3.Object('tracking-logs', key).put(Body=content)
+
+    def get_files(self, part_size=None, **kwargs):
+        """Return fetched files of the backend."""
+        backend = S3Backend('key', 'secret', 'tracking-logs', reload_logs=True, **kwargs)
+        if part_size:
+            backend.prefetcher.part_size = part_size
+        return {name: file.read() for name, file in backend._get_sorted_files_for_processing()}
+
+    def test_sequential(self):
+        """Ensure files are fetched without prefetching."""
+        self.assertEqual(self.get_files(), self.files)
+
+    def test_prefetch(self):
+        """Ensure files are prefetched with the ranged reads of the large ones."""
+        self.assertEqual(self.get_files(prefetch=2, part_size=100), self.files)
+
+
+@skipUnless(mock_aws, 'moto is not installed')
+class TestS3BackendIncrementalListing(TestCase):
+    """Test `S3Backend` incremental listing."""
+
+    def setUp(self):
+        """Prepare the bucket with the date-partitioned tracking logs and the repository."""
+        patcher = patch.dict(os.environ, {'AWS_DEFAULT_REGION': 'us-east-1'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock = mock_aws()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+
+        self.s3 = boto3.resource('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket='tracking-logs')
+        for key in ['logs/2024/01/01/tracking.log-1.gz', 'logs/2024/01/02/tracking.log-2.gz', 'logs/tracking.log']:
+            self.put(key)
+
+        self.processed_files = set()
+        self.checkpoints = {}
+        self.repository = Mock(
+            get_processed_zip_files=lambda: set(self.processed_files),
+            mark_as_processed_source=self.processed_files.add,
+            get_listing_checkpoint=self.checkpoints.get,
+            update_listing_checkpoint=lambda source, last_key, live_keys: self.checkpoints.__setitem__(
+                source, SimpleNamespace(last_key=last_key, live_keys='\n'.join(live_keys))
+            ),
+        )
+
+    def put(self, key):
+        """Upload the empty tracking log file."""
+        self.s3.Object('tracking-logs', key).put(Body=gzip.compress(b'') if key.endswith('.gz') else b'')
+
+    def run_cycle(self):
+        """Run the cycle of the backend and return the listed keys."""
+        backend = S3Backend('key', 'secret', 'tracking-logs', s3_prefix='logs/', s3_incremental=True)
+        backend.repository = self.repository
+        backend.processor = Mock()
+        backend.load_and_process()
+        return sorted(backend.listed_keys)
+
+    def get_last_listed_keys(self):
+        """Return the stored last keys of the prefixes."""
+        return {source: checkpoint.last_key for source, checkpoint in self.checkpoints.items()}
+
+    def test_incremental_listing(self):
+        """Ensure keys before the stored one are not listed and the keys directly under the prefix are listed."""
+        self.assertEqual(len(self.run_cycle()), 3)
+        self.assertEqual(self.get_last_listed_keys(), {
+            's3://tracking-logs/logs/2024/': 'logs/2024/01/02/tracking.log-2.gz',
+        })
+
+        self.put('logs/2024/01/03/tracking.log-3.gz')
+        self.assertEqual(self.run_cycle(), ['logs/2024/01/03/tracking.log-3.gz', 'logs/tracking.log'])
+        self.assertEqual(self.get_last_listed_keys(), {
+            's3://tracking-logs/logs/2024/': 'logs/2024/01/03/tracking.log-3.gz',
+        })
+        self.assertEqual(len(self.processed_files), 3)
+
+    def test_flat_layout(self):
+        """Ensure the keys directly under the prefix are listed after their stored key on the next cycle."""
+        self.s3.Object('tracking-logs', 'logs/2024/01/01/tracking.log-1.gz').delete()
+        self.s3.Object('tracking-logs', 'logs/2024/01/02/tracking.log-2.gz').delete()
+        for key in ['logs/tracking.log-1.gz', 'logs/tracking.log-2.gz']:
+            self.put(key)
+        self.assertEqual(self.run_cycle(), ['logs/tracking.log', 'logs/tracking.log-1.gz', 'logs/tracking.log-2.gz'])
+        checkpoint = self.checkpoints['s3://tracking-logs/logs/']
+        self.assertEqual((checkpoint.last_key, checkpoint.live_keys), ('logs/tracking.log-2.gz', 'logs/tracking.log'))
+
+        self.put('logs/tracking.log-3.gz')
+        paginate = S3Backend._paginate
+        with patch.object(S3Backend, '_paginate', autospec=True, side_effect=paginate) as paginate_mock:
+            self.assertEqual(self.run_cycle(), ['logs/tracking.log', 'logs/tracking.log-3.gz'])
+
+        paginate_mock.assert_called_once_with(
+            ANY, Prefix='logs/', Delimiter='/', StartAfter='logs/tracking.log-2.gz'
+        )
+        self.assertEqual(self.checkpoints['s3://tracking-logs/logs/'].last_key, 'logs/tracking.log-3.gz')
+
+    def test_flat_layout_with_prefixes(self):
+        """Ensure the top level prefixes listed before the stored key of the flat layout are still listed."""
+        self.put('logs/tracking.log-1.gz')
+        self.run_cycle()
+        self.assertEqual(self.checkpoints['s3://tracking-logs/logs/'].live_keys, 'logs/2024/\nlogs/tracking.log')
+
+        self.put('logs/2024/01/03/tracking.log-3.gz')
+        self.assertEqual(self.run_cycle(), ['logs/2024/01/03/tracking.log-3.gz', 'logs/tracking.log'])
+
+    def test_late_key_of_other_prefix(self):
+        """Ensure the key uploaded late to the prefix listed before the other prefix's stored key is not skipped."""
+        for key in ['logs/host-a/tracking.log-1.gz', 'logs/host-c/tracking.log-1.gz']:
+            self.put(key)
+        self.run_cycle()
+
+        self.put('logs/host-b/tracking.log-1.gz')
+        self.assertEqual(self.run_cycle(), ['logs/host-b/tracking.log-1.gz', 'logs/tracking.log'])
+        self.assertIn('logs/host-b/tracking.log-1.gz', self.processed_files)
+        self.assertEqual(self.checkpoints['s3://tracking-logs/logs/host-b/'].last_key, 'logs/host-b/tracking.log-1.gz')
+
+    def test_not_archived_key_passed(self):
+        """Ensure the stored key passes the not archived file listed before the archives, which is still listed."""
+        for key in ['logs/host-a/tracking.log', 'logs/host-a/tracking.log-1.gz']:
+            self.put(key)
+        self.run_cycle()
+        checkpoint = self.checkpoints['s3://tracking-logs/logs/host-a/']
+        self.assertEqual(checkpoint.last_key, 'logs/host-a/tracking.log-1.gz')
+        self.assertEqual(checkpoint.live_keys, 'logs/host-a/tracking.log')
+
+        self.put('logs/host-a/tracking.log-2.gz')
+        self.assertEqual(self.run_cycle(), [
+            'logs/host-a/tracking.log', 'logs/host-a/tracking.log-2.gz', 'logs/tracking.log',
+        ])
+        self.assertEqual(self.checkpoints['s3://tracking-logs/logs/host-a/'].last_key, 'logs/host-a/tracking.log-2.gz')
@@ -0,0 +1,66 @@
+"""Test streaming decompression and line splitting."""
+import gzip
+import random
+from unittest import TestCase
+
+from ddt import data, ddt
+
+from rg_instructor_analytics_log_collector.backends import streaming
+from rg_instructor_analytics_log_collector.backends.streaming import iter_gunzip, iter_lines
+
+
+def split(content, chunk_size):
+    """Split content into chunks of the given size."""
+    return [content[start:start + chunk_size] for start in range(0, len(content), chunk_size)]
+
+
+@ddt
+class TestStreaming(TestCase):
+    """Test `iter_gunzip` and `iter_lines` logic."""
+
+    def setUp(self):
+        """Prepare tracking log lines."""
+        rng = random.Random(0)
+        self.lines = [
+            b'{"event_type": "play_video", "event": "%s"}\n' % (b'x' * rng.randint(0, 300)) for _ in range(2000)
+        ]
+        self.content = b''.join(self.lines)
+
+    @data(1, 7, 4096, 10 ** 7)
+    def test_iter_lines(self, chunk_size):
+        """Ensure lines split across the chunk boundaries are joined."""
+        self.assertEqual(list(iter_lines(split(self.content, chunk_size))), self.lines)
+
+    def test_iter_lines_without_trailing_newline(self):
+        """Ensure the last line without the line ending is not lost."""
+        self.assertEqual(list(iter_lines([b'a\nb', b'c', b''])), [b'a\n', b'bc'])
+
+    @data(1, 13, 4096, 10 ** 7)
+    def test_iter_gunzip(self, chunk_size):
+        """Ensure archive is decompressed by chunks."""
+        archive = gzip.compress(self.content)
+        self.assertEqual(b''.join(iter_gunzip(split(archive, chunk_size))), self.content)
+
+    @data(1, 100, 10 ** 7)
+    def test_iter_gunzip_multi_member(self, chunk_size):
+        """Ensure concatenated archives (with the trailing padding) are decompressed as gzip.open does."""
+        archive = gzip.compress(self.content[:1000]) + gzip.compress(b'') + gzip.compress(self.content[1000:])
+        archive += b'\x00' * 10
+        self.assertEqual(b''.join(iter_gunzip(split(archive, chunk_size))), self.content)
+
+    def test_iter_gunzip_bounded_output(self):
+        """Ensure highly compressible chunk is decompressed by the bounded pieces."""
+        archive = gzip.compress(b'\n' * (streaming.DECOMPRESSED_CHUNK_SIZE * 5))
+        pieces = list(iter_gunzip([archive]))
+        self.assertEqual(sum(len(piece) for piece in pieces), streaming.DECOMPRESSED_CHUNK_SIZE * 5)
+        self.assertLessEqual(max(len(piece) for piece in pieces), streaming.DECOMPRESSED_CHUNK_SIZE)
+
+    def test_iter_gunzip_truncated(self):
+        """Ensure truncated archive is reported."""
+        archive = gzip.compress(self.content)
+        with self.assertRaises(EOFError):
+            b''.join(iter_gunzip([archive[:len(archive) // 2]]))
+
+    def test_iter_gunzip_empty(self):
+        """Ensure empty blob gives no data."""
+        self.assertEqual(list(iter_gunzip([])), [])
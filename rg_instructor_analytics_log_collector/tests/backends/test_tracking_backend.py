@@ -0,0 +1,264 @@
+"""Test the `RGAnalyticsBackend` live events handling."""
+from datetime import datetime, timezone
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from ddt import data, ddt, unpack
+from django.db import OperationalError
+from django.test import TestCase as DatabaseTestCase
+from mock import Mock, patch
+
+from rg_instructor_analytics_log_collector.backends.spool_backend import SpoolBackend
+from rg_instructor_analytics_log_collector.backends.tracking_backend import AsyncEventsWorker, RGAnalyticsBackend
+from rg_instructor_analytics_log_collector.constants import Events
+from rg_instructor_analytics_log_collector.models import LastProcessedLog, VideoViewsByBlock
+from rg_instructor_analytics_log_collector.processors.base_pipeline import BasePipeline
+from rg_instructor_analytics_log_collector.processors.processor import Processor
+
+EVENT_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def get_event(number):
+    """Return the live event."""
+    return {'event_type': 'play_video', 'time': EVENT_TIME, 'event': {'number': number}}
+
+
+class BlockingProcessor:
+    """Processor collecting the processed events, blocked until it is released."""
+
+    def __init__(self):
+        """Prepare the processor."""
+        self.released = threading.Event()
+        self.batches = []
+
+    def process_batch(self, events_data):
+        """Collect the batch."""
+        self.released.wait(5)
+        self.batches.append(events_data)
+
+    @property
+    def events(self):
+        """Return numbers of the processed events."""
+        return [event_data['log_message']['event']['number'] for batch in self.batches for event_data in batch]
+
+
+class FailingProcessor(BlockingProcessor):
+    """Processor failing the first batches as the database is not available."""
+
+    def __init__(self, errors):
+        """Prepare the processor."""
+        super().__init__()
+        self.errors = errors
+
+    def process_batch(self, events_data):
+        """Fail the batch or collect it."""
+        if self.errors:
+            self.errors -= 1
+            raise OperationalError('MySQL server has gone away')
+        super().process_batch(events_data)
+
+
+class CountingPipeline(BasePipeline):
+    """Pipeline counting the pushed events in the database."""
+
+    alias = 'counting'
+    supported_types = [Events.SEQ_GOTO]
+    processor_name = LastProcessedLog.STUDENT_STEP
+
+    def format(self, record, live_event=False):
+        """Return the event data."""
+        return record
+
+    def push_to_database(self, formatted_record):
+        """Count the event."""
+        block, _ = VideoViewsByBlock.objects.get_or_create(course='course-v1:edX+DemoX+Demo', video_block_id='block')
+        block.count_part_viewed += 1
+        block.save()
+
+
+class LockedPipeline(CountingPipeline):
+    """Pipeline failing the first pushes as the database lock wait timeout is exceeded."""
+
+    alias = 'locked'
+
+    def __init__(self, errors):
+        """Prepare the pipeline."""
+        self.errors = errors
+        self.pushed_counter = 0
+
+    def push_to_database(self, formatted_record):
+        """Fail the push or count it."""
+        if self.errors:
+            self.errors -= 1
+            raise OperationalError(1205, 'Lock wait timeout exceeded; try restarting transaction')
+        self.pushed_counter += 1
+
+
+@ddt
+@patch('rg_instructor_analytics_log_collector.backends.tracking_backend.close_old_connections', Mock())
+@patch('rg_instructor_analytics_log_collector.backends.tracking_backend.connection', Mock())
+class TestAsyncMode(TestCase):
+    """Test `RGAnalyticsBackend` async mode."""
+
+    def setUp(self):
+        """Prepare the processor and the spill directory."""
+        self.processor = BlockingProcessor()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def get_backend(self, **options):
+        """Return the async backend with the test processor."""
+        backend = RGAnalyticsBackend(mode='async', flush_interval=0.01, **options)
+        backend.worker.processor = self.processor
+        return backend
+
+    def test_send_enqueues(self):
+        """Ensure events are processed by the worker in batches and flushed on close."""
+        backend = self.get_backend(batch_size=3)
+        for number in range(7):
+            backend.send(get_event(number))
+        self.processor.released.set()
+        backend.worker.close()
+
+        self.assertEqual(self.processor.events, list(range(7)))
+        self.assertTrue(all(len(batch) <= 3 for batch in self.processor.batches))
+        self.assertEqual(self.processor.batches[0][0]['log_time'], EVENT_TIME)
+
+    @data('drop', 'block')
+    def test_overflow_drop(self, overflow):
+        """Ensure events not fitting the queue are dropped (after the timeout for the block overflow)."""
+        backend = self.get_backend(queue_size=2, batch_size=1, overflow=overflow, block_timeout=0.01)
+        backend.send(get_event(0))
+        while not backend.worker._queue.empty():
+            pass  # NOTE: wait until the worker takes the first event and blocks on processing.
+        for number in range(1, 6):
+            backend.send(get_event(number))
+        self.processor.released.set()
+        backend.worker.close()
+
+        self.assertEqual(self.processor.events, [0, 1, 2])
+        self.assertEqual(backend.worker.dropped_counter, 3)
+
+    def test_overflow_spill(self):
+        """Ensure events not fitting the queue are spilled and replayed after the queue is drained."""
+        spill_path = os.path.join(self.tmp_dir, 'spill.log')
+        backend = self.get_backend(queue_size=2, batch_size=1, overflow='spill', spill_path=spill_path)
+        backend.send(get_event(0))
+        while not backend.worker._queue.empty():
+            pass
+        for number in range(1, 6):
+            backend.send(get_event(number))
+        self.assertTrue(os.path.exists(spill_path))
+        self.processor.released.set()
+        backend.worker.close()
+
+        self.assertEqual(self.processor.events, [0, 1, 2, 3, 4, 5])
+        self.assertEqual(self.processor.batches[-1][0]['log_time'], EVENT_TIME)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_database_error_spilled(self):
+        """Ensure the batch failed because the database is not available is spilled and replayed."""
+        spill_path = os.path.join(self.tmp_dir, 'spill.log')
+        self.processor = FailingProcessor(errors=1)
+        backend = self.get_backend(batch_size=3, spill_path=spill_path)
+        for number in range(3):
+            backend.send(get_event(number))
+        self.processor.released.set()
+        backend.worker.close()
+
+        self.assertEqual(self.processor.events, [0, 1, 2])
+        self.assertEqual(backend.worker.spilled_counter, 3)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    @data((2, [0, 1, 2], 0), (3, [], 3))
+    @unpack
+    def test_database_error_retried(self, errors, events, dropped_events):
+        """Ensure the batch failed because the database is not available is retried, then dropped."""
+        self.processor = FailingProcessor(errors=errors)
+        backend = self.get_backend(batch_size=3, max_retries=2, retry_interval=0)
+        for number in range(3):
+            backend.send(get_event(number))
+        self.processor.released.set()
+        backend.worker.close()
+
+        self.assertEqual(self.processor.events, events)
+        self.assertEqual(backend.worker.dropped_counter, dropped_events)
+
+    def test_spill_requires_path(self):
+        """Ensure spill overflow is not configured without the path."""
+        with self.assertRaises(ValueError):
+            AsyncEventsWorker(self.processor, overflow='spill')
+
+
+@patch('rg_instructor_analytics_log_collector.backends.tracking_backend.close_old_connections', Mock())
+class TestAsyncModeDatabase(DatabaseTestCase):
+    """Test `RGAnalyticsBackend` async mode retries of the batches on the database."""
+
+    def test_retried_batch_not_applied_twice(self):
+        """Ensure the batch failed in the second pipeline is rolled back, so the retry does not double count it."""
+        locked_pipeline = LockedPipeline(errors=1)
+        with patch.object(Processor, 'available_pipelines', [CountingPipeline(), locked_pipeline]):
+            processor = Processor(alias_list=['counting', 'locked'])
+        worker = AsyncEventsWorker(processor, max_retries=1, retry_interval=0)
+
+        worker._process([{'message_type': Events.SEQ_GOTO}] * 3)
+
+        self.assertEqual(VideoViewsByBlock.objects.get().count_part_viewed, 3)
+        self.assertEqual(locked_pipeline.pushed_counter, 3)
+        self.assertEqual(worker.processed_counter, 3)
+
+
+class TestSyncMode(TestCase):
+    """Test `RGAnalyticsBackend` sync mode."""
+
+    def test_send_processes(self):
+        """Ensure event is processed in the caller thread."""
+        backend = RGAnalyticsBackend()
+        with patch.object(backend, 'processor') as processor_mock:
+            backend.send(get_event(0))
+        processor_mock.process.assert_called_once_with({
+            'message_type': 'play_video', 'log_time': EVENT_TIME, 'log_message': get_event(0)
+        })
+
+
+class TestSpoolMode(TestCase):
+    """Test `RGAnalyticsBackend` spool mode and the `SpoolBackend` replaying the spool."""
+
+    def setUp(self):
+        """Prepare the spool directory."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    @patch('rg_instructor_analytics_log_collector.backends.spool_backend.transaction')
+    def test_send_spools(self, mock_transaction):
+        """Ensure events are appended to the spool and processed by the spool backend."""
+        backend = RGAnalyticsBackend(mode='spool', spool_dir=self.tmp_dir, segment_size=200)
+        for number in range(5):
+            backend.send(get_event(number))
+        backend.spool.close()
+
+        spool_backend = SpoolBackend(spool_dir=self.tmp_dir)
+        spool_backend.processor = processor = BlockingProcessor()
+        processor.released.set()
+
+        self.assertTrue(spool_backend.load_and_process())
+        self.assertEqual(processor.events, [0, 1, 2, 3, 4])
+        self.assertEqual(processor.batches[0][0]['log_time'], EVENT_TIME)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+        self.assertFalse(spool_backend.load_and_process())
+
+    @patch('rg_instructor_analytics_log_collector.backends.spool_backend.transaction')
+    def test_failed_segment_is_kept(self, mock_transaction):
+        """Ensure the segment is not deleted if its processing failed."""
+        backend = RGAnalyticsBackend(mode='spool', spool_dir=self.tmp_dir)
+        backend.send(get_event(0))
+        backend.spool.close()
+
+        spool_backend = SpoolBackend(spool_dir=self.tmp_dir)
+        spool_backend.processor = Mock(process_batch=Mock(side_effect=OperationalError))
+        with self.assertRaises(OperationalError):
+            spool_backend.load_and_process()
+        self.assertEqual(len(spool_backend.spool.get_segments()), 1)
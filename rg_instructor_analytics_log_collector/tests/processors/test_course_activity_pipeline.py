@@ -1,13 +1,18 @@
 """Test `CourseActivityPipeline` functionality."""
+from datetime import datetime, timedelta, timezone
 import logging
 from unittest import TestCase
 
 from ddt import data, ddt, file_data, unpack
+from django.db import IntegrityError
+from django.test import TestCase as DatabaseTestCase
 from mock import patch
 
+from rg_instructor_analytics_log_collector.models import CourseVisitsByDay, LastCourseVisitByUser
 from rg_instructor_analytics_log_collector.processors.course_activity_pipeline import CourseActivityPipeline
 from rg_instructor_analytics_log_collector.processors.course_activity_pipeline import CourseKey
 from rg_instructor_analytics_log_collector.tests.processors.pipeline_test_utils import TestRecord
+from rg_instructor_analytics_log_collector.user_id_set import UserIdSet
 
 
 @ddt
@@ -47,3 +52,110 @@ class TestCourseActivityPipeline(TestCase):
     def tearDown(self):
         """Re-enable logging."""
         logging.disable(logging.NOTSET)
+
+
+class TestCourseActivityPipelineBatch(DatabaseTestCase):
+    """Test `CourseActivityPipeline` push of the chunk of records."""
+
+    COURSE_ID = 'course-v1:edX+DemoX+Demo_Course'
+    OTHER_COURSE_ID = 'course-v1:edX+DemoX+Other_Course'
+    DAY = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+
+    def setUp(self):
+        """Prepare a test pipeline and the records: repeated users, two courses and two days, partly already saved."""
+        self.pipeline = CourseActivityPipeline()
+        self.saved_records = [
+            self.record(self.COURSE_ID, 1, self.DAY),
+            self.record(self.COURSE_ID, 2, self.DAY + timedelta(hours=5)),
+        ]
+        self.records = [
+            self.record(self.COURSE_ID, 1, self.DAY + timedelta(hours=1)),
+            self.record(self.COURSE_ID, 2, self.DAY + timedelta(hours=1)),
+            self.record(self.COURSE_ID, 3, self.DAY + timedelta(hours=2)),
+            self.record(self.COURSE_ID, 3, self.DAY + timedelta(hours=1)),
+            self.record(self.COURSE_ID, 3, self.DAY + timedelta(days=1)),
+            self.record(self.OTHER_COURSE_ID, 1, self.DAY + timedelta(days=1)),
+            self.record(self.OTHER_COURSE_ID, 4, self.DAY + timedelta(days=1, hours=1)),
+        ]
+
+    @staticmethod
+    def record(course_id, user_id, log_time):
+        """Return the formatted record."""
+        return {'course_id': course_id, 'user_id': user_id, 'log_time': log_time}
+
+    @staticmethod
+    def stored_visits():
+        """Return the stored last visits of the users and visits of the days."""
+        last_visits = {
+            (str(row.course), row.user_id): row.log_time for row in LastCourseVisitByUser.objects.all()
+        }
+        days = {
+            (str(row.course), row.day): (row.total, sorted(row.get_users_ids()))
+            for row in CourseVisitsByDay.objects.all()
+        }
+        return last_visits, days
+
+    def push_per_record(self):
+        """Push the records one by one and return the stored visits."""
+        for record in self.saved_records + self.records:
+            self.pipeline.push_to_database(record)
+        return self.stored_visits()
+
+    def test_batch_equals_per_record(self):
+        """Ensure the chunk push stores the same visits as the push of the records one by one."""
+        expected = self.push_per_record()
+        LastCourseVisitByUser.objects.all().delete()
+        CourseVisitsByDay.objects.all().delete()
+
+        for record in self.saved_records:
+            self.pipeline.push_to_database(record)
+        self.pipeline.push_to_database_batch(self.records)
+
+        self.assertEqual(self.stored_visits(), expected)
+        self.assertEqual(expected[1][(self.COURSE_ID, self.DAY.date())], (3, ['1', '2', '3']))
+        self.assertEqual(expected[0][(self.COURSE_ID, 2)], self.DAY + timedelta(hours=5))
+
+    def test_integrity_error_fallback(self):
+        """Ensure the records are pushed one by one if rows were created concurrently."""
+        expected = self.push_per_record()
+        LastCourseVisitByUser.objects.all().delete()
+        CourseVisitsByDay.objects.all().delete()
+
+        for record in self.saved_records:
+            self.pipeline.push_to_database(record)
+        bulk_create = CourseVisitsByDay.objects.bulk_create
+        conflicts = [IntegrityError('Duplicate entry')]
+
+        def concurrent_bulk_create(objs, *args, **kwargs):
+            """Fail the chunk write as if the concurrent writer created the rows first."""
+            if conflicts:
+                raise conflicts.pop()
+            return bulk_create(objs, *args, **kwargs)
+
+        with patch.object(CourseVisitsByDay.objects, 'bulk_create', side_effect=concurrent_bulk_create), \
+                self.assertLogs('rg_instructor_analytics_log_collector.processors.course_activity_pipeline', 'WARNING'):
+            self.pipeline.push_to_database_batch(self.records)
+
+        self.assertEqual(self.stored_visits(), expected)
+
+    def test_repeated_visits_not_decoded(self):
+        """Ensure the live visits of the day decode its stored users set only once."""
+        with patch.object(UserIdSet, 'from_bytes', wraps=UserIdSet.from_bytes) as from_bytes:
+            for record in self.saved_records + self.saved_records:
+                self.pipeline.push_to_database(record)
+            self.pipeline.push_to_database(self.record(self.COURSE_ID, 3, self.DAY + timedelta(hours=6)))
+
+        self.assertEqual(from_bytes.call_count, 0)
+        self.assertEqual(self.stored_visits()[1][(self.COURSE_ID, self.DAY.date())], (3, ['1', '2', '3']))
+
+    def test_changed_day_decoded(self):
+        """Ensure the users set changed by the other writer is decoded instead of the cached one."""
+        self.pipeline.push_to_database(self.saved_records[0])
+        course_visits_by_day = CourseVisitsByDay.objects.get()
+        course_visits_by_day.set_users_set(UserIdSet([1, 5]))
+        course_visits_by_day.total = 2
+        course_visits_by_day.save()
+
+        self.pipeline.push_to_database(self.saved_records[1])
+
+        self.assertEqual(self.stored_visits()[1][(self.COURSE_ID, self.DAY.date())], (3, ['1', '2', '5']))
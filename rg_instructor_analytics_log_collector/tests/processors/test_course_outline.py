@@ -0,0 +1,102 @@
+"""Test `CourseOutline` and `CourseOutlineCache` functionality."""
+from unittest import TestCase
+
+from ddt import data, ddt, unpack
+from mock import Mock, patch
+
+from rg_instructor_analytics_log_collector.processors import course_outline
+from rg_instructor_analytics_log_collector.processors.course_outline import (
+    CourseOutline, CourseOutlineCache, OutlineSubsection,
+)
+
+
+def _subsection(block_id, units):
+    return OutlineSubsection(location='block-v1:org+c+r+type@sequential+block@' + block_id, block_id=block_id,
+                             units=units)
+
+
+@ddt
+class TestCourseOutline(TestCase):
+    """Test `CourseOutline` lookups."""
+
+    def setUp(self):
+        """Prepare a test outline."""
+        self.outline = CourseOutline([
+            [_subsection('s1', ['u1', 'u2']), _subsection('s2', []), _subsection('s3', ['u3'])],
+            [_subsection('s4', ['u4', 'u5'])],
+            [],
+            [_subsection('s5', ['u6'])],
+        ])
+
+    @data(('s1', ''), ('s2', 'u3'), ('s3', 'u4'), ('s4', None), ('s5', None))
+    @unpack
+    def test_get_next_unit(self, subsection_block_id, next_unit):
+        """Ensure "next" leads to the first unit of the next subsection or section."""
+        self.assertEqual(self.outline.get_next_unit(subsection_block_id), next_unit)
+
+    @data(('s1', None), ('s2', 'u2'), ('s3', None), ('s4', 'u3'), ('s5', None))
+    @unpack
+    def test_get_previous_unit(self, subsection_block_id, previous_unit):
+        """Ensure "previous" leads to the last unit of the previous subsection or section."""
+        self.assertEqual(self.outline.get_previous_unit(subsection_block_id), previous_unit)
+
+    @data(('u1', 's1'), ('u3', 's3'), ('u6', 's5'), ('unknown', None), (None, None))
+    @unpack
+    def test_get_unit_subsection(self, unit_block_id, subsection_block_id):
+        """Ensure units are resolved to their subsections."""
+        subsection = self.outline.get_unit_subsection(unit_block_id)
+        self.assertEqual(subsection and subsection.block_id, subsection_block_id)
+
+    def test_positions(self):
+        """Ensure units are flattened in the course order."""
+        self.assertEqual(self.outline.units[:3], [('u1', 0, 0), ('u2', 0, 0), ('u3', 0, 2)])
+        self.assertEqual(self.outline.get_subsection('s4').units, ['u4', 'u5'])
+        self.assertIsNone(self.outline.get_subsection('unknown'))
+
+
+class TestCourseOutlineCache(TestCase):
+    """Test `CourseOutlineCache` logic."""
+
+    def setUp(self):
+        """Prepare a test cache."""
+        self.cache = CourseOutlineCache(max_size=2, ttl=600)
+        self.build_patcher = patch.object(CourseOutlineCache, '_build', side_effect=lambda key: Mock(key=key))
+        self.mock_build = self.build_patcher.start()
+
+    def test_cached(self):
+        """Ensure outline is built once."""
+        self.assertIs(self.cache.get('course-1'), self.cache.get('course-1'))
+        self.assertEqual(self.mock_build.call_count, 1)
+
+    def test_lru(self):
+        """Ensure the least recently used outline is evicted."""
+        self.cache.get('course-1')
+        self.cache.get('course-2')
+        self.cache.get('course-1')
+        self.cache.get('course-3')
+        self.cache.get('course-1')
+        self.cache.get('course-2')
+        self.assertEqual(self.mock_build.call_count, 4)
+
+    def test_invalidate(self):
+        """Ensure invalidated outline is rebuilt."""
+        self.cache.get('course-1')
+        self.cache.invalidate('course-1')
+        self.cache.get('course-1')
+        self.assertEqual(self.mock_build.call_count, 2)
+
+    @patch.object(course_outline.time, 'monotonic')
+    def test_ttl(self, mock_monotonic):
+        """Ensure expired outline is rebuilt."""
+        mock_monotonic.return_value = 0
+        self.cache.get('course-1')
+        mock_monotonic.return_value = 30
+        self.cache.get('course-1', refresh=True)
+        self.assertEqual(self.mock_build.call_count, 1)
+        mock_monotonic.return_value = 601
+        self.cache.get('course-1')
+        self.assertEqual(self.mock_build.call_count, 2)
+
+    def tearDown(self):
+        """Stop patching."""
+        self.build_patcher.stop()
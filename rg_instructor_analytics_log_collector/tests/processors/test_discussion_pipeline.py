@@ -5,6 +5,7 @@ from unittest import TestCase
 from ddt import ddt, file_data, unpack
 from mock import patch
 
+from rg_instructor_analytics_log_collector.models import DiscussionActivity
 from rg_instructor_analytics_log_collector.processors.discussion_pipeline import CourseKey
 from rg_instructor_analytics_log_collector.processors.discussion_pipeline import DiscussionPipeline
 from rg_instructor_analytics_log_collector.tests.processors.pipeline_test_utils import TestRecord
@@ -39,6 +40,24 @@ class TestDiscussionPipeline(TestCase):
                           'thread_type': 'test_thread_type',
                           'log_time': TestRecord.LOG_TIME})
 
+    def test_get_natural_key(self):
+        """Ensure formatted record and saved activity with the same fields have the same key."""
+        record = {
+            'event_type': TestRecord.EVENT_TYPE,
+            'user_id': TestRecord.USER_ID,
+            'course': CourseKey.from_string('course-v1:edX+DemoX+Demo_Course'),
+            'category_id': None,
+            'commentable_id': "test_commentable_id",
+            'discussion_id': "test_discussion_id",
+            'thread_type': 'test_thread_type',
+            'log_time': TestRecord.LOG_TIME,
+        }
+
+        key = self.pipeline.get_natural_key(record)
+
+        self.assertEqual(key, self.pipeline.get_natural_key(DiscussionActivity(**record)))
+        self.assertNotEqual(key, self.pipeline.get_natural_key(dict(record, discussion_id="other_discussion_id")))
+
     def tearDown(self):
         """Re-enable logging."""
         logging.disable(logging.NOTSET)
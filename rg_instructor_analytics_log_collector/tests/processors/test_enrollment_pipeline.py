@@ -0,0 +1,39 @@
+"""Test enrollment pipeline logic."""
+from datetime import date, datetime
+from unittest import TestCase
+
+from rg_instructor_analytics_log_collector.models import EnrollmentByDay
+from rg_instructor_analytics_log_collector.processors.enrollment_pipeline import EnrollmentPipeline
+
+COURSE_ID = 'course-v1:edX+DemoX+Demo_Course'
+
+
+class TestEnrollmentPipeline(TestCase):
+    """Test `EnrollmentPipeline` logic."""
+
+    def test_get_daily_deltas(self):
+        """Ensure records are folded into per-(course, day) deltas."""
+        records = [
+            {'course': COURSE_ID, 'is_enrolled': True, 'log_time': datetime(2024, 1, 1, 10)},
+            {'course': COURSE_ID, 'is_enrolled': True, 'log_time': datetime(2024, 1, 1, 12)},
+            {'course': COURSE_ID, 'is_enrolled': False, 'log_time': datetime(2024, 1, 3)},
+            {'course': 'course-v1:edX+Other+Course', 'is_enrolled': False, 'log_time': datetime(2024, 1, 1)},
+        ]
+
+        self.assertEqual(EnrollmentPipeline.get_daily_deltas(records), {
+            COURSE_ID: {date(2024, 1, 1): [2, 0], date(2024, 1, 3): [0, 1]},
+            'course-v1:edX+Other+Course': {date(2024, 1, 1): [0, 1]},
+        })
+
+    def test_update_totals(self):
+        """Ensure totals are recomputed as the running sum, only the changed rows are returned."""
+        rows = [
+            EnrollmentByDay(day=date(2024, 1, 2), enrolled=3, unenrolled=1, total=12),
+            EnrollmentByDay(day=date(2024, 1, 5), enrolled=1, unenrolled=0, total=12),
+            EnrollmentByDay(day=date(2024, 1, 6), enrolled=0, unenrolled=2, total=11),
+        ]
+
+        changed_rows = EnrollmentPipeline.update_totals(10, rows)
+
+        self.assertEqual([row.total for row in rows], [12, 13, 11])
+        self.assertEqual(changed_rows, [rows[1]])
@@ -1,13 +1,19 @@
 """Test the `Processor` module."""
+from datetime import datetime, timezone
 import logging
 from unittest import TestCase
 
 from ddt import data, ddt, unpack
+from django.test import TestCase as DatabaseTestCase
 from mock import patch
 
+from rg_instructor_analytics_log_collector.constants import Events
+from rg_instructor_analytics_log_collector.models import LastProcessedLog, LogTable
 from rg_instructor_analytics_log_collector.processors.base_pipeline import BasePipeline
+from rg_instructor_analytics_log_collector.processors.course_activity_pipeline import CourseActivityPipeline
 from rg_instructor_analytics_log_collector.processors.processor import Processor
 from rg_instructor_analytics_log_collector.processors.student_step_pipeline import StudentStepPipeline
+from rg_instructor_analytics_log_collector.processors.video_views_pipeline import VideoViewsPipeline
 
 
 class TestRecords:
@@ -39,10 +45,21 @@ class TestRecords:
         except TypeError:
             print(self.records, " not iterable.")
 
-    @staticmethod
-    def exists():
+    def __getitem__(self, item):
+        """Allow for slicing test records."""
+        return TestRecords(self.records[item])
+
+    def order_by(self, *field_names):
+        """Allow for overriding a namesake method."""
+        return self
+
+    def filter(self, *args, **kwargs):
         """Allow for overriding a namesake method."""
-        return True
+        return self
+
+    def iterator(self):
+        """Allow for overriding a namesake method."""
+        return iter(self)
 
 
 @ddt
@@ -54,12 +71,13 @@ class TestProcessor(TestCase):
         logging.disable(logging.DEBUG)
         # Doesn't matter which one to pick
         Processor.available_pipelines = [StudentStepPipeline()]
-        self.processor = Processor(alias_list=["student_step"], sleep_time=1)
+        self.processor = Processor(alias_list=["student_step"])
 
     @data(({"test_key": "test_value"}, [1, 2, 3], 3),
           ({"test_key": "test_value"}, [1, 2], 2),
           (None, [1, 2, 3], 0))
     @unpack
+    @patch("rg_instructor_analytics_log_collector.processors.processor.transaction")
     @patch.object(BasePipeline, "get_query")
     @patch.object(StudentStepPipeline, "get_units")
     @patch.object(StudentStepPipeline, "format")
@@ -73,7 +91,8 @@ class TestProcessor(TestCase):
                                       mock_push_to_database,
                                       mock_format,
                                       mock_get_units,
-                                      mock_get_query):
+                                      mock_get_query,
+                                      mock_transaction):
         """Ensure only significant data is pushed to a db."""
         mock_update_last_processed_log.return_value = None
         mock_push_to_database.return_value = None
@@ -84,6 +103,129 @@ class TestProcessor(TestCase):
 
         self.processor.process()
         self.assertEqual(mock_push_to_database.call_count, times_called)
+        # checkpoint is updated once per chunk
+        mock_update_last_processed_log.assert_called_once_with(records[-1])
+
+    def test_get_dispatch_table(self):
+        """Ensure fan-out routes every message type to the supporting and catch-all pipelines."""
+        student_step, video_views, course_activity = (
+            StudentStepPipeline(), VideoViewsPipeline(), CourseActivityPipeline()
+        )
+        Processor.available_pipelines = [student_step, video_views, course_activity]
+        processor = Processor(alias_list=["student_step", "video_views", "course_activity"], fan_out=True)
+
+        dispatch_table, catch_all_pipelines = processor.get_dispatch_table()
+
+        self.assertEqual(catch_all_pipelines, [course_activity])
+        self.assertEqual(dispatch_table[Events.SEQ_GOTO], [student_step, course_activity])
+        self.assertEqual(dispatch_table[Events.USER_STARTED_VIEW_VIDEO], [video_views, course_activity])
+        self.assertNotIn(Events.USER_ENROLLED, dispatch_table)
+
+    @patch("rg_instructor_analytics_log_collector.processors.processor.transaction")
+    @patch.object(VideoViewsPipeline, "push_to_database_batch")
+    @patch.object(VideoViewsPipeline, "format")
+    @patch.object(StudentStepPipeline, "push_to_database")
+    @patch.object(StudentStepPipeline, "format")
+    def test_process_batch(self, mock_student_step_format, mock_student_step_push, mock_video_views_format,
+                           mock_video_views_push_batch, mock_transaction):
+        """Ensure live events are routed to the supporting pipelines only, write-behind ones push the batch."""
+        Processor.available_pipelines = [StudentStepPipeline(), VideoViewsPipeline()]
+        processor = Processor(alias_list=["student_step", "video_views"])
+        mock_student_step_format.return_value = {"test_key": "test_value"}
+        mock_video_views_format.side_effect = [{"test_key": "test_value"}, None, {"test_key": "test_value"}]
+        events_data = [
+            {'message_type': Events.USER_STARTED_VIEW_VIDEO},
+            {'message_type': Events.SEQ_GOTO},
+            {'message_type': Events.USER_PAUSED_VIEW_VIDEO},
+            {'message_type': Events.USER_FINISHED_WATCH_VIDEO},
+            {'message_type': Events.USER_ENROLLED},
+        ]
+
+        self.assertEqual(processor.process_batch(events_data), 3)
+        mock_student_step_format.assert_called_once_with(events_data[1], live_event=True)
+        mock_student_step_push.assert_called_once_with({"test_key": "test_value"})
+        self.assertEqual(mock_video_views_format.call_count, 3)
+        mock_video_views_push_batch.assert_called_once_with([{"test_key": "test_value"}, {"test_key": "test_value"}])
+
+    def tearDown(self):
+        """Re-enable logging."""
+        logging.disable(logging.NOTSET)
+
+
+class CollectingPipeline(BasePipeline):
+    """Pipeline collecting ids of the processed records."""
+
+    alias = 'collecting'
+    supported_types = [Events.SEQ_GOTO]
+    processor_name = LastProcessedLog.STUDENT_STEP
+
+    def __init__(self):
+        """Prepare the processed records list."""
+        self.processed_ids = []
+
+    def format(self, record, live_event=False):
+        """Return id of the record."""
+        return record.id
+
+    def push_to_database(self, formatted_record):
+        """Collect id of the record."""
+        self.processed_ids.append(formatted_record)
+
+
+@ddt
+class TestProcessorChunks(DatabaseTestCase):
+    """Test the LogTable processing by chunks on the database."""
+
+    def setUp(self):
+        """Prepare the records sharing the log time and the processor with small chunks."""
+        logging.disable(logging.DEBUG)
+        self.pipeline = CollectingPipeline()
+        Processor.available_pipelines = [self.pipeline]
+        log_times = [datetime(2024, 1, 1, 0, 0, second, tzinfo=timezone.utc) for second in (1, 2, 2, 2, 2, 2, 3)]
+        self.record_ids = [
+            LogTable.objects.create(
+                message_type=Events.SEQ_GOTO, message_type_hash=Events.SEQ_GOTO, log_time=log_time,
+                user_name=f'user{number}', log_message='{}',
+            ).id
+            for number, log_time in enumerate(log_times)
+        ]
+
+    def get_processor(self, fan_out):
+        """Return the processor of the collecting pipeline with the chunks of 3 records."""
+        processor = Processor(alias_list=['collecting'], fan_out=fan_out)
+        processor.CHUNK_SIZE_PROCESSOR = 3
+        return processor
+
+    @data(False, True)
+    def test_records_sharing_log_time(self, fan_out):
+        """Ensure records sharing the log time across the chunk boundary are processed exactly once."""
+        self.get_processor(fan_out).process()
+        self.get_processor(fan_out).process()
+
+        self.assertEqual(self.pipeline.processed_ids, self.record_ids)
+        self.assertEqual(
+            LastProcessedLog.objects.values_list('log_time', 'log_id').get(),
+            (datetime(2024, 1, 1, 0, 0, 3, tzinfo=timezone.utc), self.record_ids[-1])
+        )
+
+    @data(False, True)
+    def test_resume_after_crash(self, fan_out):
+        """Ensure records sharing the log time of the checkpoint are processed after the crash."""
+        push_to_database = self.pipeline.push_to_database
+
+        def push_to_database_crashed(formatted_record):
+            if formatted_record == self.record_ids[3]:
+                raise RuntimeError('worker is killed')
+            push_to_database(formatted_record)
+
+        with patch.object(self.pipeline, 'push_to_database', side_effect=push_to_database_crashed):
+            with self.assertRaises(RuntimeError):
+                self.get_processor(fan_out).process()
+        self.assertEqual(LastProcessedLog.objects.values_list('log_id', flat=True).get(), self.record_ids[2])
+
+        self.get_processor(fan_out).process()
+
+        self.assertEqual(self.pipeline.processed_ids, self.record_ids)
 
     def tearDown(self):
         """Re-enable logging."""
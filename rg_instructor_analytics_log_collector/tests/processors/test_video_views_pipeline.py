@@ -0,0 +1,115 @@
+"""Test `VideoViewsPipeline` functionality."""
+from datetime import datetime, timedelta, timezone
+
+from django.db import IntegrityError
+from django.test import TestCase as DatabaseTestCase
+from mock import patch
+
+from rg_instructor_analytics_log_collector.constants import Events
+from rg_instructor_analytics_log_collector.models import VideoViewsByBlock, VideoViewsByDay, VideoViewsByUser
+from rg_instructor_analytics_log_collector.processors.video_views_pipeline import VideoViewsPipeline
+
+
+class TestVideoViewsPipelineBatch(DatabaseTestCase):
+    """Test `VideoViewsPipeline` push of the chunk of records with the `VideoViewsBuffer`."""
+
+    COURSE_ID = 'course-v1:edX+DemoX+Demo_Course'
+    OTHER_COURSE_ID = 'course-v1:edX+DemoX+Other_Course'
+    DAY = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+
+    def setUp(self):
+        """Prepare a test pipeline and the records: partial, repeated and completed views, partly already saved."""
+        self.pipeline = VideoViewsPipeline()
+        self.saved_records = [
+            self.record(self.COURSE_ID, 1, 'block-1', '10', self.DAY),
+            self.record(self.COURSE_ID, 2, 'block-1', '100', self.DAY, is_video_completed=True),
+            self.record(self.OTHER_COURSE_ID, 1, 'block-1', '10', self.DAY),
+        ]
+        self.records = [
+            self.record(self.COURSE_ID, 1, 'block-1', '50', self.DAY + timedelta(hours=1)),
+            self.record(self.COURSE_ID, 1, 'block-1', '20', self.DAY + timedelta(hours=2)),
+            self.record(self.COURSE_ID, 2, 'block-1', '30', self.DAY + timedelta(hours=2)),
+            self.record(self.COURSE_ID, 3, 'block-1', '5', self.DAY + timedelta(hours=3)),
+            self.record(self.COURSE_ID, 3, 'block-1', '120', self.DAY + timedelta(days=1), is_video_completed=True),
+            self.record(self.COURSE_ID, 3, 'block-1', '130', self.DAY + timedelta(days=1, hours=1)),
+            self.record(self.COURSE_ID, 3, 'block-2', 'invalid', self.DAY + timedelta(days=1)),
+            self.record(
+                self.OTHER_COURSE_ID, 1, 'block-1', '60', self.DAY + timedelta(days=1), is_video_completed=True
+            ),
+        ]
+
+    @staticmethod
+    def record(course_id, user_id, block_id, viewed_time, log_time, is_video_completed=False):
+        """Return the formatted record."""
+        return {
+            'course_id': course_id,
+            'user_id': user_id,
+            'block_id': block_id,
+            'viewed_time': viewed_time,
+            'is_video_completed': is_video_completed,
+            'log_time': log_time,
+            'event_type': Events.USER_FINISHED_WATCH_VIDEO if is_video_completed else 'pause_video',
+        }
+
+    @staticmethod
+    def stored_views():
+        """Return the stored views of the days, users and blocks."""
+        days = {
+            (str(row.course), row.video_block_id, row.day): (row.total, sorted(row.get_users_ids()))
+            for row in VideoViewsByDay.objects.all()
+        }
+        users = {
+            (str(row.course), row.user_id, row.video_block_id): (row.viewed_time, row.is_completed)
+            for row in VideoViewsByUser.objects.all()
+        }
+        blocks = {
+            (str(row.course), row.video_block_id): (row.count_full_viewed, row.count_part_viewed, row.video_duration)
+            for row in VideoViewsByBlock.objects.all()
+        }
+        return days, users, blocks
+
+    def push_saved_records(self):
+        """Clear the stored views and push the already saved records one by one."""
+        for model in (VideoViewsByDay, VideoViewsByUser, VideoViewsByBlock):
+            model.objects.all().delete()
+        for record in self.saved_records:
+            self.pipeline.push_to_database(record)
+
+    def push_per_record(self):
+        """Push the records one by one and return the stored views."""
+        self.push_saved_records()
+        for record in self.records:
+            self.pipeline.push_to_database(record)
+        return self.stored_views()
+
+    def test_batch_equals_per_record(self):
+        """Ensure the chunk push stores the same views as the push of the records one by one."""
+        expected = self.push_per_record()
+        self.push_saved_records()
+
+        self.pipeline.push_to_database_batch(self.records)
+
+        self.assertEqual(self.stored_views(), expected)
+        days, users, blocks = expected
+        self.assertEqual(days[(self.COURSE_ID, 'block-1', self.DAY.date())], (3, ['1', '2', '3']))
+        self.assertEqual(users[(self.COURSE_ID, 3, 'block-1')], (120, True))
+        self.assertEqual(users[(self.COURSE_ID, 3, 'block-2')], (0, False))
+        self.assertEqual(blocks[(self.COURSE_ID, 'block-1')], (2, 1, 120))
+        self.assertEqual(blocks[(self.OTHER_COURSE_ID, 'block-1')], (1, 0, 60))
+
+    def test_integrity_error_fallback(self):
+        """Ensure the records are pushed one by one if rows were created concurrently."""
+        expected = self.push_per_record()
+        self.push_saved_records()
+        bulk_create = VideoViewsByUser.objects.bulk_create
+
+        def concurrent_bulk_create(objs, *args, **kwargs):
+            """Insert the rows as if the concurrent writer created them first."""
+            bulk_create(objs, *args, **kwargs)
+            raise IntegrityError('Duplicate entry')
+
+        with patch.object(VideoViewsByUser.objects, 'bulk_create', side_effect=concurrent_bulk_create), \
+                self.assertLogs('rg_instructor_analytics_log_collector.processors.video_views_pipeline', 'WARNING'):
+            self.pipeline.push_to_database_batch(self.records)
+
+        self.assertEqual(self.stored_views(), expected)
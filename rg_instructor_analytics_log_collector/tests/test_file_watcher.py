@@ -0,0 +1,60 @@
+"""Test the `file_watcher` module."""
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from ddt import data, ddt, unpack
+
+from rg_instructor_analytics_log_collector.file_watcher import AdaptiveScheduler, PollingWatcher
+
+
+@ddt
+class TestAdaptiveScheduler(TestCase):
+    """Test `AdaptiveScheduler` logic."""
+
+    @data(
+        ([False, False, False, False, False], [1, 2, 4, 8, 10]),
+        ([False, False, True, False], [1, 2, 0, 1]),
+        ([True, True], [0, 0]),
+    )
+    @unpack
+    def test_next_delay(self, backlog, delays):
+        """Ensure delay backs off while idle and drops while there is a backlog."""
+        scheduler = AdaptiveScheduler(min_delay=1, max_delay=10)
+        self.assertEqual([scheduler.next_delay(has_backlog) for has_backlog in backlog], delays)
+
+    def test_reset(self):
+        """Ensure reset drops the idle backoff."""
+        scheduler = AdaptiveScheduler(min_delay=1, max_delay=10)
+        scheduler.next_delay(False)
+        scheduler.next_delay(False)
+        scheduler.reset()
+        self.assertEqual(scheduler.next_delay(False), 1)
+
+
+class TestPollingWatcher(TestCase):
+    """Test `PollingWatcher` logic."""
+
+    def setUp(self):
+        """Prepare a test directory."""
+        self.directory = tempfile.mkdtemp()
+        self.watcher = PollingWatcher(self.directory, poll_interval=0.01)
+
+    def test_no_changes(self):
+        """Ensure watcher returns on timeout if there are no changes."""
+        self.assertFalse(self.watcher.wait(0.05))
+
+    def test_changes(self):
+        """Ensure watcher detects new tracking log files only."""
+        with open(os.path.join(self.directory, 'notes.txt'), 'w') as f:
+            f.write('test')
+        self.assertFalse(self.watcher.wait(0.05))
+
+        with open(os.path.join(self.directory, 'tracking.log'), 'w') as f:
+            f.write('{}\n')
+        self.assertTrue(self.watcher.wait(0.05))
+
+    def tearDown(self):
+        """Remove the test directory."""
+        shutil.rmtree(self.directory)
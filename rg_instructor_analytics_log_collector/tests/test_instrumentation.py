@@ -0,0 +1,163 @@
+"""Test the per-stage instrumentation."""
+from contextlib import nullcontext
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from rg_instructor_analytics_log_collector.instrumentation import get_sink, LogSink, Metrics, NULL_STAGE, \
+    PrometheusTextfileSink, StatsdSink
+
+
+class CollectingSink:
+    """Sink collecting the emitted snapshots."""
+
+    def __init__(self):
+        """Prepare the sink."""
+        self.snapshots = []
+
+    def emit(self, snapshot, sample_rate):
+        """Collect the snapshot."""
+        self.snapshots.append({(name, tuple(sorted(labels.items()))): stats for name, labels, stats in snapshot})
+
+
+class TestMetrics(TestCase):
+    """Test `Metrics` logic."""
+
+    def setUp(self):
+        """Prepare metrics with the collecting sink."""
+        self.sink = CollectingSink()
+        self.metrics = Metrics()
+        self.metrics.configure([self.sink])
+
+    def test_disabled(self):
+        """Ensure stages are not measured until the metrics are configured."""
+        metrics = Metrics()
+        self.assertIs(metrics.stage('read'), NULL_STAGE)
+        items = [1, 2]
+        self.assertIs(metrics.iter_timed(items, metrics.stage('read')), items)
+
+    @patch('rg_instructor_analytics_log_collector.instrumentation.random.random', return_value=0.5)
+    def test_sample_rate(self, mock_random):
+        """Ensure not sampled stages are not measured."""
+        self.metrics.configure([self.sink], sample_rate=0.4)
+        self.assertIs(self.metrics.stage('read'), NULL_STAGE)
+        self.metrics.configure([self.sink], sample_rate=0.6)
+        self.assertIsNot(self.metrics.stage('read'), NULL_STAGE)
+
+    def test_stages(self):
+        """Ensure accumulated stages are aggregated by the name and labels, flush resets them."""
+        with self.metrics.labels(backend='FileBackend'):
+            read_stage = self.metrics.stage('read')
+            self.assertEqual(list(self.metrics.iter_timed([1, 2, 3], read_stage)), [1, 2, 3])
+            read_stage.commit()
+            with self.metrics.labels(pipeline='enrollment'):
+                for rows in (5, 7):
+                    format_stage = self.metrics.stage('format')
+                    with format_stage:
+                        format_stage.rows_in = rows
+                    format_stage.commit()
+
+        self.metrics.flush()
+        self.metrics.flush()
+
+        self.assertEqual(len(self.sink.snapshots), 2)
+        snapshot = self.sink.snapshots[0]
+        self.assertEqual(snapshot[('read', (('backend', 'FileBackend'),))]['rows_in'], 3)
+        format_stats = snapshot[('format', (('backend', 'FileBackend'), ('pipeline', 'enrollment')))]
+        self.assertEqual((format_stats['calls'], format_stats['rows_in']), (2, 12))
+        self.assertEqual(self.sink.snapshots[1], {})
+
+    def test_measure_queries(self):
+        """Ensure queries are attributed to the innermost entered stage."""
+        wrappers = []
+
+        def execute_wrapper(wrapper):
+            """Keep the queries wrapper to run the queries through it."""
+            wrappers.append(wrapper)
+            return nullcontext()
+
+        def execute_query():
+            """Run the query through the installed wrapper."""
+            wrappers[-1](Mock(), 'SELECT 1', None, False, {})
+
+        with patch('rg_instructor_analytics_log_collector.instrumentation.connection') as mock_connection:
+            mock_connection.execute_wrapper.side_effect = execute_wrapper
+            with self.metrics.measure('load'):
+                execute_query()
+                push_stage = self.metrics.stage('push')
+                with push_stage:
+                    execute_query()
+                    with self.metrics.measure('checkpoint'):
+                        execute_query()
+                    execute_query()
+                push_stage.commit()
+
+        self.metrics.flush()
+        snapshot = self.sink.snapshots[0]
+        self.assertEqual(len(wrappers), 1)
+        self.assertEqual(snapshot[('load', ())]['queries'], 1)
+        self.assertEqual(snapshot[('push', ())]['queries'], 2)
+        self.assertEqual(snapshot[('checkpoint', ())]['queries'], 1)
+
+
+class TestSinks(TestCase):
+    """Test metrics sinks."""
+
+    SNAPSHOT = [('read', {'backend': 'FileBackend', 'file': 'tracking.log'}, {
+        'calls': 2, 'seconds': 0.5, 'queries': 1, 'query_seconds': 0.25, 'rows_in': 10, 'rows_out': 8,
+    })]
+
+    def setUp(self):
+        """Prepare the metrics directory."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_get_sink(self):
+        """Ensure sinks are created by the specification."""
+        self.assertIsInstance(get_sink('log'), LogSink)
+        self.assertIsInstance(get_sink('prometheus:/tmp/metrics.prom'), PrometheusTextfileSink)
+        self.assertEqual(get_sink('statsd:localhost:8125').address, ('localhost', 8125))
+        for spec in ('prometheus', 'statsd:localhost', 'syslog'):
+            with self.assertRaises(ValueError):
+                get_sink(spec)
+
+    def test_prometheus(self):
+        """Ensure cumulative counters are written without the file label."""
+        path = os.path.join(self.tmp_dir, 'metrics.prom')
+        sink = PrometheusTextfileSink(path)
+        sink.emit(self.SNAPSHOT, 1.0)
+        sink.emit(self.SNAPSHOT, 1.0)
+
+        with open(path) as metrics_file:
+            lines = metrics_file.read().splitlines()
+        self.assertIn('rg_log_collector_stage_rows_in_total{backend="FileBackend",stage="read"} 20', lines)
+        self.assertIn('# TYPE rg_log_collector_stage_seconds_total counter', lines)
+        self.assertEqual(os.listdir(self.tmp_dir), ['metrics.prom'])
+
+    def test_statsd(self):
+        """Ensure counters are sent with the time in milliseconds."""
+        sink = StatsdSink('localhost', 8125)
+        with patch.object(sink, 'socket') as mock_socket:
+            sink.emit(self.SNAPSHOT, 1.0)
+
+        packet = mock_socket.sendto.call_args[0][0].decode('utf-8').splitlines()
+        self.assertIn('rg_log_collector.read.FileBackend.ms:500.0|c', packet)
+        self.assertIn('rg_log_collector.read.FileBackend.query_ms:250.0|c', packet)
+        self.assertIn('rg_log_collector.read.FileBackend.rows_out:8|c', packet)
+
+    def test_sample_rate(self):
+        """Ensure sampled values are scaled by the Prometheus sink and sent with the rate to statsd."""
+        path = os.path.join(self.tmp_dir, 'metrics.prom')
+        PrometheusTextfileSink(path).emit(self.SNAPSHOT, 0.1)
+        with open(path) as metrics_file:
+            lines = metrics_file.read().splitlines()
+        self.assertIn('rg_log_collector_stage_rows_in_total{backend="FileBackend",stage="read"} 100.0', lines)
+
+        sink = StatsdSink('localhost', 8125)
+        with patch.object(sink, 'socket') as mock_socket:
+            sink.emit(self.SNAPSHOT, 0.1)
+        packet = mock_socket.sendto.call_args[0][0].decode('utf-8').splitlines()
+        self.assertIn('rg_log_collector.read.FileBackend.rows_out:8|c|@0.1', packet)
@@ -0,0 +1,145 @@
+"""Test the tracking log parsing and the parallel ingestion of the archived files."""
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from rg_instructor_analytics_log_collector.backends.file_backend import FileBackend
+from rg_instructor_analytics_log_collector.log_parser import (
+    EventTypes, iter_parsed_batches, parse_archive, parse_log_string, RECORD_FIELDS
+)
+
+LOG_STRING = '{"event_type": "play_video", "time": "2024-01-01T00:00:01", "username": "user"}\n'
+
+
+class TestLogParser(TestCase):
+    """Test parsing of the log lines."""
+
+    def test_parse_log_string(self):
+        """Ensure log line is parsed into the record."""
+        self.assertEqual(parse_log_string(LOG_STRING.encode('utf-8')), {
+            'message_type': 'play_video',
+            'message_type_hash': hashlib.sha256(b'play_video').hexdigest(),
+            'log_time': '2024-01-01T00:00:01',
+            'log_message': LOG_STRING,
+            'user_name': 'user',
+        })
+
+    def test_parse_broken_log_string(self):
+        """Ensure broken log lines are skipped."""
+        self.assertIsNone(parse_log_string(b'{"event_type": '))
+        self.assertIsNone(parse_log_string(b'{"event_type": "play_video"}'))
+
+    def test_parse_archive(self):
+        """Ensure archived file is parsed from the path and from the compressed content into the batches file."""
+        content = gzip.compress((LOG_STRING * 3 + '{\n').encode('utf-8'))
+        record = tuple(parse_log_string(LOG_STRING)[field] for field in RECORD_FIELDS)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        batches_path = os.path.join(directory, 'tracking.log-1.batches')
+
+        self.assertEqual(parse_archive(content, batches_path), (4, 3))
+        self.assertEqual(list(iter_parsed_batches(batches_path)), [[record] * 3])
+
+        path = os.path.join(directory, 'tracking.log-1.gz')
+        with open(path, 'wb') as archive:
+            archive.write(content)
+        self.assertEqual(parse_archive(path, batches_path, batch_size=2), (4, 3))
+        self.assertEqual(list(iter_parsed_batches(batches_path)), [[record] * 2, [record]])
+
+
+class TestEventTypes(TestCase):
+    """Test the interned event types table."""
+
+    def test_get(self):
+        """Ensure event type is hashed once and interned."""
+        event_types = EventTypes()
+        message_type, message_type_hash, event_type_id = event_types.get(''.join(['play_', 'video']))
+
+        self.assertEqual(message_type_hash, hashlib.sha256(b'play_video').hexdigest())
+        self.assertEqual(event_type_id, 0)
+        entry = event_types.get(''.join(['play_', 'video']))
+        self.assertIs(entry[0], message_type)
+        self.assertIs(entry[1], message_type_hash)
+        self.assertEqual(event_types.get('seq_goto')[2], 1)
+
+    def test_eviction(self):
+        """Ensure the least recently used event type is evicted above the limit."""
+        event_types = EventTypes(max_size=2)
+        event_types.get('play_video')
+        event_types.get('seq_goto')
+        event_types.get('play_video')
+        event_types.get('problem_check')
+
+        self.assertEqual(len(event_types), 2)
+        self.assertEqual(event_types.get('play_video')[2], 0)
+        self.assertEqual(event_types.get('seq_goto')[2], 3)
+
+    def test_records_share_event_type(self):
+        """Ensure parsed records of the same event type share its strings."""
+        first_record, second_record = parse_log_string(LOG_STRING), parse_log_string(LOG_STRING.encode('utf-8'))
+        self.assertIs(first_record['message_type'], second_record['message_type'])
+        self.assertIs(first_record['message_type_hash'], second_record['message_type_hash'])
+
+
+class TestIngestWorkers(TestCase):
+    """Test loading of the archived files parsed by the worker processes."""
+
+    def setUp(self):
+        """Prepare the log directory and the backend with the mocked repository and processor."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.calls = []
+        self.backend = FileBackend(self.directory, reload_logs=True, ingest_workers=2)
+        self.backend.repository = Mock(
+            add_parsed_log_records=lambda batches: self.calls.append(('store', sum(map(len, batches)))),
+            add_new_log_records=lambda log_file: self.calls.append(('store', len(list(log_file)))),
+            mark_as_processed_source=lambda file_name: self.calls.append(('mark', file_name)),
+            get_log_file_checkpoint=Mock(return_value=None),
+        )
+        self.backend.processor = Mock(process=lambda: self.calls.append(('process',)))
+
+    def test_files_order(self):
+        """Ensure files are stored, marked and processed in the listing order."""
+        file_names = [f'tracking.log-{number}.gz' for number in range(1, 6)]
+        for number, file_name in enumerate(file_names, start=1):
+            with gzip.open(os.path.join(self.directory, file_name), 'wb') as archive:
+                archive.write(LOG_STRING.encode('utf-8') * number)
+        with open(os.path.join(self.directory, 'tracking.log'), 'w') as log_file:
+            log_file.write(LOG_STRING)
+        self.backend._get_sorted_files_for_processing = lambda: (
+            (file_name, os.path.join(self.directory, file_name))
+            for file_name in file_names[:3] + ['tracking.log'] + file_names[3:]
+        )
+
+        self.assertTrue(self.backend.load_and_process())
+
+        expected_calls = []
+        for number, file_name in [(1, file_names[0]), (2, file_names[1]), (3, file_names[2])]:
+            expected_calls += [('store', number), ('mark', file_name), ('process',)]
+        expected_calls += [('store', 1), ('process',)]
+        for number, file_name in [(4, file_names[3]), (5, file_names[4])]:
+            expected_calls += [('store', number), ('mark', file_name), ('process',)]
+        self.assertEqual(self.calls, expected_calls)
+
+    def test_file_objects_spooled(self):
+        """Ensure archived file objects and parsed records are passed through the removed temporary files."""
+        spool_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_directory)
+        file_names = [f'tracking.log-{number}.gz' for number in range(1, 4)]
+        self.backend._get_sorted_files_for_processing = lambda: (
+            (file_name, io.BytesIO(gzip.compress(LOG_STRING.encode('utf-8') * number)))
+            for number, file_name in enumerate(file_names, start=1)
+        )
+
+        with patch('tempfile.tempdir', spool_directory):
+            self.backend.load_and_process()
+
+        stored = [call for call in self.calls if call[0] == 'store']
+        self.assertEqual(stored, [('store', 1), ('store', 2), ('store', 3)])
+        self.assertEqual(os.listdir(spool_directory), [])
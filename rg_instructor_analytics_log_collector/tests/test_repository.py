@@ -0,0 +1,175 @@
+"""Test the log records ingestion of the repository."""
+import threading
+from unittest import TestCase
+
+from ddt import data, ddt
+from django.db import connection, DataError, transaction
+from django.test import TestCase as DatabaseTestCase
+from mock import patch
+
+from rg_instructor_analytics_log_collector.instrumentation import Metrics
+from rg_instructor_analytics_log_collector.models import LogTable
+from rg_instructor_analytics_log_collector.repository import IRepository, MySQlRepository
+from rg_instructor_analytics_log_collector.tests.test_instrumentation import CollectingSink
+
+LOG_STRING = b'{"event_type": "play_video", "time": "2024-01-01T00:00:%02d", "username": "user"}\n'
+ANONYMOUS_LOG_STRING = b'{"event_type": "page_close", "time": "2024-01-01T00:00:%02d+00:00"}\n'
+
+
+class CollectingRepository(IRepository):
+    """Repository collecting the stored batches."""
+
+    def __init__(self, ingest_queue_depth=0, fail_on_batch=None):
+        """Prepare the repository."""
+        super().__init__(ingest_queue_depth=ingest_queue_depth)
+        self.batches = []
+        self.fail_on_batch = fail_on_batch
+
+    def _get_logs_batch_size(self):
+        """Use small batches."""
+        return 5
+
+    def store_new_log_messages(self, batch):
+        """Collect the batch."""
+        if len(self.batches) == self.fail_on_batch:
+            raise RuntimeError('database is gone')
+        self.batches.append([record['log_time'] for record in batch])
+
+    store_new_log_message = get_processed_zip_files = mark_as_processed_source = None
+    get_log_file_checkpoint = update_log_file_checkpoint = get_listing_checkpoint = update_listing_checkpoint = None
+
+
+class Lines:
+    """Log lines iterator counting the read lines."""
+
+    def __init__(self, count, error=None):
+        """Prepare the lines."""
+        self.count = count
+        self.error = error
+        self.read_lines = 0
+
+    def __iter__(self):  # NOQA
+        for second in range(self.count):
+            self.read_lines += 1
+            yield LOG_STRING % second
+        if self.error:
+            raise self.error
+
+
+@ddt
+class TestAddNewLogRecords(TestCase):
+    """Test `IRepository.add_new_log_records` sequential and queued ingestion."""
+
+    @data(0, 1, 3)
+    def test_batches(self, ingest_queue_depth):
+        """Ensure all records are stored by batches in the order of the lines."""
+        repository = CollectingRepository(ingest_queue_depth)
+        repository.add_new_log_records(Lines(23))
+
+        self.assertEqual([len(batch) for batch in repository.batches], [5, 5, 5, 5, 3])
+        self.assertEqual(sum(repository.batches, []), [f'2024-01-01T00:00:{second:02d}' for second in range(23)])
+        self.assertEqual(repository.loaded_records_counter, 23)
+
+    def test_backpressure(self):
+        """Ensure the reader thread waits while the queue is full."""
+        lines = Lines(100)
+        repository = CollectingRepository(ingest_queue_depth=2)
+        read_lines = []
+        store_new_log_messages = repository.store_new_log_messages
+
+        def store_slowly(batch):
+            threading.Event().wait(0.05)
+            read_lines.append(lines.read_lines)
+            store_new_log_messages(batch)
+
+        repository.store_new_log_messages = store_slowly
+        repository.add_new_log_records(lines)
+
+        # NOTE: the reader is ahead of the stored batch by 2 queued batches and the batch waiting for the free space.
+        for stored_batches, read_lines_count in enumerate(read_lines, start=1):
+            self.assertLessEqual(read_lines_count - 5 * stored_batches, 5 * 3)
+        self.assertEqual(len(repository.batches), 20)
+
+    def test_reader_error(self):
+        """Ensure the reader error is raised after the read batches are stored."""
+        repository = CollectingRepository(ingest_queue_depth=2)
+        with self.assertRaises(EOFError):
+            repository.add_new_log_records(Lines(12, error=EOFError('Compressed file ended')))
+        self.assertEqual(len(repository.batches), 2)
+
+    def test_writer_error(self):
+        """Ensure the reader thread is stopped if the batch can not be stored."""
+        lines = Lines(1000)
+        repository = CollectingRepository(ingest_queue_depth=2, fail_on_batch=1)
+        with self.assertRaises(RuntimeError):
+            repository.add_new_log_records(lines)
+        self.assertLess(lines.read_lines, 1000)
+
+    def test_stall_stages(self):
+        """Ensure waits of the reader and writer are measured as the stall stages."""
+        metrics = Metrics()
+        sink = CollectingSink()
+        metrics.configure([sink])
+
+        with patch('rg_instructor_analytics_log_collector.repository.metrics', metrics):
+            CollectingRepository(ingest_queue_depth=1).add_new_log_records(Lines(23))
+        metrics.flush()
+
+        stages = {name for name, labels in sink.snapshots[0]}
+        self.assertEqual(stages, {'read', 'parse', 'store', 'read_stall', 'store_stall'})
+
+
+class TestMySQlRepository(DatabaseTestCase):
+    """Test storing of the parsed log records into the database."""
+
+    def setUp(self):
+        """Prepare the repository."""
+        self.repository = MySQlRepository()
+
+    def test_duplicates_skipped(self):
+        """Ensure re-read records are not stored again, including the records without the user."""
+        lines = [LOG_STRING % 1, ANONYMOUS_LOG_STRING % 1, ANONYMOUS_LOG_STRING % 1, ANONYMOUS_LOG_STRING % 2]
+        self.repository.add_new_log_records(lines)
+        self.repository.add_new_log_records(lines)
+
+        self.assertEqual(LogTable.objects.count(), 3)
+        self.assertEqual(LogTable.objects.filter(user_name__isnull=True).count(), 2)
+
+    def test_data_error_fallback(self):
+        """Ensure records are stored one by one if the batch is rejected, so only the broken record is lost."""
+        get_or_create = LogTable.objects.get_or_create
+
+        def get_or_create_broken(**kwargs):
+            if kwargs['log_time'] == '2024-01-01T00:00:02':
+                raise DataError('Incorrect string value')
+            return get_or_create(**kwargs)
+
+        with patch.object(LogTable.objects, 'bulk_create', side_effect=DataError('Incorrect string value')), \
+                patch.object(LogTable.objects, 'get_or_create', side_effect=get_or_create_broken):
+            self.repository.add_new_log_records([LOG_STRING % second for second in range(4)])
+
+        self.assertEqual(LogTable.objects.count(), 3)
+
+    def test_fallback_in_transaction(self):
+        """Ensure the rejected batch and records are rolled back to their savepoints, the transaction is usable."""
+        self.repository.add_new_log_records([LOG_STRING % 0])
+        existing_record = LogTable.objects.get()
+        get_or_create = LogTable.objects.get_or_create
+
+        def bulk_create_conflicting(*args, **kwargs):
+            LogTable.objects.create(
+                message_type_hash=existing_record.message_type_hash, log_time=existing_record.log_time,
+                user_name=existing_record.user_name, message_type='play_video', log_message='{}',
+            )
+
+        def get_or_create_broken(**kwargs):
+            if kwargs['log_time'] == '2024-01-01T00:00:02':
+                connection.cursor().execute('SELECT * FROM missing_table')
+            return get_or_create(**kwargs)
+
+        with transaction.atomic():
+            with patch.object(LogTable.objects, 'bulk_create', side_effect=bulk_create_conflicting), \
+                    patch.object(LogTable.objects, 'get_or_create', side_effect=get_or_create_broken):
+                self.repository.add_new_log_records([LOG_STRING % second for second in range(1, 4)])
+
+            self.assertEqual(LogTable.objects.count(), 3)
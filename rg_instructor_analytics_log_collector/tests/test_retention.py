@@ -0,0 +1,52 @@
+"""Test the partition-based retention of the LogTable records."""
+from datetime import date, datetime, timezone
+from unittest import TestCase
+
+from mock import patch
+
+from rg_instructor_analytics_log_collector import retention
+
+PARTITIONS = [
+    ('p20240102', date(2024, 1, 2)),
+    ('p20240103', date(2024, 1, 3)),
+    ('p20240104', date(2024, 1, 4)),
+    ('pmax', None),
+]
+
+
+@patch('rg_instructor_analytics_log_collector.retention.get_partitions', return_value=PARTITIONS)
+class TestRetention(TestCase):
+    """Test LogTable partitions maintenance statements."""
+
+    def test_to_days(self, mock_get_partitions):
+        """Ensure dates are converted to MySQL TO_DAYS() and back."""
+        self.assertEqual(retention.to_days(date(2024, 1, 1)), 739251)
+        self.assertEqual(retention.from_days('739251'), date(2024, 1, 1))
+
+    @patch('rg_instructor_analytics_log_collector.retention.timezone')
+    def test_future_partitions(self, mock_timezone, mock_get_partitions):
+        """Ensure partitions are split off the MAXVALUE one with the period of the last partitions."""
+        mock_timezone.now.return_value = datetime(2024, 1, 4, 12, tzinfo=timezone.utc)
+
+        self.assertEqual(retention.get_future_partitions_statements(ahead=1), [
+            'ALTER TABLE `rg_instructor_analytics_log_collector_logtable` REORGANIZE PARTITION pmax INTO ('
+            'PARTITION p20240105 VALUES LESS THAN (739255), PARTITION p20240106 VALUES LESS THAN (739256), '
+            'PARTITION pmax VALUES LESS THAN MAXVALUE)'
+        ])
+
+        mock_timezone.now.return_value = datetime(2024, 1, 2, tzinfo=timezone.utc)
+        self.assertEqual(retention.get_future_partitions_statements(ahead=1), [])
+
+    @patch('rg_instructor_analytics_log_collector.retention.LastProcessedLog.get_last_date')
+    def test_drop_partitions(self, mock_get_last_date, mock_get_partitions):
+        """Ensure only partitions with the records before the oldest checkpoint are dropped."""
+        mock_get_last_date.return_value = datetime(2024, 1, 3, 10, tzinfo=timezone.utc)
+        self.assertEqual(retention.get_drop_partitions_statements(), [
+            'ALTER TABLE `rg_instructor_analytics_log_collector_logtable` DROP PARTITION p20240102, p20240103'
+        ])
+
+        mock_get_last_date.return_value = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.assertEqual(retention.get_drop_partitions_statements(), [])
+
+        mock_get_last_date.return_value = None
+        self.assertEqual(retention.get_drop_partitions_statements(), [])
@@ -0,0 +1,91 @@
+"""Test the `Spool` module."""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+from rg_instructor_analytics_log_collector.spool import Spool
+
+
+class TestSpool(TestCase):
+    """Test `Spool` logic."""
+
+    def setUp(self):
+        """Prepare the spool directory."""
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir)
+
+    def get_records(self, spool):
+        """Return records of all segments ready for the consuming."""
+        return [record for path in spool.get_segments() for record in spool.read_segment(path)]
+
+    def test_append_and_commit(self):
+        """Ensure segments are rotated by size, consumed in order and deleted on commit."""
+        spool = Spool(self.spool_dir, segment_size=20)
+        for number in range(10):
+            self.assertTrue(spool.append(f'record-{number}'))
+
+        # NOTE: the open segment of the alive process is not consumed.
+        self.assertEqual(self.get_records(spool), [f'record-{number}' for number in range(9)])
+        spool.close()
+        self.assertEqual(self.get_records(spool), [f'record-{number}' for number in range(10)])
+
+        for path in spool.get_segments():
+            spool.commit(path)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_segment_max_age(self):
+        """Ensure aged segment is closed by the flusher."""
+        spool = Spool(self.spool_dir, segment_max_age=0, fsync_interval=0.01)
+        spool.append('record')
+        for _ in range(500):
+            if spool.get_segments():
+                break
+            spool._stopped.wait(0.01)
+        spool.close()
+
+        self.assertEqual(self.get_records(spool), ['record'])
+
+    def test_max_size(self):
+        """Ensure records are rejected when the spool is full."""
+        spool = Spool(self.spool_dir, max_size=20)
+        self.assertTrue(spool.append('record-0'))
+        self.assertTrue(spool.append('record-1'))
+        self.assertFalse(spool.append('record-2'))
+        spool.close()
+
+        self.assertEqual(spool.rejected_counter, 1)
+        self.assertEqual(self.get_records(spool), ['record-0', 'record-1'])
+
+    def test_dead_writer_segment(self):
+        """Ensure the not locked open segment is consumed (even if its pid is alive), incomplete record is skipped."""
+        path = os.path.join(self.spool_dir, f'{1:020d}-{os.getpid()}.open')
+        with open(path, 'w') as segment:
+            segment.write('record-0\nrecord-1\nrecor')
+
+        self.assertEqual(self.get_records(Spool(self.spool_dir)), ['record-0', 'record-1'])
+
+    def test_locked_writer_segment(self):
+        """Ensure the open segment locked by the writer is not consumed, even if its pid is not alive."""
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        path = os.path.join(self.spool_dir, f'{1:020d}-{process.pid}.open')
+        with open(path, 'w') as segment:
+            segment.write('record-0\n')
+        writer = subprocess.Popen(
+            [sys.executable, '-c', (
+                'import fcntl, sys\n'
+                f'segment = open({path!r}, "ab")\n'
+                'fcntl.flock(segment.fileno(), fcntl.LOCK_EX)\n'
+                'print(flush=True)\n'
+                'sys.stdin.read()\n'
+            )],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        writer.stdout.readline()
+
+        self.assertEqual(self.get_records(Spool(self.spool_dir)), [])
+        writer.communicate()
+        self.assertEqual(self.get_records(Spool(self.spool_dir)), ['record-0'])
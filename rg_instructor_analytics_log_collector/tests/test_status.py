@@ -0,0 +1,107 @@
+"""Test the Log Watcher status metrics."""
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from rg_instructor_analytics_log_collector.status import WatcherStatus
+
+
+class TestWatcherStatus(TestCase):
+    """Test `WatcherStatus` logic."""
+
+    def setUp(self):
+        """Prepare the status of the mocked backend."""
+        self.backend = Mock()
+        self.backend.get_backlog.return_value = {}
+        self.backend.get_loaded_records_count.return_value = 0
+        self.status = WatcherStatus(self.backend)
+
+    @patch('rg_instructor_analytics_log_collector.status.time.monotonic')
+    def test_get_events_rates(self, monotonic_mock):
+        """Ensure events rates are computed from the oldest samples within the windows."""
+        monotonic_mock.return_value = 0.0
+        status = WatcherStatus(self.backend)
+
+        monotonic_mock.return_value = 240.0
+        self.backend.get_loaded_records_count.return_value = 2400
+        status.record_cycle(240.0)
+
+        monotonic_mock.return_value = 270.0
+        self.backend.get_loaded_records_count.return_value = 3000
+        self.assertEqual(status.get_events_rates(), {'1m': 600 / 30, '5m': 3000 / 270, '15m': 3000 / 270})
+
+    @patch('rg_instructor_analytics_log_collector.status.time.monotonic')
+    def test_get_events_rates_short_history(self, monotonic_mock):
+        """Ensure windows with fewer samples than their span give the rate since the oldest sample."""
+        monotonic_mock.return_value = 0.0
+        status = WatcherStatus(self.backend)
+        for now, count in ((10.0, 100), (20.0, 300)):
+            monotonic_mock.return_value = now
+            self.backend.get_loaded_records_count.return_value = count
+            status.record_cycle(10.0)
+
+        monotonic_mock.return_value = 30.0
+        self.backend.get_loaded_records_count.return_value = 600
+        self.assertEqual(status.get_events_rates(), {'1m': 600 / 30, '5m': 600 / 30, '15m': 600 / 30})
+
+    @patch('rg_instructor_analytics_log_collector.status.time.monotonic')
+    def test_get_events_rates_long_cycle(self, monotonic_mock):
+        """Ensure windows without samples give the rate since the newest sample."""
+        monotonic_mock.return_value = 0.0
+        status = WatcherStatus(self.backend)
+
+        monotonic_mock.return_value = 400.0
+        self.backend.get_loaded_records_count.return_value = 4000
+        status.record_cycle(400.0)
+
+        monotonic_mock.return_value = 500.0
+        self.backend.get_loaded_records_count.return_value = 4500
+        self.assertEqual(status.get_events_rates(), {'1m': 500 / 100, '5m': 500 / 100, '15m': 4500 / 500})
+
+    @patch('rg_instructor_analytics_log_collector.status.time.monotonic')
+    def test_old_samples_are_dropped(self, monotonic_mock):
+        """Ensure samples older than the longest window are dropped."""
+        monotonic_mock.return_value = 0.0
+        status = WatcherStatus(self.backend)
+        for now in (500.0, 1000.0, 1500.0, 2000.0):
+            monotonic_mock.return_value = now
+            status.record_cycle(1.0)
+
+        self.assertEqual([sample_time for sample_time, _ in status._samples], [1000.0, 1500.0, 2000.0])
+
+    def test_render(self):
+        """Ensure metrics are rendered in the Prometheus text format."""
+        self.backend.get_backlog.return_value = {'tracking.log-1.gz': 100, 'tracking.log': 50}
+        self.status.record_cycle(2.5)
+
+        with patch.object(WatcherStatus, 'get_pipelines_lag', return_value={'enrollment': 30.0, 'video_views': 0.0}):
+            lines = self.status.render().splitlines()
+
+        backend_label = f'backend="{type(self.backend).__name__}"'
+        self.assertIn('rg_log_collector_pipeline_lag_seconds{pipeline="enrollment"} 30.0', lines)
+        self.assertIn('rg_log_collector_pipeline_lag_seconds{pipeline="video_views"} 0.0', lines)
+        self.assertIn(f'rg_log_collector_backlog_files{{{backend_label}}} 2', lines)
+        self.assertIn(f'rg_log_collector_backlog_bytes{{{backend_label}}} 150', lines)
+        self.assertIn('rg_log_collector_cycles_total 1', lines)
+        self.assertIn('rg_log_collector_last_cycle_seconds 2.5', lines)
+        self.assertEqual(
+            [line.split('{')[1].split('}')[0] for line in lines if line.startswith('rg_log_collector_events_')],
+            ['window="1m"', 'window="5m"', 'window="15m"']
+        )
+
+    def test_write(self):
+        """Ensure metrics file is replaced with the rendered metrics."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'status.prom')
+
+        with patch.object(WatcherStatus, 'render', return_value='metrics\n'):
+            self.status.write(path)
+            self.status.write(path)
+
+        with open(path) as status_file:
+            self.assertEqual(status_file.read(), 'metrics\n')
+        self.assertEqual(os.listdir(directory), ['status.prom'])
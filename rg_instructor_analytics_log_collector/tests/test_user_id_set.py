@@ -0,0 +1,86 @@
+"""Test the `UserIdSet` compact set of user ids."""
+from importlib import import_module
+from unittest import TestCase
+
+from ddt import data, ddt
+
+from rg_instructor_analytics_log_collector.user_id_set import UserIdSet, UserIdSetCache
+
+
+@ddt
+class TestUserIdSet(TestCase):
+    """Test `UserIdSet` logic."""
+
+    @data([], [1], [5, 3, 1], [0, 127, 128, 16384, 2 ** 40], list(range(1, 20000, 3)))
+    def test_serialization(self, user_ids):
+        """Ensure set survives the binary round trip."""
+        user_id_set = UserIdSet(user_ids)
+        self.assertEqual(UserIdSet.from_bytes(user_id_set.to_bytes()), user_id_set)
+        self.assertEqual(list(UserIdSet.from_bytes(user_id_set.to_bytes())), sorted(user_ids))
+
+    def test_add(self):
+        """Ensure add reports only new users."""
+        user_id_set = UserIdSet()
+        self.assertTrue(user_id_set.add(10))
+        self.assertTrue(user_id_set.add('11'))
+        self.assertFalse(user_id_set.add('10'))
+        self.assertIn(11, user_id_set)
+        self.assertEqual(len(user_id_set), 2)
+
+    def test_add_negative(self):
+        """Ensure negative ids are rejected."""
+        with self.assertRaises(ValueError):
+            UserIdSet().add(-1)
+
+    def test_update(self):
+        """Ensure sets are mergeable."""
+        user_id_set = UserIdSet([1, 2])
+        user_id_set.update(UserIdSet([2, 3]))
+        self.assertEqual(list(user_id_set), [1, 2, 3])
+
+    @data(('', []), (None, []), ('7', [7]), ('7,3,7', [3, 7]))
+    def test_comma_separated(self, value):
+        """Ensure legacy comma separated lists are converted."""
+        users_ids, expected = value
+        user_id_set = UserIdSet.from_comma_separated(users_ids)
+        self.assertEqual(list(user_id_set), expected)
+        self.assertEqual(user_id_set.to_comma_separated(), ','.join(str(user_id) for user_id in expected))
+
+    @data([], [7], list(range(1, 20000, 3)))
+    def test_migration_codec(self, user_ids):
+        """Ensure the codec copied into the migration writes the current binary form."""
+        migration = import_module('rg_instructor_analytics_log_collector.migrations.0019_users_set')
+        packed = migration._to_bytes(migration._from_comma_separated(','.join(map(str, user_ids))))
+        self.assertEqual(packed, UserIdSet(user_ids).to_bytes())
+        self.assertEqual(migration._to_comma_separated(migration._from_bytes(packed)),
+                         UserIdSet(user_ids).to_comma_separated())
+
+    def test_compact(self):
+        """Ensure dense sets take about a byte per user."""
+        user_ids = list(range(100000, 120000))
+        self.assertLess(len(UserIdSet(user_ids).to_bytes()), len(user_ids))
+
+
+class TestUserIdSetCache(TestCase):
+    """Test `UserIdSetCache` logic."""
+
+    def test_cached_set(self):
+        """Ensure the cached set is returned while the packed form is the same."""
+        cache = UserIdSetCache()
+        user_id_set = UserIdSet([1, 2])
+        cache.put('day', user_id_set.to_bytes(), user_id_set)
+        self.assertIs(cache.pop('day', memoryview(user_id_set.to_bytes())), user_id_set)
+        self.assertIsNot(cache.pop('day', user_id_set.to_bytes()), user_id_set)
+
+    def test_changed_set(self):
+        """Ensure the changed packed form is decoded."""
+        cache = UserIdSetCache()
+        cache.put('day', UserIdSet([1]).to_bytes(), UserIdSet([1]))
+        self.assertEqual(cache.pop('day', UserIdSet([1, 3]).to_bytes()), UserIdSet([1, 3]))
+
+    def test_max_size(self):
+        """Ensure the least recently stored sets are evicted."""
+        cache = UserIdSetCache(max_size=2)
+        for key in ('first', 'second', 'third'):
+            cache.put(key, b'', UserIdSet())
+        self.assertEqual(list(cache._sets), ['second', 'third'])
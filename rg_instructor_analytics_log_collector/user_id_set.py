@@ -0,0 +1,139 @@
+"""
+Compact set of the user ids.
+"""
+from collections import OrderedDict
+import threading
+import zlib
+
+
+class UserIdSet:
+    """
+    Set of the user ids with the compact binary representation.
+
+    In memory ids are kept in the python set (O(1) membership and insert). Serialized form is a sorted list of
+    ids encoded as deltas between neighbours (LEB128 varints) and compressed with zlib, so a dense set of ids takes
+    about a byte per id. Sets are mergeable with `update`.
+    """
+
+    def __init__(self, user_ids=()):
+        self._user_ids = {int(user_id) for user_id in user_ids}
+
+    def __contains__(self, user_id):  # NOQA
+        return int(user_id) in self._user_ids
+
+    def __iter__(self):  # NOQA
+        return iter(sorted(self._user_ids))
+
+    def __len__(self):  # NOQA
+        return len(self._user_ids)
+
+    def __eq__(self, other):  # NOQA
+        return isinstance(other, UserIdSet) and self._user_ids == other._user_ids
+
+    def add(self, user_id):
+        """
+        Add user id to the set.
+
+        return: (bool) True if user id was not in the set.
+        """
+        user_id = int(user_id)
+        if user_id < 0:
+            raise ValueError(f'User id can not be negative: {user_id}')
+        if user_id in self._user_ids:
+            return False
+        self._user_ids.add(user_id)
+        return True
+
+    def update(self, other):
+        """
+        Merge other set of user ids into the current one.
+        """
+        for user_id in other:
+            self.add(user_id)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize set into the compact binary form.
+        """
+        if not self._user_ids:
+            return b''
+
+        encoded = bytearray()
+        previous = 0
+        for user_id in sorted(self._user_ids):
+            delta = user_id - previous
+            previous = user_id
+            while delta >= 0x80:
+                encoded.append((delta & 0x7f) | 0x80)
+                delta >>= 7
+            encoded.append(delta)
+        return zlib.compress(bytes(encoded))
+
+    @classmethod
+    def from_bytes(cls, data) -> 'UserIdSet':
+        """
+        Deserialize set from the binary form (result of `to_bytes`).
+        """
+        user_id_set = cls()
+        if not data:
+            return user_id_set
+
+        user_id = delta = shift = 0
+        for byte in zlib.decompress(bytes(data)):
+            delta |= (byte & 0x7f) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            user_id += delta
+            user_id_set._user_ids.add(user_id)
+            delta = shift = 0
+        return user_id_set
+
+    @classmethod
+    def from_comma_separated(cls, users_ids) -> 'UserIdSet':
+        """
+        Create set from the legacy comma separated list of user ids.
+        """
+        return cls(user_id for user_id in (users_ids or '').split(',') if user_id.strip())
+
+    def to_comma_separated(self) -> str:
+        """
+        Return set as the legacy comma separated list of user ids.
+        """
+        return ','.join(str(user_id) for user_id in self)
+
+
+class UserIdSetCache:
+    """
+    LRU cache of the decoded user id sets by the keys of their rows, valid while the row stores the same packed form.
+
+    The set is taken out of the cache for the update (`pop`) and put back with its new packed form once it is
+    stored (`put`), so the set changed by the failed write is never reused.
+    """
+
+    MAX_SIZE = 128
+
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pop(self, key, data) -> UserIdSet:
+        """
+        Return the cached set of the key if it is packed as `data`, otherwise decode `data`.
+        """
+        with self._lock:
+            cached = self._sets.pop(key, None)
+        if cached is not None and cached[0] == bytes(data):
+            return cached[1]
+        return UserIdSet.from_bytes(data)
+
+    def put(self, key, data, user_id_set: UserIdSet):
+        """
+        Cache the set of the key stored in the packed form `data`.
+        """
+        with self._lock:
+            self._sets[key] = (bytes(data), user_id_set)
+            self._sets.move_to_end(key)
+            while len(self._sets) > self.max_size:
+                self._sets.popitem(last=False)
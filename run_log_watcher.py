@@ -3,6 +3,7 @@ Enterpoint.
 """
 
 import argparse
+import logging
 import sys
 import time
 
@@ -12,11 +13,16 @@ django.setup()
 from rg_instructor_analytics_log_collector.backends.blob_backend import BlobBackend
 from rg_instructor_analytics_log_collector.backends.file_backend import FileBackend
 from rg_instructor_analytics_log_collector.backends.s3_backend import S3Backend
+from rg_instructor_analytics_log_collector.backends.spool_backend import SpoolBackend
+from rg_instructor_analytics_log_collector.file_watcher import AdaptiveScheduler, get_file_watcher
+from rg_instructor_analytics_log_collector.instrumentation import get_sink, metrics
+from rg_instructor_analytics_log_collector.status import WatcherStatus
 
 BACKENDS = {
     'file-system': FileBackend,
     's3': S3Backend,
     'blob': BlobBackend,
+    'spool': SpoolBackend,
 }
 
 
@@ -43,6 +49,21 @@ def main():
         type=int,
         default=300
     )
+    parser.add_argument(
+        '--watch',
+        action="store_true",
+        help="Event-driven mode: wake up on the tracking log directory changes (file-system backend, inotify with "
+             "the polling fallback), start the next cycle immediately while there is a backlog and back off up to "
+             "--sleep_time while idle"
+    )
+    parser.add_argument(
+        '--min-sleep-time',
+        action="store",
+        dest="min_sleep_time",
+        help="Minimal time between cycles in the event-driven mode (in seconds)",
+        type=float,
+        default=1
+    )
     parser.add_argument(
         '--backend',
         action="store",
@@ -52,11 +73,82 @@ def main():
         type=str,
         default='file-system'
     )
+    parser.add_argument(
+        '--spool-dir',
+        action="store",
+        dest="spool_dir",
+        help="The path to the spool directory of the live events (required if backend spool is chosen, the same as "
+             "the spool_dir option of the RGAnalyticsBackend in the spool mode)",
+        type=str,
+        default=''
+    )
+    parser.add_argument(
+        '--ingest-workers',
+        action="store",
+        dest="ingest_workers",
+        help="Number of the worker processes decompressing and parsing archived tracking log files ahead of the "
+             "current one (0 disables parallel ingestion)",
+        type=int,
+        default=0
+    )
+    parser.add_argument(
+        '--ingest-queue-depth',
+        action="store",
+        dest="ingest_queue_depth",
+        help="Maximal number of the parsed batches of log records waiting for the database write, the tracking log "
+             "file is read and parsed by the separate thread while the batches are written (0 disables it)",
+        type=int,
+        default=0
+    )
+    parser.add_argument(
+        '--metrics-sink',
+        action="append",
+        dest="metrics_sinks",
+        help="Enable per-stage metrics and emit them after every cycle to the sink: log, prometheus:<textfile path> "
+             "or statsd:<host>:<port> (can be repeated)",
+        default=[]
+    )
+    parser.add_argument(
+        '--metrics-sample-rate',
+        action="store",
+        dest="metrics_sample_rate",
+        help="Fraction of the measured files and chunks (0 < rate <= 1, 1 is default)",
+        type=float,
+        default=1.0
+    )
+    parser.add_argument(
+        '--status-port',
+        action="store",
+        dest="status_port",
+        help="Serve the processing lag and backlog metrics on the local HTTP endpoint /metrics (0 disables it)",
+        type=int,
+        default=0
+    )
+    parser.add_argument(
+        '--status-host',
+        action="store",
+        dest="status_host",
+        help="Address of the status HTTP endpoint (127.0.0.1 is default)",
+        type=str,
+        default='127.0.0.1'
+    )
+    parser.add_argument(
+        '--status-file',
+        action="store",
+        dest="status_file",
+        help="Write the processing lag and backlog metrics to the file after every cycle",
+        type=str,
+        default=''
+    )
     parser.add_argument('--reload-logs', action="store_true", help='Reload all logs from files into database')
     parser.add_argument(
         '--delete-logs', action="store_true",
         help='Delete unused log records from database (after archived files processing only)'
     )
+    parser.add_argument(
+        '--fan-out', action="store_true", dest="fan_out",
+        help='Read and decode log records from database once for all pipelines'
+    )
     parser.add_argument(
         '--bucket-name',
         action="store",
@@ -81,6 +173,38 @@ def main():
         type=str,
         default=''
     )
+    parser.add_argument(
+        '--s3-prefix',
+        action="store",
+        dest="s3_prefix",
+        help="List only the tracking log files under the prefix of the s3 bucket",
+        type=str,
+        default=''
+    )
+    parser.add_argument(
+        '--s3-incremental',
+        action="store_true",
+        dest="s3_incremental",
+        help="List only the s3 bucket keys after the stored last key, all the archived files up to which are "
+             "processed (archives keys must be listed in the order of their creation, e.g. date-partitioned)"
+    )
+    parser.add_argument(
+        '--prefetch',
+        action="store",
+        dest="prefetch",
+        help="Number of the tracking log files downloaded concurrently ahead of the current one (s3 and blob "
+             "backends, 0 disables prefetching)",
+        type=int,
+        default=0
+    )
+    parser.add_argument(
+        '--prefetch-max-mb',
+        action="store",
+        dest="prefetch_max_mb",
+        help="Maximal total size of the prefetched not yet processed tracking log files (in megabytes)",
+        type=int,
+        default=256
+    )
     parser.add_argument(
         '--blob-conn-str',
         action="store",
@@ -120,15 +244,87 @@ def main():
         )
         sys.exit(1)
 
+    if backend_name == 'spool' and not args.spool_dir:
+        print(
+            f"For chosen backend {backend_name} param --spool-dir can't be empty."
+        )
+        sys.exit(1)
+
+    if args.ingest_workers < 0 or args.ingest_queue_depth < 0:
+        print("Params --ingest-workers and --ingest-queue-depth can't be negative.")
+        sys.exit(1)
+
+    try:
+        metrics_sinks = [get_sink(spec) for spec in args.metrics_sinks]
+        if metrics_sinks:
+            metrics.configure(metrics_sinks, args.metrics_sample_rate)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
     log_collector_backend = BACKENDS[backend_name](**vars(args))
+    status = WatcherStatus(log_collector_backend)
+    if args.status_port:
+        status.serve(args.status_host, args.status_port)
+
+    if args.watch:
+        watch(log_collector_backend, args, status)
 
-    log_collector_backend.load_and_process()
+    run_cycle(log_collector_backend, args, status)
     time.sleep(args.sleep_time)
 
     while True:
-        log_collector_backend.load_and_process()
+        run_cycle(log_collector_backend, args, status)
         time.sleep(args.sleep_time)
 
 
+def run_cycle(log_collector_backend, args, status):
+    """
+    Run log collector cycle and emit its metrics.
+
+    return: (bool) True if more work may be waiting for the next cycle.
+    """
+    started = time.monotonic()
+    try:
+        return log_collector_backend.load_and_process()
+    finally:
+        metrics.flush()
+        status.record_cycle(time.monotonic() - started)
+        if args.status_file:
+            try:
+                status.write(args.status_file)
+            except Exception:
+                logging.exception(f'Can not write the status file {args.status_file}')
+
+
+def watch(log_collector_backend, args, status):
+    """
+    Run log collector cycles in the event-driven mode.
+    """
+    scheduler = AdaptiveScheduler(min_delay=args.min_sleep_time, max_delay=args.sleep_time)
+    watcher = None
+    if args.backend_name.lower() == 'file-system':
+        watcher = get_file_watcher(args.tracking_log_dir, poll_interval=args.min_sleep_time)
+
+    try:
+        while True:
+            run_cycle(log_collector_backend, args, status)
+            # NOTE: the backlog is the work left at the end of the cycle, not the loaded records (the busy live
+            #  log file gets new records every cycle, they are handled after the file system event).
+            delay = scheduler.next_delay(log_collector_backend.has_backlog())
+            if not delay:
+                continue
+
+            if watcher is None:
+                time.sleep(delay)
+            elif watcher.wait(delay):
+                scheduler.reset()
+                # NOTE: let the burst of the file system events settle down before the next cycle.
+                time.sleep(args.min_sleep_time)
+    finally:
+        if watcher is not None:
+            watcher.close()
+
+
 if __name__ == "__main__":
     main()